@@ -0,0 +1,131 @@
+"""
+bench_json.py — default FastAPI/stdlib JSON pipeline vs the fast_json path
+Run: python bench_json.py [--players 3,30,1000] [--iterations N]
+
+Payloads are the real shapes of GET /rooms, GET /room/{id} and the
+rooms_snapshot / rooms_delta socket events, built from live rooms of the given size.
+"before" = FastAPI's jsonable_encoder + stdlib json for REST and plain
+stdlib json for socket packets, "after" = fast_json (orjson when installed).
+"""
+import argparse
+import json
+import logging
+import time
+import warnings
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import fast_json  # noqa: E402
+import server as S  # noqa: E402
+from room_models import LivePlayer  # noqa: E402
+
+
+def populate(players_per_room: int):
+    for room in list(S.active_rooms.values()):
+        S.active_rooms.remove(room.id)
+    for room_type in ('free', 'bronze', 'silver', 'gold', 'freeroll'):
+        room = S.spawn_waiting_room(room_type)
+        room.max_players = players_per_room
+        for i in range(players_per_room):
+            S.active_rooms.add_player(room, LivePlayer(
+                user_id=f"{room_type}_{i}", username=f"player{i}", first_name="Player",
+                last_name=str(i), photo_url="https://t.me/i/userpic/320/x.jpg", bet_amount=200))
+
+
+def rooms_payload() -> dict:
+    rooms = []
+    for room in S.active_rooms.values():
+        rooms.append({
+            "id": room.id, "room_type": room.room_type, "players_count": len(room.players),
+            "max_players": room.max_players, "status": room.status, "prize_pool": room.prize_pool,
+            "round_number": room.round_number, "settings": S.ROOM_SETTINGS[room.room_type],
+            "is_locked": False,
+        })
+    return {"rooms": rooms, "maintenance_mode": False}
+
+
+def room_detail_payload() -> dict:
+    room = S.active_rooms.find('bronze')
+    return {
+        "id": room.id, "room_type": room.room_type,
+        "players": [p.to_dict() for p in room.players],
+        "status": room.status, "prize_pool": room.prize_pool, "match_id": room.match_id,
+        "round_number": room.round_number, "settings": S.ROOM_SETTINGS[room.room_type],
+        "winner": None, "finished_at": room.finished_at,
+    }
+
+
+def rooms_snapshot_payload() -> dict:
+    return S.lobby_broadcaster.snapshot_payload()
+
+
+def rooms_delta_payload() -> dict:
+    # Worst case delta: every room changed since the last tick
+    rooms, meta = S.lobby_snapshot()
+    return {
+        "seq": S.lobby_broadcaster.seq + 1,
+        "changed": list(rooms.values()),
+        "removed": [],
+        **meta,
+        "timestamp": S.datetime.now(S.timezone.utc),
+    }
+
+
+def rest_before(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def rest_after(payload):
+    return fast_json.FastJSONResponse(payload).body
+
+
+def socket_before(payload):
+    # python-socketio's stdlib json; the timestamp used to be pre-converted with isoformat()
+    return json.dumps(payload, separators=(',', ':'), default=lambda v: v.isoformat())
+
+
+def socket_after(payload):
+    return fast_json.socketio_json.dumps(payload, separators=(',', ':'))
+
+
+def timeit(fn, payload, iterations: int) -> float:
+    fn(payload)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(payload)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--players", default="3,30,1000", help="players per room, comma separated")
+    parser.add_argument("--iterations", type=int, default=0, help="encodes per case (default scales with size)")
+    args = parser.parse_args()
+
+    print(f"encoder backend: {fast_json.BACKEND}")
+    print(f"{'payload':<18} | {'players':>7} | {'bytes':>8} | {'before':>10} | {'after':>10} | {'speedup':>7}")
+    print("-" * 74)
+    cases = (
+        ("GET /rooms", rooms_payload, rest_before, rest_after),
+        ("GET /room/{id}", room_detail_payload, rest_before, rest_after),
+        ("rooms_snapshot", rooms_snapshot_payload, socket_before, socket_after),
+        ("rooms_delta", rooms_delta_payload, socket_before, socket_after),
+    )
+    for n in (int(x) for x in args.players.split(",")):
+        populate(n)
+        iterations = args.iterations or max(20, 20000 // n)
+        for name, build, before, after in cases:
+            payload = build()
+            t_before = timeit(before, payload, iterations)
+            t_after = timeit(after, payload, iterations)
+            size = len(rest_after(payload))
+            print(f"{name:<18} | {n:>7} | {size:>8} | {t_before * 1e6:>7.1f} µs | {t_after * 1e6:>7.1f} µs | "
+                  f"{t_before / t_after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
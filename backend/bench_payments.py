@@ -0,0 +1,277 @@
+"""
+bench_payments.py — payment detection and crediting against local RPC / CoinGecko / Telegram stand-ins
+Run: python bench_payments.py --launch --payments 20
+     python bench_payments.py --url http://127.0.0.1:8001 --standin-port 8899   # server already pointed at the stand-ins
+
+The benchmark hosts standins.py in-process and, with --launch, starts
+`uvicorn server:app` (DATABASE_URL = a local Postgres) with SOLANA_RPC_URL,
+COINGECKO_API_URL and TELEGRAM_API_URL pointing at it. For each scenario it
+opens --payments purchases through POST /api/purchase-tokens, injects a
+matching payment into the stand-in ledger for every purchase wallet and polls
+/api/purchase-status until the tokens are credited and the SOL is swept.
+
+Scenarios (--scenarios):
+  baseline       no faults
+  slow_rpc       RPC latency --slow-ms ± half of it
+  rate_limited   RPC rate limit --rate-limit req/s, excess answered 429
+  flaky          --error-rate of RPC calls answered 429
+  outage         RPC returns 503 for --outage-s after the payments are sent
+
+Reported per scenario: detection / credit / sweep latency from injection,
+payments credited within --timeout, RPC calls per credited payment by method,
+and the 429/503 responses the stand-in served.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+import standins
+
+ADMIN_KEY = os.environ.get("LOAD_TEST_ADMIN_KEY", "PRODUCTION_CLEANUP_2025")
+LAMPORTS_PER_SOL = 1_000_000_000
+SCENARIOS = ("baseline", "slow_rpc", "rate_limited", "flaky", "outage")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_s": round(percentile(ordered, 0.50), 2),
+        "p90_s": round(percentile(ordered, 0.90), 2),
+        "max_s": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+def scenario_faults(name: str, args) -> Dict:
+    if name == "slow_rpc":
+        return {"latency_ms": args.slow_ms, "jitter_ms": args.slow_ms / 2}
+    if name == "rate_limited":
+        return {"rate_limit_rps": args.rate_limit}
+    if name == "flaky":
+        return {"error_rate": args.error_rate}
+    return {}
+
+
+# ── Server ───────────────────────────────────────────────────────────
+
+def launch_server(args) -> subprocess.Popen:
+    standin_url = f"http://127.0.0.1:{args.standin_port}"
+    env = dict(os.environ)
+    env.update({
+        "SOLANA_RPC_URL": standin_url,
+        "SOLANA_RPC_FALLBACK_1": standin_url,
+        "SOLANA_RPC_FALLBACK_2": standin_url,
+        "COINGECKO_API_URL": f"{standin_url}/api/v3",
+        "TELEGRAM_API_URL": standin_url,
+    })
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+
+
+async def wait_for_server(url: str, timeout: float = 60.0):
+    async with httpx.AsyncClient(base_url=url) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up within {timeout:.0f}s")
+
+
+async def authenticate(http: httpx.AsyncClient, telegram_id: int) -> str:
+    response = await http.post("/api/auth/telegram", json={
+        "telegram_auth_data": {
+            "id": telegram_id,
+            "first_name": "Bench",
+            "last_name": "Payments",
+            "username": f"bench_pay_{telegram_id}",
+            "auth_date": int(time.time()),
+            "hash": "telegram_webapp",
+        }
+    })
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+# ── Scenario ─────────────────────────────────────────────────────────
+
+class Purchase:
+    __slots__ = ("wallet", "lamports", "injected_at", "detected", "credited", "swept", "status")
+
+    def __init__(self, wallet: str, lamports: int):
+        self.wallet = wallet
+        self.lamports = lamports
+        self.injected_at: Optional[float] = None
+        self.detected: Optional[float] = None
+        self.credited: Optional[float] = None
+        self.swept: Optional[float] = None
+        self.status = "pending"
+
+
+async def open_purchases(http: httpx.AsyncClient, user_id: str, count: int, tokens: int) -> List[Purchase]:
+    purchases = []
+    for _ in range(count):
+        response = await http.post("/api/purchase-tokens", json={"user_id": user_id, "token_amount": tokens})
+        response.raise_for_status()
+        info = response.json()["payment_info"]
+        purchases.append(Purchase(info["wallet_address"], int(info["required_sol"] * LAMPORTS_PER_SOL) + 1))
+    return purchases
+
+
+async def track(http: httpx.AsyncClient, user_id: str, purchase: Purchase, deadline: float, poll: float):
+    """Poll purchase-status until the SOL is swept (or the deadline passes)"""
+    while time.monotonic() < deadline and purchase.swept is None:
+        await asyncio.sleep(poll)
+        try:
+            response = await http.get(f"/api/purchase-status/{user_id}/{purchase.wallet}")
+        except httpx.HTTPError:
+            continue
+        if response.status_code != 200:
+            continue
+        status = response.json()["purchase_status"]
+        now = time.monotonic()
+        purchase.status = status.get("status", purchase.status)
+        if status.get("payment_detected") and purchase.detected is None:
+            purchase.detected = now
+        if status.get("tokens_credited") and purchase.credited is None:
+            purchase.credited = now
+        if status.get("sol_forwarded") and purchase.swept is None:
+            purchase.swept = now
+
+
+async def run_scenario(name: str, args, http: httpx.AsyncClient, standin: standins.StandIn, user_id: str) -> Dict:
+    for faults in standin.faults.values():
+        faults.clear()
+    standin.reset_stats()
+    purchases = await open_purchases(http, user_id, args.payments, args.tokens)
+
+    rpc_faults = standin.faults["rpc"]
+    rpc_faults.configure(**scenario_faults(name, args))
+    started = time.monotonic()
+    deadline = started + args.timeout
+    trackers = [asyncio.create_task(track(http, user_id, p, deadline, args.poll)) for p in purchases]
+    for purchase in purchases:
+        standin.ledger.inject_payment(purchase.wallet, purchase.lamports)
+        purchase.injected_at = time.monotonic()
+        await asyncio.sleep(1 / args.inject_rate)
+    if name == "outage":
+        rpc_faults.configure(outage_s=args.outage_s)
+    await asyncio.gather(*trackers)
+    elapsed = time.monotonic() - started
+    rpc_faults.clear()
+
+    stats = standin.get_stats()["services"]
+    rpc_calls = stats["rpc"]["calls"]
+    credited = [p for p in purchases if p.credited is not None]
+    return {
+        "scenario": name,
+        "faults": scenario_faults(name, args) or ({"outage_s": args.outage_s} if name == "outage" else {}),
+        "payments": len(purchases),
+        "detected": sum(1 for p in purchases if p.detected is not None),
+        "credited": len(credited),
+        "swept": sum(1 for p in purchases if p.swept is not None),
+        "elapsed_s": round(elapsed, 1),
+        "detect_latency": latency_summary([p.detected - p.injected_at for p in purchases if p.detected]),
+        "credit_latency": latency_summary([p.credited - p.injected_at for p in credited]),
+        "sweep_latency": latency_summary([p.swept - p.injected_at for p in purchases if p.swept]),
+        "rpc_calls": stats["rpc"]["total_calls"],
+        "rpc_calls_per_credit": round(stats["rpc"]["total_calls"] / len(credited), 1) if credited else None,
+        "rpc_calls_by_method": dict(sorted(rpc_calls.items(), key=lambda item: -item[1])),
+        "rpc_failures_served": stats["rpc"]["failures"],
+        "coingecko_calls": stats["coingecko"]["total_calls"],
+        "final_status": {status: sum(1 for p in purchases if p.status == status)
+                         for status in sorted({p.status for p in purchases})},
+    }
+
+
+async def run(args) -> List[Dict]:
+    standin = standins.StandIn(sol_eur=args.sol_eur)
+    standin_server = standins.serve(standin, port=args.standin_port)
+    standin_task = asyncio.create_task(standin_server.serve())
+    server = launch_server(args) if args.launch else None
+    results = []
+    try:
+        await wait_for_server(args.url)
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as http:
+            user_id = await authenticate(http, args.telegram_id)
+            for name in args.scenarios:
+                result = await run_scenario(name, args, http, standin, user_id)
+                print_result(result)
+                results.append(result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        standin_server.should_exit = True
+        await standin_task
+    return results
+
+
+def print_result(r: Dict):
+    print(f"\n=== {r['scenario']} {r['faults'] or ''} ===")
+    print(f"payments {r['payments']}: detected {r['detected']}, credited {r['credited']}, swept {r['swept']} "
+          f"in {r['elapsed_s']}s  (final status {r['final_status']})")
+    for stage in ("detect", "credit", "sweep"):
+        s = r[f"{stage}_latency"]
+        print(f"  {stage:<7} p50 {s['p50_s']:>6}s  p90 {s['p90_s']:>6}s  max {s['max_s']:>6}s  (n={s['count']})")
+    print(f"  RPC calls {r['rpc_calls']} ({r['rpc_calls_per_credit']} per credited payment), "
+          f"CoinGecko calls {r['coingecko_calls']}")
+    print(f"  by method {r['rpc_calls_by_method']}")
+    if r["rpc_failures_served"]:
+        print(f"  faults served {r['rpc_failures_served']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server base URL (default http://127.0.0.1:<port>)")
+    parser.add_argument("--launch", action="store_true", help="start uvicorn server:app wired to the stand-ins")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--standin-port", type=int, default=8899)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--payments", type=int, default=10, help="purchases per scenario")
+    parser.add_argument("--tokens", type=int, default=500, help="tokens per purchase (10..10000)")
+    parser.add_argument("--inject-rate", type=float, default=5.0, help="payments injected per second")
+    parser.add_argument("--poll", type=float, default=0.25, help="purchase-status poll interval (s)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-scenario limit (s)")
+    parser.add_argument("--slow-ms", type=float, default=300.0)
+    parser.add_argument("--rate-limit", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--outage-s", type=float, default=20.0)
+    parser.add_argument("--sol-eur", type=float, default=180.0)
+    parser.add_argument("--telegram-id", type=int, default=990000001)
+    parser.add_argument("--json", dest="json_out", help="write results here")
+    args = parser.parse_args()
+    args.url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {SCENARIOS}")
+
+    results = asyncio.run(run(args))
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+bench_room_models.py — Pydantic GameRoom/RoomPlayer vs slotted LiveRoom/LivePlayer
+Run: python bench_room_models.py [--iterations N]
+
+For rooms of 3, 30 and 1000 players it measures retained memory of a full
+room and the CPU time of the engine's hot path: build the room, mutate
+players in place, and serialize it the way broadcasts/endpoints do.
+"""
+import argparse
+import gc
+import logging
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings("ignore", category=DeprecationWarning)  # pydantic .dict() in the baseline path
+
+from server import GameRoom, RoomPlayer, RoomType  # noqa: E402
+from room_models import LiveRoom, LivePlayer  # noqa: E402
+
+ROOM_SIZES = (3, 30, 1000)
+
+
+def _player_kwargs(i: int) -> dict:
+    return dict(user_id=f"user_{i}", username=f"player{i}", first_name="Player",
+                last_name=str(i), photo_url="", bet_amount=200 + i)
+
+
+def build_pydantic(n: int) -> GameRoom:
+    room = GameRoom(room_type=RoomType.BRONZE, max_players=n)
+    for i in range(n):
+        room.players.append(RoomPlayer(**_player_kwargs(i)))
+    return room
+
+
+def build_live(n: int) -> LiveRoom:
+    room = LiveRoom(room_type=RoomType.BRONZE, max_players=n)
+    for i in range(n):
+        room.players.append(LivePlayer(**_player_kwargs(i)))
+    return room
+
+
+def serialize_pydantic(room: GameRoom) -> list:
+    # Mirrors the pre-refactor call sites: .dict() + manual isoformat()
+    out = []
+    for p in room.players:
+        d = p.dict()
+        if isinstance(d.get('joined_at'), datetime):
+            d['joined_at'] = d['joined_at'].isoformat()
+        out.append(d)
+    return out
+
+
+def serialize_live(room: LiveRoom) -> list:
+    return [p.to_dict() for p in room.players]
+
+
+def cycle(build, serialize, n: int):
+    room = build(n)
+    for p in room.players:
+        p.is_anonymous = not p.is_anonymous
+    room.prize_pool = sum(p.bet_amount for p in room.players)
+    serialize(room)
+
+
+def measure_memory(build, n: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    room = build(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del room
+    return size
+
+
+def measure_cpu(build, serialize, n: int, iterations: int) -> float:
+    cycle(build, serialize, n)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cycle(build, serialize, n)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--iterations", type=int, default=0,
+                        help="cycles per room size (default: scaled so each size runs ~3000 players)")
+    args = parser.parse_args()
+
+    print(f"{'players':>8} | {'pydantic mem':>13} | {'slotted mem':>12} | {'ratio':>6} | "
+          f"{'pydantic cpu':>13} | {'slotted cpu':>12} | {'speedup':>7}")
+    print("-" * 92)
+    for n in ROOM_SIZES:
+        iterations = args.iterations or max(3, 3000 // n)
+        mem_pyd = measure_memory(build_pydantic, n)
+        mem_live = measure_memory(build_live, n)
+        cpu_pyd = measure_cpu(build_pydantic, serialize_pydantic, n, iterations)
+        cpu_live = measure_cpu(build_live, serialize_live, n, iterations)
+        print(f"{n:>8} | {mem_pyd / 1024:>10.1f} KB | {mem_live / 1024:>9.1f} KB | {mem_pyd / mem_live:>5.2f}x | "
+              f"{cpu_pyd * 1e6:>10.1f} µs | {cpu_live * 1e6:>9.1f} µs | {cpu_pyd / cpu_live:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+bench_socketio.py — Socket.IO fan-out: emit-to-receive latency vs connected clients
+Run: python bench_socketio.py --launch --clients 500,1000,2000
+     python bench_socketio.py --url http://127.0.0.1:8001 --pid <server pid> --clients 1000
+
+For each client count the benchmark opens that many socketio.AsyncClient
+connections to /api/socket.io, puts them in socket rooms of --room-size
+(join_game_room, like players in a game room), then measures:
+
+  probe global   one sio.emit to every socket (how game_finished / rooms_delta go out)
+  probe room     one room-targeted emit per room, covering the same sockets
+                 (how player_joined / room_full go out)
+  lifecycle      real rounds (admin add-fake-player + force-start) — room_ready,
+                 game_finished and redirect_home as every client receives them
+
+Probes come from POST /api/admin/socket-probe (routed only when the server runs
+with ENABLE_BENCH_ENDPOINTS=1, which --launch sets), which stamps each emit with the
+server's time.time(); client and server share the host clock, so receive minus
+sent_at is the delivery latency. game_finished latency is measured against its
+finished_at. Server RSS and CPU are read from /proc/<pid> (Linux), giving memory
+per connection and CPU per delivered message.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import socketio
+
+ADMIN_KEY = os.environ.get("LOAD_TEST_ADMIN_KEY", "PRODUCTION_CLEANUP_2025")
+LIFECYCLE_EVENTS = ("room_ready", "game_finished", "redirect_home")
+FAST_PHASES = {"spin": 0.5, "announce": 0.5, "cleanup": 0.2}
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_stats(values: List[float], expected: int) -> Dict:
+    ordered = sorted(values)
+    return {
+        "received": len(ordered),
+        "expected": expected,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+# ── Server process ───────────────────────────────────────────────────
+
+class ProcStats:
+    """RSS and CPU seconds of the server process from /proc (None when unavailable)"""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def rss_mb(self) -> Optional[float]:
+        if not self.pid:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    def cpu_s(self) -> Optional[float]:
+        if not self.pid:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.ticks  # utime + stime
+        except (OSError, IndexError, ValueError):
+            return None
+
+
+def launch_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["ROOM_PHASE_DURATIONS"] = json.dumps({rt: FAST_PHASES for rt in ("free", "bronze", "silver", "gold", "freeroll")})
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["ENABLE_BENCH_ENDPOINTS"] = "1"
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+
+
+async def wait_for_server(url: str, timeout: float = 60.0):
+    async with httpx.AsyncClient(base_url=url) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up within {timeout:.0f}s")
+
+
+# ── Clients ──────────────────────────────────────────────────────────
+
+class Collector:
+    """Receive timestamps per (event, key) across all clients"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.arrivals: Dict[str, List[float]] = defaultdict(list)
+        self.waiters: Dict[str, tuple] = {}  # key -> (expected, asyncio.Event)
+
+    def record(self, key: str, received_at: float, latency: Optional[float] = None):
+        self.arrivals[key].append(received_at)
+        if latency is not None:
+            self.latencies[key].append(latency)
+        waiter = self.waiters.get(key)
+        if waiter is not None and len(self.arrivals[key]) >= waiter[0]:
+            waiter[1].set()
+
+    async def wait(self, key: str, expected: int, timeout: float) -> bool:
+        event = asyncio.Event()
+        self.waiters[key] = (expected, event)
+        if len(self.arrivals[key]) >= expected:
+            return True
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters.pop(key, None)
+
+
+def make_client(collector: Collector) -> socketio.AsyncClient:
+    client = socketio.AsyncClient(reconnection=False)
+
+    @client.on("socket_probe")
+    async def on_probe(data):
+        now = time.time()
+        collector.record(f"probe:{data['probe_id']}", now, now - data["sent_at"])
+
+    @client.on("game_finished")
+    async def on_game_finished(data):
+        now = time.time()
+        latency = None
+        finished_at = data.get("finished_at") if isinstance(data, dict) else None
+        if finished_at:
+            latency = now - datetime.fromisoformat(str(finished_at).replace("Z", "+00:00")).timestamp()
+        collector.record(f"game_finished:{data.get('match_id')}", now, latency)
+
+    for event in ("room_ready", "redirect_home"):
+        async def handler(data, event=event):
+            collector.record(f"{event}:{data.get('match_id')}", time.time())
+        client.on(event, handler)
+
+    @client.on("room_joined_confirmed")
+    async def on_joined(data):
+        collector.record("joined", time.time())
+
+    return client
+
+
+async def connect_all(url: str, count: int, collector: Collector, batch: int) -> Tuple[List[socketio.AsyncClient], List[float], int]:
+    clients, connect_times, failed = [], [], 0
+
+    async def connect_one():
+        nonlocal failed
+        client = make_client(collector)
+        start = time.perf_counter()
+        try:
+            await client.connect(url, socketio_path="/api/socket.io", transports=["websocket"], wait_timeout=30)
+        except Exception:
+            failed += 1
+            return
+        connect_times.append(time.perf_counter() - start)
+        clients.append(client)
+
+    for offset in range(0, count, batch):
+        await asyncio.gather(*(connect_one() for _ in range(min(batch, count - offset))))
+    return clients, connect_times, failed
+
+
+# ── Scenarios ────────────────────────────────────────────────────────
+
+async def run_probes(http: httpx.AsyncClient, collector: Collector, proc: ProcStats, mode: str,
+                     rooms: List[str], clients: int, repeats: int, payload_bytes: int) -> Dict:
+    latencies, emit_ms, complete = [], [], 0
+    cpu_before = proc.cpu_s()
+    for _ in range(repeats):
+        probe_id = uuid.uuid4().hex[:12]
+        response = await http.post("/api/admin/socket-probe", params={
+            "admin_key": ADMIN_KEY, "mode": mode, "rooms": ",".join(rooms) if mode == "room" else "",
+            "payload_bytes": payload_bytes, "probe_id": probe_id,
+        })
+        response.raise_for_status()
+        emit_ms.append(response.json()["emit_ms"])
+        if await collector.wait(f"probe:{probe_id}", clients, timeout=30):
+            complete += 1
+        latencies.extend(collector.latencies.pop(f"probe:{probe_id}", []))
+        collector.arrivals.pop(f"probe:{probe_id}", None)
+        await asyncio.sleep(0.2)
+    cpu_after = proc.cpu_s()
+    result = latency_stats(latencies, clients * repeats)
+    result["complete_probes"] = f"{complete}/{repeats}"
+    result["server_emit_ms_p50"] = round(percentile(sorted(emit_ms), 0.5), 2)
+    if cpu_before is not None and cpu_after is not None and latencies:
+        result["server_cpu_us_per_delivery"] = round((cpu_after - cpu_before) / len(latencies) * 1e6, 2)
+    return result
+
+
+async def run_lifecycles(http: httpx.AsyncClient, collector: Collector, room_type: str, clients: int, rounds: int) -> Dict:
+    """Fill a room with a bot and force-start it; collect what every client receives"""
+    per_event: Dict[str, List[float]] = defaultdict(list)
+    spreads: Dict[str, List[float]] = defaultdict(list)
+    seen = set()
+    done = 0
+    params = {"admin_key": ADMIN_KEY}
+    rooms = (await http.get("/api/rooms")).json()["rooms"]
+    bet = next((r["settings"]["min_bet"] for r in rooms if r["room_type"] == room_type), 0)
+    for i in range(rounds):
+        await http.post("/api/admin/add-fake-player", params={**params, "room_type": room_type,
+                                                               "player_name": f"bench{i}", "bet_amount": bet})
+        response = await http.post(f"/api/admin/force-start/{room_type}", params=params)
+        if response.status_code != 200:
+            continue
+        # match_id is only known from the events themselves; wait for the round to play out
+        deadline = time.perf_counter() + 30
+        match_id = None
+        while time.perf_counter() < deadline and match_id is None:
+            await asyncio.sleep(0.1)
+            fresh = [k.split(":", 1)[1] for k in collector.arrivals if k.startswith("room_ready:")]
+            match_id = next((m for m in fresh if m not in seen), None)
+        if match_id is None:
+            continue
+        seen.add(match_id)
+        if await collector.wait(f"redirect_home:{match_id}", clients, timeout=30):
+            done += 1
+        for event in LIFECYCLE_EVENTS:
+            arrivals = sorted(collector.arrivals.pop(f"{event}:{match_id}", []))
+            if arrivals:
+                spreads[event].append(arrivals[-1] - arrivals[0])
+            per_event[event].extend(collector.latencies.pop(f"{event}:{match_id}", []))
+        await asyncio.sleep(1.0)
+    return {
+        "rounds_complete": f"{done}/{rounds}",
+        "game_finished_latency": latency_stats(per_event["game_finished"], clients * rounds),
+        "first_to_last_receive_ms": {
+            event: round(percentile(sorted(values), 0.5) * 1000, 2) for event, values in spreads.items()
+        },
+    }
+
+
+async def bench(args, count: int, proc: ProcStats) -> Dict:
+    collector = Collector()
+    rss_before = proc.rss_mb()
+    clients, connect_times, failed = await connect_all(args.url, count, collector, args.connect_batch)
+    await asyncio.sleep(1.0)
+    rss_after = proc.rss_mb()
+    connected = len(clients)
+
+    # Socket rooms of --room-size, joined the way a seated player joins its game room
+    rooms = [f"bench-{uuid.uuid4().hex[:8]}" for _ in range((connected + args.room_size - 1) // args.room_size)]
+    for i, client in enumerate(clients):
+        await client.emit("join_game_room", {"room_id": rooms[i // args.room_size], "user_id": f"bench_{i}"})
+    await collector.wait("joined", connected, timeout=60)
+
+    result = {
+        "clients": count,
+        "connected": connected,
+        "connect_failed": failed,
+        "connect_p50_ms": round(percentile(sorted(connect_times), 0.5) * 1000, 1),
+        "connect_p99_ms": round(percentile(sorted(connect_times), 0.99) * 1000, 1),
+    }
+    if rss_before is not None and rss_after is not None and connected:
+        result["server_rss_mb"] = round(rss_after, 1)
+        result["server_kb_per_connection"] = round((rss_after - rss_before) * 1024 / connected, 1)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as http:
+        result["probe_global"] = await run_probes(http, collector, proc, "global", [], connected,
+                                                  args.repeats, args.payload_bytes)
+        result["probe_room"] = await run_probes(http, collector, proc, "room", rooms, connected,
+                                                args.repeats, args.payload_bytes)
+        result["probe_room"]["rooms"] = len(rooms)
+        if args.rounds:
+            result["lifecycle"] = await run_lifecycles(http, collector, args.room_type, connected, args.rounds)
+
+    await asyncio.gather(*(client.disconnect() for client in clients), return_exceptions=True)
+    await asyncio.sleep(1.0)
+    return result
+
+
+def print_result(r: Dict):
+    print(f"\n=== {r['clients']} clients ({r['connected']} connected, {r['connect_failed']} failed) ===")
+    print(f"connect p50 {r['connect_p50_ms']}ms p99 {r['connect_p99_ms']}ms", end="")
+    if "server_kb_per_connection" in r:
+        print(f" | server RSS {r['server_rss_mb']}MB, {r['server_kb_per_connection']}KB/connection", end="")
+    print()
+    for name in ("probe_global", "probe_room"):
+        p = r[name]
+        extra = f", {p['rooms']} rooms" if "rooms" in p else ""
+        cpu = f", {p['server_cpu_us_per_delivery']}µs CPU/delivery" if "server_cpu_us_per_delivery" in p else ""
+        print(f"{name:<13} p50 {p['p50_ms']:>8}ms  p99 {p['p99_ms']:>8}ms  max {p['max_ms']:>8}ms  "
+              f"recv {p['received']}/{p['expected']}  server emit {p['server_emit_ms_p50']}ms{extra}{cpu}")
+    if "lifecycle" in r:
+        life = r["lifecycle"]
+        g = life["game_finished_latency"]
+        print(f"lifecycle     {life['rounds_complete']} rounds — game_finished p50 {g['p50_ms']}ms p99 {g['p99_ms']}ms; "
+              f"first→last receive {life['first_to_last_receive_ms']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server base URL (default http://127.0.0.1:<port>)")
+    parser.add_argument("--launch", action="store_true", help="start uvicorn server:app locally (short round phases)")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--pid", type=int, help="server pid for RSS/CPU when not using --launch")
+    parser.add_argument("--clients", default="100,500,1000", help="comma-separated client counts")
+    parser.add_argument("--room-size", type=int, default=3, help="sockets per room for room-targeted probes")
+    parser.add_argument("--repeats", type=int, default=10, help="probes per mode")
+    parser.add_argument("--payload-bytes", type=int, default=1500, help="probe padding (~game_finished size)")
+    parser.add_argument("--rounds", type=int, default=3, help="real room lifecycles per client count (0 = skip)")
+    parser.add_argument("--room-type", default="bronze")
+    parser.add_argument("--connect-batch", type=int, default=100, help="connections opened concurrently")
+    parser.add_argument("--json", dest="json_out", help="write results here")
+    args = parser.parse_args()
+    args.url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    counts = [int(c) for c in args.clients.split(",") if c.strip()]
+
+    server = launch_server(args.port) if args.launch else None
+    proc = ProcStats(server.pid if server is not None else args.pid)
+    results = []
+    try:
+        if server is not None:
+            asyncio.run(wait_for_server(args.url))
+        for count in counts:
+            result = asyncio.run(bench(args, count, proc))
+            print_result(result)
+            results.append(result)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Clock
+Time source and sleep for the game engine and the background schedulers.
+
+Timed engine code goes through the global `clock`: clock.time() / clock.now()
+for wall time, clock.monotonic() for intervals and `await clock.sleep()` for
+waits. Normally these are time.time, time.monotonic and asyncio.sleep.
+
+simulate.py runs the engine on a VirtualTimeLoop and calls clock.use_loop():
+time then comes from the loop, and whenever nothing is runnable the loop jumps
+straight to its next timer. Round phases, the 5s wallet poll, the 15s payment
+rescan and the hourly cleanup cost no wall time, and call_later users (round
+scheduler, lobby broadcaster, event throttle) follow the same virtual time.
+"""
+
+import asyncio
+import selectors
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time only advances when every task is waiting on a timer"""
+
+    def __init__(self, start: float = 0.0):
+        super().__init__(selectors.DefaultSelector())
+        self._virtual_now = start
+        self._executor_jobs = 0
+        self.advanced = 0.0  # virtual seconds skipped while idle
+        select = self._selector.select
+
+        def virtual_select(timeout=None):
+            if self._executor_jobs or timeout is None:
+                # A worker thread (or nothing at all) is pending: wait for it for real
+                return select(timeout if timeout == 0 else None)
+            events = select(0)
+            if not events and timeout > 0:
+                self._virtual_now += timeout
+                self.advanced += timeout
+            return events
+
+        self._selector.select = virtual_select
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    def run_in_executor(self, executor, func, *args):
+        # Thread work (journal fsync, to_thread) takes zero virtual time: the loop
+        # does not skip ahead while it is running
+        future = super().run_in_executor(executor, func, *args)
+        self._executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, _future):
+        self._executor_jobs -= 1
+
+
+class Clock:
+    """time / monotonic / sleep — real by default, loop-driven under simulation"""
+
+    def __init__(self):
+        self._loop: Optional[VirtualTimeLoop] = None
+        self._epoch = 0.0
+
+    @property
+    def virtual(self) -> bool:
+        return self._loop is not None
+
+    def use_loop(self, loop: VirtualTimeLoop, epoch: Optional[float] = None):
+        """Follow `loop`'s virtual time; wall time starts at `epoch` (default: now)"""
+        self._loop = loop
+        self._epoch = (time.time() if epoch is None else epoch) - loop.time()
+
+    def use_system(self):
+        self._loop = None
+        self._epoch = 0.0
+
+    def time(self) -> float:
+        if self._loop is not None:
+            return self._epoch + self._loop.time()
+        return time.time()
+
+    def now(self) -> datetime:
+        """Aware UTC datetime (replaces datetime.now(timezone.utc) in timed code)"""
+        if self._loop is not None:
+            return datetime.fromtimestamp(self.time(), timezone.utc)
+        return datetime.now(timezone.utc)
+
+    def monotonic(self) -> float:
+        if self._loop is not None:
+            return self._loop.time()
+        return time.monotonic()
+
+    async def sleep(self, seconds: float, result=None):
+        # asyncio.sleep is already virtual on a VirtualTimeLoop; this is the seam
+        # engine code waits through so the time source stays in one place
+        return await asyncio.sleep(seconds, result)
+
+
+# Global clock
+clock = Clock()
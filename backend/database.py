@@ -4,13 +4,114 @@ database.py — asyncpg connection pool for PostgreSQL
 import asyncpg
 import os
 import logging
+import time
 from typing import Optional
 
+from metrics import metrics, db_acquire_wait
+from query_stats import query_stats, status_rows
+
 _pool: Optional[asyncpg.Pool] = None
+_instrumented: Optional["InstrumentedPool"] = None
+
+
+def _found(value) -> int:
+    return 0 if value is None else 1
+
+
+class InstrumentedConnection:
+    """Connection proxy timing each statement into query_stats; the rest passes through"""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+
+    async def _timed(self, method: str, query: str, args, kwargs, rows_of):
+        start = time.perf_counter()
+        try:
+            result = await getattr(self._conn, method)(query, *args, **kwargs)
+        except Exception:
+            query_stats.record(query, args, time.perf_counter() - start, None, failed=True)
+            raise
+        query_stats.record(query, args, time.perf_counter() - start, rows_of(result))
+        return result
+
+    def fetch(self, query: str, *args, **kwargs):
+        return self._timed("fetch", query, args, kwargs, len)
+
+    def fetchrow(self, query: str, *args, **kwargs):
+        return self._timed("fetchrow", query, args, kwargs, _found)
+
+    def fetchval(self, query: str, *args, **kwargs):
+        return self._timed("fetchval", query, args, kwargs, _found)
+
+    def execute(self, query: str, *args, **kwargs):
+        return self._timed("execute", query, args, kwargs, status_rows)
+
+    async def executemany(self, command: str, args, **kwargs):
+        start = time.perf_counter()
+        try:
+            await self._conn.executemany(command, args, **kwargs)
+        except Exception:
+            query_stats.record(command, (), time.perf_counter() - start, None, failed=True)
+            raise
+        query_stats.record(command, (), time.perf_counter() - start, len(args) if hasattr(args, '__len__') else None)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _unwrap(conn):
+    return conn._conn if isinstance(conn, InstrumentedConnection) else conn
+
+
+class _AcquireContext:
+    """Times the wait for a connection; usable as `async with` or `await`"""
+
+    __slots__ = ("_pool", "_timeout", "_conn")
+
+    def __init__(self, pool: asyncpg.Pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def _acquire(self):
+        start = time.perf_counter()
+        conn = await self._pool.acquire(timeout=self._timeout)
+        elapsed = time.perf_counter() - start
+        db_acquire_wait.observe(elapsed)
+        query_stats.record_acquire(elapsed)
+        return InstrumentedConnection(conn)
+
+    async def __aenter__(self):
+        self._conn = await self._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc):
+        await self._pool.release(self._conn._conn)
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+
+class InstrumentedPool:
+    """asyncpg pool proxy recording acquire wait and statement timings; everything else passes through"""
+
+    def __init__(self, pool: asyncpg.Pool):
+        self._pool = pool
+
+    def acquire(self, *, timeout=None) -> _AcquireContext:
+        return _AcquireContext(self._pool, timeout)
+
+    async def release(self, connection, *, timeout=None):
+        await self._pool.release(_unwrap(connection), timeout=timeout)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
 
 
 async def create_pool() -> asyncpg.Pool:
-    global _pool
+    global _pool, _instrumented
     database_url = os.environ.get('DATABASE_URL')
     if database_url:
         # Render provides postgresql:// but asyncpg needs postgresql://
@@ -29,6 +130,7 @@ async def create_pool() -> asyncpg.Pool:
             command_timeout=30,
         )
         logging.info(f"🐘 PostgreSQL: Connected to '{os.environ.get('PG_DB', 'casino_db')}'")
+    _instrumented = InstrumentedPool(_pool)
     return _pool
 
 
@@ -42,4 +144,13 @@ async def close_pool():
 def get_pool() -> asyncpg.Pool:
     if _pool is None:
         raise RuntimeError("Database pool not initialized. Call create_pool() first.")
-    return _pool
+    return _instrumented
+
+
+def _pool_stat(name: str) -> float:
+    return getattr(_pool, name)() if _pool is not None else 0
+
+
+metrics.gauge("db_pool_size", "Open connections in the asyncpg pool", function=lambda: _pool_stat("get_size"))
+metrics.gauge("db_pool_idle", "Idle connections in the asyncpg pool", function=lambda: _pool_stat("get_idle_size"))
+metrics.gauge("db_pool_max_size", "Configured pool max_size", function=lambda: _pool_stat("get_max_size"))
@@ -2,12 +2,20 @@
 db_queries.py — All PostgreSQL database operations (replaces MongoDB/Motor calls)
 Each function corresponds to one or more MongoDB operations from the original server.py.
 """
+import asyncio
 import json
 import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone
 
 from database import get_pool
+from metrics import db_call_latency, db_call_errors
+from query_stats import current_call
+from tracing import tracer
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -68,26 +76,222 @@ def _rows_to_list(rows) -> List[Dict]:
     return [_row_to_dict(r) for r in rows]
 
 
+# Called with the updated user row after any token_balance change (leaderboard cache)
+_balance_listeners: List = []
+
+
+def add_balance_listener(listener):
+    _balance_listeners.append(listener)
+
+
+def _notify_balance(user: Optional[Dict]):
+    if user is None:
+        return
+    for listener in _balance_listeners:
+        try:
+            listener(user)
+        except Exception as e:
+            logging.error(f"balance listener error: {e}")
+
+
+# ─────────────────────────────────────────────────────────────────
+# USER CACHE — read-through LRU/TTL for get_user_by_id / _by_telegram_id
+# ─────────────────────────────────────────────────────────────────
+
+class UserCache:
+    """Bounded LRU of user rows keyed by id, with a telegram_id index.
+    Writes in this module refresh (RETURNING *) or invalidate entries; other
+    workers are told via NOTIFY on USER_CACHE_CHANNEL."""
+
+    def __init__(self, max_entries: int = 5000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._users: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (expires_at, row)
+        self._by_telegram: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+        self.writes = 0  # bumped by every write/invalidation, see fill()
+
+    def get_by_id(self, user_id: str) -> Optional[Dict]:
+        entry = self._users.get(user_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(user_id)
+            self.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.hits += 1
+        return dict(entry[1])  # callers mutate the returned doc
+
+    def get_by_telegram_id(self, telegram_id: int) -> Optional[Dict]:
+        user_id = self._by_telegram.get(telegram_id)
+        if user_id is None:
+            self.misses += 1
+            return None
+        return self.get_by_id(user_id)
+
+    def fill(self, user: Optional[Dict], writes_before: int):
+        """Cache a row read from the DB unless a write raced with the read"""
+        if writes_before == self.writes:
+            self.put(user, from_write=False)
+
+    def put(self, user: Optional[Dict], from_write: bool = True):
+        if from_write:
+            self.writes += 1
+        if not user or not user.get('id'):
+            return
+        self._users[user['id']] = (time.monotonic() + self.ttl, dict(user))
+        self._users.move_to_end(user['id'])
+        if user.get('telegram_id') is not None:
+            self._by_telegram[user['telegram_id']] = user['id']
+        while len(self._users) > self.max_entries:
+            self._drop(next(iter(self._users)))
+
+    def invalidate(self, user_id: Optional[str] = None, telegram_id: Optional[int] = None):
+        self.writes += 1
+        if user_id is None and telegram_id is not None:
+            user_id = self._by_telegram.pop(telegram_id, None)
+        if user_id is not None and user_id in self._users:
+            self._drop(user_id)
+            self.invalidations += 1
+
+    def clear(self):
+        self.writes += 1
+        self._users.clear()
+        self._by_telegram.clear()
+
+    def _drop(self, user_id: str):
+        entry = self._users.pop(user_id, None)
+        telegram_id = entry[1].get('telegram_id') if entry else None
+        if telegram_id is not None and self._by_telegram.get(telegram_id) == user_id:
+            del self._by_telegram[telegram_id]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._users),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "remote_invalidations": self.remote_invalidations,
+            "cross_process": _listener_conn is not None,
+        }
+
+
+user_cache = UserCache(
+    max_entries=int(os.environ.get('USER_CACHE_SIZE', '5000')),
+    ttl=float(os.environ.get('USER_CACHE_TTL', '30')),
+)
+
+USER_CACHE_CHANNEL = 'user_cache'
+_PROCESS_TOKEN = uuid.uuid4().hex[:12]  # lets a worker ignore its own notifications
+_listener_conn = None
+
+
+async def _publish_user_change(conn, user_id: Optional[str] = None, telegram_id: Optional[int] = None):
+    """Tell other workers to drop a user, or every user when no key is given
+    (no-op unless the LISTEN side is running)"""
+    if _listener_conn is None:
+        return
+    if user_id is not None:
+        key = f"id:{user_id}"
+    elif telegram_id is not None:
+        key = f"tg:{telegram_id}"
+    else:
+        key = '*'
+    try:
+        await conn.execute("SELECT pg_notify($1, $2)", USER_CACHE_CHANNEL, f"{_PROCESS_TOKEN}|{key}")
+    except Exception as e:
+        logging.error(f"user cache notify error: {e}")
+
+
+def _on_user_cache_notify(conn, pid, channel, payload):
+    token, _, key = payload.partition('|')
+    if token == _PROCESS_TOKEN:
+        return
+    user_cache.remote_invalidations += 1
+    if key == '*':
+        user_cache.clear()
+    elif key.startswith('id:'):
+        user_cache.invalidate(user_id=key[3:])
+    elif key.startswith('tg:'):
+        user_cache.invalidate(telegram_id=int(key[3:]))
+
+
+async def start_user_cache_listener():
+    """LISTEN for invalidations from other workers (only needed with >1 process)"""
+    global _listener_conn
+    if _listener_conn is not None:
+        return
+    conn = await get_pool().acquire()
+    await conn.add_listener(USER_CACHE_CHANNEL, _on_user_cache_notify)
+    _listener_conn = conn
+
+
+async def stop_user_cache_listener():
+    global _listener_conn
+    conn, _listener_conn = _listener_conn, None
+    if conn is not None:
+        try:
+            await conn.remove_listener(USER_CACHE_CHANNEL, _on_user_cache_notify)
+        finally:
+            await get_pool().release(conn)
+
+
+def get_user_cache_stats() -> Dict:
+    return user_cache.stats()
+
+
+async def _user_written(conn, row, balance_changed: bool = False, user: Optional[Dict] = None) -> Optional[Dict]:
+    """Refresh the cache from a RETURNING * row and fan out the change"""
+    if user is None:
+        user = _row_to_dict(row)
+    if user is None:
+        return None
+    user_cache.put(user)
+    await _publish_user_change(conn, user_id=user['id'])
+    if balance_changed:
+        _notify_balance(user)
+    return user
+
+
 # ─────────────────────────────────────────────────────────────────
 # USERS
 # ─────────────────────────────────────────────────────────────────
 
 async def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict]:
+    cached = user_cache.get_by_telegram_id(telegram_id)
+    if cached is not None:
+        return cached
+    writes_before = user_cache.writes
     pool = get_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             "SELECT * FROM users WHERE telegram_id = $1", telegram_id
         )
-        return _row_to_dict(row)
+        user = _row_to_dict(row)
+        user_cache.fill(user, writes_before)
+        return user
 
 
 async def get_user_by_id(user_id: str) -> Optional[Dict]:
+    cached = user_cache.get_by_id(user_id)
+    if cached is not None:
+        return cached
+    writes_before = user_cache.writes
     pool = get_pool()
     async with pool.acquire() as conn:
         row = await conn.fetchrow(
             "SELECT * FROM users WHERE id = $1", user_id
         )
-        return _row_to_dict(row)
+        user = _row_to_dict(row)
+        user_cache.fill(user, writes_before)
+        return user
 
 
 async def get_user_by_username(username: str) -> Optional[Dict]:
@@ -99,46 +303,146 @@ async def get_user_by_username(username: str) -> Optional[Dict]:
         return _row_to_dict(row)
 
 
+_USER_INSERT = """
+    INSERT INTO users (
+        id, telegram_id, first_name, last_name, telegram_username,
+        photo_url, wallet_address, personal_solana_address,
+        derived_solana_address, derivation_path,
+        token_balance, is_verified, is_admin, is_owner, role,
+        last_daily_claim, created_at, last_login
+    ) VALUES (
+        $1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14,$15,$16,$17,$18
+    )
+"""
+
+
+def _user_insert_args(user_dict: Dict) -> tuple:
+    return (
+        user_dict.get('id'),
+        user_dict.get('telegram_id'),
+        user_dict.get('first_name', ''),
+        user_dict.get('last_name'),
+        user_dict.get('telegram_username'),
+        user_dict.get('photo_url'),
+        user_dict.get('wallet_address'),
+        user_dict.get('personal_solana_address'),
+        user_dict.get('derived_solana_address'),
+        user_dict.get('derivation_path'),
+        user_dict.get('token_balance', 0),
+        user_dict.get('is_verified', False),
+        user_dict.get('is_admin', False),
+        user_dict.get('is_owner', False),
+        user_dict.get('role', 'user'),
+        _parse_dt(user_dict.get('last_daily_claim')),
+        _parse_dt(user_dict.get('created_at')) or datetime.now(timezone.utc),
+        _parse_dt(user_dict.get('last_login')) or datetime.now(timezone.utc),
+    )
+
+
 async def insert_user(user_dict: Dict) -> bool:
     pool = get_pool()
     async with pool.acquire() as conn:
         try:
-            await conn.execute("""
-                INSERT INTO users (
-                    id, telegram_id, first_name, last_name, telegram_username,
-                    photo_url, wallet_address, personal_solana_address,
-                    derived_solana_address, derivation_path,
-                    token_balance, is_verified, is_admin, is_owner, role,
-                    last_daily_claim, created_at, last_login
-                ) VALUES (
-                    $1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12,$13,$14,$15,$16,$17,$18
-                )
-            """,
-                user_dict.get('id'),
-                user_dict.get('telegram_id'),
-                user_dict.get('first_name', ''),
-                user_dict.get('last_name'),
-                user_dict.get('telegram_username'),
-                user_dict.get('photo_url'),
-                user_dict.get('wallet_address'),
-                user_dict.get('personal_solana_address'),
-                user_dict.get('derived_solana_address'),
-                user_dict.get('derivation_path'),
-                user_dict.get('token_balance', 0),
-                user_dict.get('is_verified', False),
-                user_dict.get('is_admin', False),
-                user_dict.get('is_owner', False),
-                user_dict.get('role', 'user'),
-                _parse_dt(user_dict.get('last_daily_claim')),
-                _parse_dt(user_dict.get('created_at')) or datetime.now(timezone.utc),
-                _parse_dt(user_dict.get('last_login')) or datetime.now(timezone.utc),
-            )
+            await conn.execute(_USER_INSERT, *_user_insert_args(user_dict))
+            if user_dict.get('token_balance'):
+                _notify_balance(user_dict)
             return True
         except Exception as e:
             logging.error(f"insert_user error: {e}")
             return False
 
 
+async def upsert_telegram_user(user_dict: Dict, force_balance: Optional[int] = None) -> tuple:
+    """Create the user or refresh last_login in one round trip.
+    Returns (user, created). force_balance also overwrites an existing balance (admin)."""
+    args = _user_insert_args(user_dict)
+    if force_balance is not None:
+        args = args[:10] + (force_balance,) + args[11:]
+    on_conflict = "last_login = EXCLUDED.last_login"
+    if force_balance is not None:
+        on_conflict += ", token_balance = EXCLUDED.token_balance"
+    async with get_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            _USER_INSERT + f" ON CONFLICT (telegram_id) DO UPDATE SET {on_conflict}"
+                           " RETURNING *, (xmax = 0) AS created",
+            *args
+        )
+        user = _row_to_dict(row)
+        created = user.pop('created')
+        await _user_written(conn, None, balance_changed=created or force_balance is not None, user=user)
+        return user, created
+
+
+async def telegram_login(user_dict: Dict, force_balance: Optional[int] = None) -> tuple:
+    """Auth fast path: a cached user only gets its last_login queued for the
+    write-behind flusher (no round trip); anything else goes through the upsert."""
+    if force_balance is None:
+        cached = user_cache.get_by_telegram_id(user_dict['telegram_id'])
+        if cached is not None:
+            now = datetime.now(timezone.utc)
+            last_login_writer.touch(cached['telegram_id'], now)
+            cached['last_login'] = now.isoformat()
+            user_cache.put(cached)
+            return cached, False
+    return await upsert_telegram_user(user_dict, force_balance)
+
+
+class LastLoginWriter:
+    """Write-behind for last_login: batches touches into one UPDATE per interval"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._pending: Dict[int, datetime] = {}
+        self._task = None
+        self.flushed = 0
+
+    def touch(self, telegram_id: int, when: datetime):
+        self._pending[telegram_id] = when
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        token = current_call.set("LastLoginWriter.flush")
+        try:
+            async with get_pool().acquire() as conn:
+                await conn.execute("""
+                    UPDATE users AS u SET last_login = v.ts
+                    FROM unnest($1::bigint[], $2::timestamptz[]) AS v(telegram_id, ts)
+                    WHERE u.telegram_id = v.telegram_id
+                """, list(pending.keys()), list(pending.values()))
+            self.flushed += len(pending)
+        except Exception as e:
+            logging.error(f"last_login flush error: {e}")
+            # Keep newer touches that arrived meanwhile
+            for telegram_id, when in pending.items():
+                self._pending.setdefault(telegram_id, when)
+        finally:
+            current_call.reset(token)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+last_login_writer = LastLoginWriter()
+
+
 async def update_user_fields(user_id: str, fields: Dict) -> bool:
     """Update user by internal id (UUID string)."""
     if not fields:
@@ -157,10 +461,11 @@ async def update_user_fields(user_id: str, fields: Dict) -> bool:
         return False
     async with get_pool().acquire() as conn:
         sets = ', '.join(f"{k} = ${i+2}" for i, k in enumerate(filtered))
-        await conn.execute(
-            f"UPDATE users SET {sets} WHERE id = $1",
+        row = await conn.fetchrow(
+            f"UPDATE users SET {sets} WHERE id = $1 RETURNING *",
             user_id, *filtered.values()
         )
+        await _user_written(conn, row, 'token_balance' in filtered)
         return True
 
 
@@ -181,10 +486,11 @@ async def update_user_fields_by_telegram_id(telegram_id: int, fields: Dict) -> b
         return False
     async with get_pool().acquire() as conn:
         sets = ', '.join(f"{k} = ${i+2}" for i, k in enumerate(filtered))
-        await conn.execute(
-            f"UPDATE users SET {sets} WHERE telegram_id = $1",
+        row = await conn.fetchrow(
+            f"UPDATE users SET {sets} WHERE telegram_id = $1 RETURNING *",
             telegram_id, *filtered.values()
         )
+        await _user_written(conn, row, 'token_balance' in filtered)
         return True
 
 
@@ -195,7 +501,18 @@ async def increment_user_tokens(user_id: str, amount: int) -> Optional[Dict]:
             "UPDATE users SET token_balance = token_balance + $2 WHERE id = $1 RETURNING *",
             user_id, amount
         )
-        return _row_to_dict(row)
+        return await _user_written(conn, row, balance_changed=True)
+
+
+async def debit_user_tokens(user_id: str, amount: int) -> Optional[Dict]:
+    """Balance check + debit in one statement; None if the user is missing or short of tokens."""
+    async with get_pool().acquire() as conn:
+        row = await conn.fetchrow(
+            "UPDATE users SET token_balance = token_balance - $2 "
+            "WHERE id = $1 AND token_balance >= $2 RETURNING *",
+            user_id, amount
+        )
+        return await _user_written(conn, row, balance_changed=True)
 
 
 async def increment_user_tokens_by_telegram_id(telegram_id: int, amount: int) -> Optional[Dict]:
@@ -204,7 +521,7 @@ async def increment_user_tokens_by_telegram_id(telegram_id: int, amount: int) ->
             "UPDATE users SET token_balance = token_balance + $2 WHERE telegram_id = $1 RETURNING *",
             telegram_id, amount
         )
-        return _row_to_dict(row)
+        return await _user_written(conn, row, balance_changed=True)
 
 
 async def get_leaderboard(limit: int = 10) -> List[Dict]:
@@ -217,6 +534,17 @@ async def get_leaderboard(limit: int = 10) -> List[Dict]:
         return _rows_to_list(rows)
 
 
+async def get_top_balances(limit: int = 50) -> List[Dict]:
+    """Top users with their id — seeds the in-memory leaderboard"""
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch(
+            """SELECT id, first_name, telegram_username, token_balance, photo_url
+               FROM users ORDER BY token_balance DESC LIMIT $1""",
+            limit
+        )
+        return _rows_to_list(rows)
+
+
 async def search_users(query: str, limit: int = 50) -> List[Dict]:
     pattern = f"%{query}%"
     async with get_pool().acquire() as conn:
@@ -303,9 +631,10 @@ async def get_recent_prizes(limit: int = 10) -> List[Dict]:
 # ─────────────────────────────────────────────────────────────────
 
 async def insert_completed_game(game_doc: Dict) -> bool:
+    """Persist a finished round; False when it failed or the id was already stored"""
     async with get_pool().acquire() as conn:
         try:
-            await conn.execute("""
+            result = await conn.execute("""
                 INSERT INTO completed_games
                     (id, room_type, players, status, prize_pool, winner,
                      prize_link, match_id, round_number, created_at, started_at, finished_at)
@@ -325,7 +654,7 @@ async def insert_completed_game(game_doc: Dict) -> bool:
                 _to_dt(game_doc.get('started_at')),
                 _to_dt(game_doc.get('finished_at')) or datetime.now(timezone.utc),
             )
-            return True
+            return result == "INSERT 0 1"
         except Exception as e:
             logging.error(f"insert_completed_game error: {e}", exc_info=True)
             return False
@@ -503,6 +832,25 @@ async def get_all_temporary_wallets_monitoring() -> List[Dict]:
         return _rows_to_list(rows)
 
 
+async def get_completed_temporary_wallets() -> List[Dict]:
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch("SELECT * FROM temporary_wallets WHERE status = 'completed'")
+        return _rows_to_list(rows)
+
+
+async def delete_abandoned_temporary_wallets(created_before: datetime) -> int:
+    """Drop wallets that never received a payment and were created before the cutoff."""
+    async with get_pool().acquire() as conn:
+        result = await conn.execute(
+            """DELETE FROM temporary_wallets
+               WHERE payment_detected = FALSE
+                 AND tokens_credited = FALSE
+                 AND created_at < $1""",
+            created_before
+        )
+        return int(result.split()[-1]) if result else 0
+
+
 # ─────────────────────────────────────────────────────────────────
 # ADMIN — new management functions
 # ─────────────────────────────────────────────────────────────────
@@ -512,6 +860,8 @@ async def ban_user(telegram_id: int) -> bool:
         result = await conn.execute(
             "UPDATE users SET is_banned = TRUE WHERE telegram_id = $1", telegram_id
         )
+        user_cache.invalidate(telegram_id=telegram_id)
+        await _publish_user_change(conn, telegram_id=telegram_id)
         return result == "UPDATE 1"
 
 
@@ -520,6 +870,8 @@ async def unban_user(telegram_id: int) -> bool:
         result = await conn.execute(
             "UPDATE users SET is_banned = FALSE WHERE telegram_id = $1", telegram_id
         )
+        user_cache.invalidate(telegram_id=telegram_id)
+        await _publish_user_change(conn, telegram_id=telegram_id)
         return result == "UPDATE 1"
 
 
@@ -530,6 +882,8 @@ async def set_user_role(telegram_id: int, is_admin: bool, is_owner: bool) -> boo
             "UPDATE users SET is_admin = $2, is_owner = $3, role = $4 WHERE telegram_id = $1",
             telegram_id, is_admin, is_owner, role
         )
+        user_cache.invalidate(telegram_id=telegram_id)
+        await _publish_user_change(conn, telegram_id=telegram_id)
         return result == "UPDATE 1"
 
 
@@ -651,10 +1005,11 @@ async def use_promo_code(code: str, telegram_id: int) -> Dict:
                 "UPDATE promo_codes SET uses_count = uses_count + 1 WHERE code = $1",
                 code.upper()
             )
-            await conn.execute(
-                "UPDATE users SET token_balance = token_balance + $2 WHERE telegram_id = $1",
+            row = await conn.fetchrow(
+                "UPDATE users SET token_balance = token_balance + $2 WHERE telegram_id = $1 RETURNING *",
                 telegram_id, promo["token_amount"]
             )
+            await _user_written(conn, row, balance_changed=True)
             return {"success": True, "tokens": promo["token_amount"], "error": ""}
 
 
@@ -763,6 +1118,8 @@ async def get_user_stats(user_id: str) -> Dict:
 async def delete_all_data() -> Dict:
     async with get_pool().acquire() as conn:
         r_users     = await conn.execute("DELETE FROM users")
+        user_cache.clear()
+        await _publish_user_change(conn)
         r_games     = await conn.execute("DELETE FROM completed_games")
         r_prizes    = await conn.execute("DELETE FROM winner_prizes")
         r_pending   = await conn.execute("DELETE FROM pending_results")
@@ -776,3 +1133,40 @@ async def delete_all_data() -> Dict:
             "token_purchases":   int(r_purchases.split()[-1]),
             "temporary_wallets": int(r_wallets.split()[-1]),
         }
+
+
+# ─────────────────────────────────────────────────────────────────
+# METRICS — every public coroutine above is timed per function name,
+# its statements are attributed to it in query_stats, and it shows up
+# as a db.<name> child span inside a sampled trace
+# ─────────────────────────────────────────────────────────────────
+
+def _timed(name: str, fn):
+    latency = db_call_latency.labels(name)
+    errors = db_call_errors.labels(name)
+
+    span_name = 'db.' + name
+
+    async def wrapper(*args, **kwargs):
+        token = current_call.set(name)
+        start = time.perf_counter()
+        try:
+            with tracer.child(span_name):
+                return await fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+            current_call.reset(token)
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+for _name, _fn in list(globals().items()):
+    if not _name.startswith('_') and asyncio.iscoroutinefunction(_fn) and _fn.__module__ == __name__ \
+            and _name not in ('start_user_cache_listener', 'stop_user_cache_listener'):
+        globals()[_name] = _timed(_name, _fn)
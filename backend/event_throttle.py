@@ -0,0 +1,164 @@
+"""
+Event Throttling & Batching
+Per-sender token buckets for chat/reactions, a duplicate filter that merges
+the two sends of one chat message (socket + REST fallback, matched by the
+client's message id), and a
+per-room reaction batcher that fans out one `reactions_batch` frame per
+interval with emoji counts instead of one event per reaction.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottleStats:
+    """Counters per event kind: received / dropped / merged / emitted"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def incr(self, kind: str, counter: str, amount: int = 1):
+        bucket = self._counters.setdefault(kind, {"received": 0, "dropped": 0, "merged": 0, "emitted": 0})
+        bucket[counter] += amount
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {kind: dict(counters) for kind, counters in self._counters.items()}
+
+
+class TokenBucketLimiter:
+    """Token bucket per key (socket id or user id)"""
+
+    def __init__(self, rate: float, burst: int, idle_ttl: float = 600.0):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.idle_ttl = idle_ttl
+        self._buckets: Dict[str, list] = {}  # key -> [tokens, last_refill]
+        self._last_sweep = time.monotonic()
+
+    def allow(self, key: str, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if now - self._last_sweep > self.idle_ttl:
+            self._sweep(now)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return True
+        return False
+
+    def forget(self, key: str):
+        self._buckets.pop(key, None)
+
+    def _sweep(self, now: float):
+        self._last_sweep = now
+        for key in [k for k, (_, last) in self._buckets.items() if now - last > self.idle_ttl]:
+            del self._buckets[key]
+
+
+class DuplicateFilter:
+    """Remembers recent keys for `window` seconds so repeats can be merged"""
+
+    def __init__(self, window: float = 3.0, max_entries: int = 5000):
+        self.window = window
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[Tuple, Tuple[float, object]]" = OrderedDict()
+
+    def lookup(self, key: Tuple):
+        """Return the value stored for a key seen within the window, else None"""
+        self._prune(time.monotonic())
+        entry = self._seen.get(key)
+        return entry[1] if entry else None
+
+    def remember(self, key: Tuple, value):
+        self._seen[key] = (time.monotonic(), value)
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+
+    def _prune(self, now: float):
+        while self._seen:
+            _, (seen_at, _) = next(iter(self._seen.items()))
+            if now - seen_at <= self.window:
+                break
+            self._seen.popitem(last=False)
+
+
+def chat_dedupe_key(room_id: str, user_id: str, client_id: str, text: str) -> Tuple:
+    """
+    Key matching only resubmits of the same chat message
+
+    Clients tag each message with an id sent on both the socket and the REST
+    fallback, so a user repeating "gg" gets two messages. Clients without an
+    id fall back to the text.
+    """
+    if client_id:
+        return (room_id, user_id, "id", client_id)
+    return (room_id, user_id, "text", text)
+
+
+class ReactionBatcher:
+    """Aggregates reactions per room and emits one frame per interval"""
+
+    MAX_NAMES = 3  # names shown per emoji in a frame
+
+    def __init__(self, stats: ThrottleStats, interval: Optional[float] = None):
+        self.interval = interval if interval is not None else float(os.environ.get("REACTION_BATCH_INTERVAL", "0.2"))
+        self.stats = stats
+        self._emit: Optional[Callable[..., Awaitable[None]]] = None
+        self._pending: Dict[str, Dict[str, Dict]] = {}  # room_id -> emoji -> {emoji, count, names}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def configure(self, emit: Callable[..., Awaitable[None]]):
+        self._emit = emit
+
+    def add(self, room_id: str, emoji: str, name: str):
+        room = self._pending.setdefault(room_id, {})
+        entry = room.get(emoji)
+        if entry is None:
+            room[emoji] = {"emoji": emoji, "count": 1, "names": [name]}
+        else:
+            entry["count"] += 1
+            if len(entry["names"]) < self.MAX_NAMES and name not in entry["names"]:
+                entry["names"].append(name)
+            self.stats.incr("reaction", "merged")
+        if self._handle is None:
+            self._handle = asyncio.get_running_loop().call_later(self.interval, self._start_flush)
+
+    def _start_flush(self):
+        self._handle = None
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        for room_id, reactions in pending.items():
+            try:
+                # Broadcast globally — client filters by room_id (same pattern as game events)
+                await self._emit('reactions_batch', {'room_id': room_id, 'reactions': list(reactions.values())})
+                self.stats.incr("reaction", "emitted")
+            except Exception as e:
+                logger.error(f"Error emitting reactions for room {room_id}: {e}")
+
+
+# Shared throttling state for socket handlers and REST fallbacks
+throttle_stats = ThrottleStats()
+reaction_limiter = TokenBucketLimiter(rate=4.0, burst=8)
+chat_limiter = TokenBucketLimiter(rate=0.5, burst=5)
+chat_duplicates = DuplicateFilter(window=3.0)
+reaction_batcher = ReactionBatcher(throttle_stats)
+
+
+def forget_sender(key: str):
+    """Drop a disconnected socket's buckets"""
+    reaction_limiter.forget(key)
+    chat_limiter.forget(key)
@@ -0,0 +1,100 @@
+"""
+Fast JSON Encoding
+One JSON codec for REST responses and Socket.IO packets: orjson when it is
+installed (native datetime/UUID/Enum/dataclass support), stdlib json with an
+equivalent default hook otherwise.
+
+- FastJSONResponse: default response class; returning one directly from an
+  endpoint also skips FastAPI's jsonable_encoder pass.
+- RawJSONResponse: send bytes that were already encoded (cached payloads).
+- socketio_json: drop-in `json` module for socketio.AsyncServer.
+"""
+
+import json as _stdlib_json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(value: Any):
+    """Encode types neither encoder handles natively"""
+    if hasattr(value, "to_dict"):  # LiveRoom / LivePlayer
+        return value.to_dict()
+    if hasattr(value, "model_dump"):  # pydantic models
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    # Only reached on the stdlib path — orjson handles these itself
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> bytes:
+        return _stdlib_json.dumps(obj, default=_default, ensure_ascii=False,
+                                  separators=(",", ":")).encode("utf-8")
+
+    def loads(data):
+        return _stdlib_json.loads(data)
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already JSON-encoded bytes"""
+
+    media_type = "application/json"
+
+
+class _SocketIOJSON:
+    """json-module shim for python-socketio / python-engineio packets"""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs) -> str:
+        # engineio passes separators=(',', ':'); the fast encoder is already compact
+        return dumps_str(obj)
+
+    @staticmethod
+    def loads(data, **kwargs):
+        return loads(data)
+
+
+socketio_json = _SocketIOJSON()
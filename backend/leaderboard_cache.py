@@ -0,0 +1,212 @@
+"""
+Leaderboard & Recent Games Cache
+In-memory top-N by token balance and a ring of recently completed games,
+so /leaderboard and /game-history never touch Postgres on the hot path.
+
+The top-N keeps a deeper buffer (`depth` rows) plus a floor: every user
+outside the buffer is known to have a balance <= floor. Balance changes
+arrive from db_queries (add_balance_listener) and keep that invariant
+incrementally; a periodic reconcile reloads from the DB to catch anything
+written outside the app (manual SQL, other workers).
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from clock import clock
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_FIELDS = ("first_name", "telegram_username", "token_balance", "photo_url")
+GAME_FIELDS = ("id", "room_type", "players", "status", "prize_pool", "winner", "prize_link",
+               "match_id", "round_number", "created_at", "started_at", "finished_at")
+
+
+class TopBalances:
+    """Incrementally maintained top users by token_balance"""
+
+    def __init__(self, size: int = 10, depth: int = 50):
+        self.size = size
+        self.depth = depth
+        self._entries: Dict[str, Dict] = {}  # user_id -> public fields
+        self._floor = float("-inf")  # every user not in _entries has balance <= floor
+        self.loaded = False
+
+    def load(self, rows: List[Dict]):
+        """Replace contents with the DB's top `depth` rows (ordered by balance desc)"""
+        self._entries = {row["id"]: {k: row.get(k) for k in PUBLIC_FIELDS} for row in rows}
+        # Fewer rows than depth means every user is in the buffer
+        self._floor = rows[-1].get("token_balance", 0) if len(rows) >= self.depth else float("-inf")
+        self.loaded = True
+
+    def observe(self, user: Dict):
+        """Apply a user row whose token_balance just changed"""
+        if not self.loaded or not user or "id" not in user:
+            return
+        user_id = user["id"]
+        balance = user.get("token_balance", 0) or 0
+        if user_id in self._entries:
+            if balance >= self._floor:
+                self._entries[user_id] = {k: user.get(k) for k in PUBLIC_FIELDS}
+            else:
+                # Dropped below the floor — somebody outside may now outrank them
+                del self._entries[user_id]
+            return
+        if balance <= self._floor:
+            return
+        self._entries[user_id] = {k: user.get(k) for k in PUBLIC_FIELDS}
+        if len(self._entries) > self.depth:
+            lowest = min(self._entries, key=lambda uid: self._entries[uid]["token_balance"] or 0)
+            self._floor = self._entries.pop(lowest)["token_balance"] or 0
+
+    @property
+    def complete(self) -> bool:
+        """True while the buffer still holds enough rows to answer top(size)"""
+        return self.loaded and (len(self._entries) >= self.size or self._floor == float("-inf"))
+
+    def top(self, limit: Optional[int] = None) -> List[Dict]:
+        limit = limit or self.size
+        ranked = sorted(self._entries.values(), key=lambda e: e["token_balance"] or 0, reverse=True)
+        return [dict(e) for e in ranked[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RecentGames:
+    """Ring of the most recently completed games (newest first)"""
+
+    def __init__(self, max_games: int = 20):
+        self.max_games = max_games
+        self._games: Deque[Dict] = deque(maxlen=max_games)
+        self.loaded = False
+
+    def load(self, rows: List[Dict]):
+        self._games = deque((self._project(row) for row in rows[:self.max_games]), maxlen=self.max_games)
+        self.loaded = True
+
+    def append(self, game: Dict):
+        if any(g["id"] == game.get("id") for g in self._games):
+            return
+        self._games.appendleft(self._project(game))
+
+    def latest(self, limit: int) -> List[Dict]:
+        return [self._games[i] for i in range(min(limit, len(self._games)))]
+
+    def clear(self):
+        self._games.clear()
+
+    @staticmethod
+    def _project(game: Dict) -> Dict:
+        # Same shape as a completed_games row
+        return {k: game.get(k) for k in GAME_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+
+class LeaderboardCache:
+    """Owns both structures and the reconcile loop against Postgres"""
+
+    def __init__(self, size: int = 10, depth: int = 50, max_games: int = 20,
+                 reconcile_interval: Optional[float] = None):
+        self.balances = TopBalances(size, depth)
+        self.games = RecentGames(max_games)
+        self.reconcile_interval = reconcile_interval if reconcile_interval is not None else \
+            float(os.environ.get("LEADERBOARD_RECONCILE_INTERVAL", "60"))
+        self._task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.fallbacks = 0
+        self.reconciles = 0
+        self.drift = 0  # reconciles where the cached top-N differed from the DB
+
+    async def load(self):
+        import db_queries as dbq
+        self.balances.load(await dbq.get_top_balances(self.balances.depth))
+        self.games.load(await dbq.get_recent_completed_games(self.games.max_games))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._reload_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._reload_task = None
+
+    def observe_balance(self, user: Dict):
+        self.balances.observe(user)
+        if self.balances.loaded and not self.balances.complete:
+            self._schedule_reload()
+
+    def record_game(self, game: Dict):
+        self.games.append(game)
+
+    async def leaderboard(self, limit: int = 10) -> List[Dict]:
+        if self.balances.complete and limit <= self.balances.depth:
+            self.served += 1
+            return self.balances.top(limit)
+        import db_queries as dbq
+        self.fallbacks += 1
+        return await dbq.get_leaderboard(limit)
+
+    async def recent_games(self, limit: int = 5) -> List[Dict]:
+        if self.games.loaded and limit <= self.games.max_games:
+            self.served += 1
+            return self.games.latest(limit)
+        import db_queries as dbq
+        self.fallbacks += 1
+        return await dbq.get_recent_completed_games(limit)
+
+    async def reconcile(self):
+        """Reload from the DB, counting drift between cache and source of truth"""
+        before = self.balances.top() if self.balances.loaded else None
+        await self.load()
+        self.reconciles += 1
+        if before is not None and before != self.balances.top():
+            self.drift += 1
+            logger.warning("⚠️ Leaderboard cache drifted from DB — reloaded")
+
+    def _schedule_reload(self):
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.create_task(self._reload())
+
+    async def _reload(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Leaderboard reload failed: {e}")
+
+    async def _run(self):
+        while True:
+            await clock.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Leaderboard reconcile failed: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "top_users_buffered": len(self.balances),
+            "top_complete": self.balances.complete,
+            "recent_games": len(self.games),
+            "served_from_memory": self.served,
+            "db_fallbacks": self.fallbacks,
+            "reconciles": self.reconciles,
+            "drift": self.drift,
+            "reconcile_interval": self.reconcile_interval,
+        }
+
+
+# Global cache instance
+leaderboard_cache = LeaderboardCache()
@@ -0,0 +1,397 @@
+"""
+load_test.py — end-to-end load generator for a locally launched server
+Run: python load_test.py --launch --players 500 --duration 120 --join-rate 20
+     python load_test.py --url http://localhost:8001 --players 2000 --room-types free,bronze
+
+Each virtual player behaves like the frontend: authenticates through
+/auth/telegram, keeps a Socket.IO connection (register_user, join_game_room),
+joins rooms at the global --join-rate, and while seated runs the same polling
+cadences as App.js — GET /room/{id} every 500ms, /room-chat/{id} every 1.5s and
+/room-participants/{type} every 2s — until the round finishes, then joins again.
+
+--launch starts `uvicorn server:app` on --port against DATABASE_URL (a local
+Postgres), with short round phases unless --keep-phases is given, and stops it
+at the end. Players are funded through /admin/add-tokens so paid rooms work.
+
+The report lists throughput, latency percentiles and error rate per endpoint
+(route templates) and per Socket.IO event, plus round completion times.
+--json writes the same numbers to a file for comparing runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import socketio
+
+ADMIN_KEY = os.environ.get("LOAD_TEST_ADMIN_KEY", "PRODUCTION_CLEANUP_2025")
+ROOM_POLL, CHAT_POLL, PARTICIPANTS_POLL = 0.5, 1.5, 2.0  # App.js cadences
+FAST_PHASES = {"spin": 1.0, "announce": 1.0, "cleanup": 0.5}
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Recorder:
+    """Latencies and outcomes per operation ("GET /api/room/{room_id}", "sio join_game_room", ...)"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.events: Dict[str, int] = defaultdict(int)
+        self.rounds: List[float] = []
+        self.round_timeouts = 0
+        self.abandoned = 0  # still in a lobby when the run ended (left + refunded)
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def ok(self, op: str, seconds: float):
+        self.latencies[op].append(seconds)
+
+    def fail(self, op: str, seconds: float, reason: str):
+        self.latencies[op].append(seconds)
+        self.errors[op][reason] += 1
+
+    def event(self, name: str):
+        self.events[name] += 1
+
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> Dict:
+        elapsed = self.elapsed()
+        operations = {}
+        for op in sorted(self.latencies):
+            values = sorted(self.latencies[op])
+            failed = sum(self.errors[op].values())
+            operations[op] = {
+                "count": len(values),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p90_ms": round(percentile(values, 0.90) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "error_rate": round(failed / len(values), 4),
+                "errors": dict(self.errors[op]),
+            }
+        rounds = sorted(self.rounds)
+        return {
+            "elapsed_s": round(elapsed, 1),
+            "operations": operations,
+            "events": {name: {"count": n, "per_s": round(n / elapsed, 2)} for name, n in sorted(self.events.items())},
+            "rounds": {
+                "completed": len(rounds),
+                "timed_out": self.round_timeouts,
+                "abandoned": self.abandoned,
+                "p50_s": round(percentile(rounds, 0.50), 2),
+                "p90_s": round(percentile(rounds, 0.90), 2),
+                "max_s": round(rounds[-1], 2) if rounds else 0.0,
+            },
+        }
+
+
+class JoinPacer:
+    """Spreads joins across all players at `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.perf_counter()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class VirtualPlayer:
+    def __init__(self, index: int, args, http: httpx.AsyncClient, rec: Recorder, pacer: JoinPacer, bets: Dict[str, int]):
+        self.index = index
+        self.args = args
+        self.http = http
+        self.rec = rec
+        self.pacer = pacer
+        self.bets = bets
+        self.telegram_id = args.id_base + index
+        self.user_id: Optional[str] = None
+        self.token: Optional[str] = None
+        self.sio = socketio.AsyncClient(reconnection=True, logger=False, engineio_logger=False)
+        self._acks: Dict[str, asyncio.Future] = {}
+        self._finished_rooms: set = set()
+
+    # ── HTTP ─────────────────────────────────────────────────────────
+
+    async def request(self, method: str, op: str, url: str, expect=(200,), **kwargs) -> Optional[httpx.Response]:
+        headers = kwargs.pop("headers", {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.rec.fail(f"{method} {op}", time.perf_counter() - start, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - start
+        if response.status_code in expect:
+            self.rec.ok(f"{method} {op}", elapsed)
+        else:
+            self.rec.fail(f"{method} {op}", elapsed, str(response.status_code))
+        return response
+
+    async def authenticate(self) -> bool:
+        response = await self.request("POST", "/api/auth/telegram", "/api/auth/telegram", json={
+            "telegram_auth_data": {
+                "id": self.telegram_id,
+                "first_name": "Load",
+                "last_name": str(self.index),
+                "username": f"load_{self.index}",
+                "auth_date": int(time.time()),
+                "hash": "telegram_webapp",
+            }
+        })
+        if response is None or response.status_code != 200:
+            return False
+        body = response.json()
+        self.user_id = body["id"]
+        self.token = body.get("session_token")
+        balance = body.get("token_balance", 0)
+        if self.args.fund and balance < self.args.fund:
+            await self.request("POST", "/api/admin/add-tokens/{telegram_id}", f"/api/admin/add-tokens/{self.telegram_id}",
+                               params={"admin_key": ADMIN_KEY, "tokens": self.args.fund - balance})
+        return True
+
+    # ── Socket.IO ────────────────────────────────────────────────────
+
+    async def connect_socket(self) -> bool:
+        @self.sio.on("*")
+        async def on_any(event, data=None):
+            self.rec.event(event)
+            future = self._acks.pop(event, None)
+            if future is not None and not future.done():
+                future.set_result(data)
+            if event == "game_finished" and isinstance(data, dict):
+                self._finished_rooms.add(data.get("room_id"))
+
+        start = time.perf_counter()
+        try:
+            await self.sio.connect(self.args.url, socketio_path="/api/socket.io", transports=["websocket"],
+                                   wait_timeout=10)
+        except Exception as e:
+            self.rec.fail("sio connect", time.perf_counter() - start, type(e).__name__)
+            return False
+        self.rec.ok("sio connect", time.perf_counter() - start)
+        await self.emit_with_ack("register_user", "user_registered",
+                                 {"user_id": self.user_id, "token": self.token, "platform": "load_test"})
+        return True
+
+    async def emit_with_ack(self, event: str, ack_event: str, data: Dict):
+        """The server answers register_user / join_game_room with a confirmation event"""
+        future = asyncio.get_running_loop().create_future()
+        self._acks[ack_event] = future
+        start = time.perf_counter()
+        try:
+            await self.sio.emit(event, data)
+            await asyncio.wait_for(future, timeout=10)
+            self.rec.ok(f"sio {event}", time.perf_counter() - start)
+        except Exception as e:
+            self._acks.pop(ack_event, None)
+            self.rec.fail(f"sio {event}", time.perf_counter() - start, type(e).__name__)
+
+    # ── Game loop ────────────────────────────────────────────────────
+
+    async def play_round(self, room_type: str, run_deadline: float) -> bool:
+        joined_at = time.perf_counter()
+        response = await self.request("POST", "/api/join-room", "/api/join-room", json={
+            "user_id": self.user_id, "room_type": room_type,
+            "bet_amount": self.bets.get(room_type, 0),
+        })
+        if response is None or response.status_code != 200:
+            return False
+        room_id = response.json()["room_id"]
+        await self.emit_with_ack("join_game_room", "room_joined_confirmed",
+                                 {"room_id": room_id, "user_id": self.user_id, "platform": "load_test"})
+
+        in_lobby = True
+
+        async def lobby_polls():
+            next_chat = next_participants = time.perf_counter()
+            last_chat_id = 0
+            while in_lobby:
+                now = time.perf_counter()
+                if now >= next_chat:
+                    next_chat = now + CHAT_POLL
+                    r = await self.request("GET", "/api/room-chat/{room_id}", f"/api/room-chat/{room_id}",
+                                           expect=(200, 304), params={"after": last_chat_id} if last_chat_id else None)
+                    if r is not None and r.status_code == 200:
+                        last_chat_id = r.json().get("last_id", last_chat_id)
+                if now >= next_participants:
+                    next_participants = now + PARTICIPANTS_POLL
+                    await self.request("GET", "/api/room-participants/{room_type}", f"/api/room-participants/{room_type}")
+                await asyncio.sleep(max(0.0, min(next_chat, next_participants) - time.perf_counter()))
+
+        lobby = asyncio.create_task(lobby_polls())
+        deadline = joined_at + self.args.round_timeout
+        try:
+            while time.perf_counter() < deadline:
+                r = await self.request("GET", "/api/room/{room_id}", f"/api/room/{room_id}", expect=(200, 304, 404))
+                if r is not None:
+                    status = r.json().get("status") if r.status_code == 200 else None
+                    if status and status != "waiting":
+                        in_lobby = False
+                    if status == "finished" or r.status_code == 404 or room_id in self._finished_rooms:
+                        self.rec.rounds.append(time.perf_counter() - joined_at)
+                        return True
+                if in_lobby and time.perf_counter() >= run_deadline:
+                    # Run is over and the room never filled — leave like a user closing the lobby
+                    await self.request("POST", "/api/leave-room", "/api/leave-room", expect=(200, 400, 404),
+                                       json={"room_id": room_id, "user_id": self.user_id})
+                    self.rec.abandoned += 1
+                    return True
+                await asyncio.sleep(ROOM_POLL)
+            self.rec.round_timeouts += 1
+            return True
+        finally:
+            in_lobby = False
+            lobby.cancel()
+
+    async def run(self, deadline: float):
+        # Stagger start-up so auth + connect don't all land in the same millisecond
+        await asyncio.sleep(random.random() * self.args.ramp_up)
+        if not await self.authenticate() or not await self.connect_socket():
+            return
+        try:
+            while time.perf_counter() < deadline:
+                await self.pacer.wait()
+                if time.perf_counter() >= deadline:
+                    break
+                if not await self.play_round(random.choice(self.args.room_types), deadline):
+                    await asyncio.sleep(self.args.retry_delay)  # room full / switching rounds
+                    continue
+                await asyncio.sleep(random.uniform(0, self.args.think_time))
+        finally:
+            await self.sio.disconnect()
+
+
+# ── Server launch ────────────────────────────────────────────────────
+
+def launch_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    if not args.keep_phases:
+        env["ROOM_PHASE_DURATIONS"] = json.dumps({rt: FAST_PHASES for rt in ("free", "bronze", "silver", "gold", "freeroll")})
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+
+
+async def wait_for_server(url: str, timeout: float = 60.0):
+    async with httpx.AsyncClient(base_url=url) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not come up within {timeout:.0f}s")
+
+
+async def room_bets(http: httpx.AsyncClient, room_types: List[str]) -> Dict[str, int]:
+    """Minimum bet per room type, from the live /rooms settings"""
+    bets = {}
+    response = await http.get("/api/rooms")
+    for room in response.json().get("rooms", []):
+        settings = room.get("settings") or {}
+        bets[room["room_type"]] = settings.get("min_bet", 0)
+    missing = [rt for rt in room_types if rt not in bets]
+    if missing:
+        raise RuntimeError(f"no open room for {missing}")
+    return bets
+
+
+async def run(args) -> Dict:
+    rec = Recorder()
+    pacer = JoinPacer(args.join_rate)
+    limits = httpx.Limits(max_connections=args.http_connections, max_keepalive_connections=args.http_connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as http:
+        bets = await room_bets(http, args.room_types)
+        players = [VirtualPlayer(i, args, http, rec, pacer, bets) for i in range(args.players)]
+        deadline = time.perf_counter() + args.ramp_up + args.duration
+        rec.started = time.perf_counter()
+        await asyncio.gather(*(p.run(deadline) for p in players))
+        rec.finished = time.perf_counter()
+    return rec.summary()
+
+
+def print_report(summary: Dict):
+    print(f"\n=== {summary['elapsed_s']}s ===")
+    print(f"{'operation':<42}{'count':>8}{'rps':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'err%':>8}")
+    for op, s in summary["operations"].items():
+        print(f"{op:<42}{s['count']:>8}{s['rps']:>9}{s['p50_ms']:>9}{s['p90_ms']:>9}{s['p99_ms']:>9}"
+              f"{s['max_ms']:>9}{s['error_rate'] * 100:>7.2f}%")
+        if s["errors"]:
+            print(f"{'':<42}errors: {s['errors']}")
+    print("\nSocket.IO events received:")
+    for name, e in summary["events"].items():
+        print(f"  {name:<28}{e['count']:>9}  ({e['per_s']}/s)")
+    r = summary["rounds"]
+    print(f"\nRounds: {r['completed']} completed, {r['timed_out']} timed out, {r['abandoned']} abandoned — "
+          f"join→finished p50 {r['p50_s']}s, p90 {r['p90_s']}s, max {r['max_s']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="server base URL (default http://127.0.0.1:<port>)")
+    parser.add_argument("--launch", action="store_true", help="start uvicorn server:app locally for the run")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--keep-phases", action="store_true", help="with --launch: keep the real round phase durations")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of play after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="players start uniformly over this many seconds")
+    parser.add_argument("--join-rate", type=float, default=10.0, help="joins per second across all players (0 = unpaced)")
+    parser.add_argument("--room-types", default="free,bronze,silver,gold")
+    parser.add_argument("--fund", type=int, default=100000, help="top players up to this balance via admin add-tokens (0 = off)")
+    parser.add_argument("--think-time", type=float, default=2.0, help="max pause between rounds")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="pause after a rejected join")
+    parser.add_argument("--round-timeout", type=float, default=120.0)
+    parser.add_argument("--id-base", type=int, default=9_100_000_000, help="telegram ids of virtual players start here")
+    parser.add_argument("--http-connections", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout")
+    parser.add_argument("--json", dest="json_out", help="write the summary here")
+    args = parser.parse_args()
+    args.room_types = [rt.strip() for rt in args.room_types.split(",") if rt.strip()]
+    args.url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+
+    server = launch_server(args) if args.launch else None
+    try:
+        if server is not None:
+            asyncio.run(wait_for_server(args.url))
+        summary = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+    print_report(summary)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
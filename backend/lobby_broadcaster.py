@@ -0,0 +1,102 @@
+"""
+Lobby Broadcaster
+Coalesces lobby updates into at most one `rooms_delta` emit per tick.
+Callers just mark the lobby dirty; the broadcaster diffs the current room
+summaries against the last emitted state and sends only changed/removed
+rooms with a sequence number. Clients that see a gap ask for a full
+`rooms_snapshot` (lobby_resync).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# snapshot() -> ({room_id: summary_dict}, {"maintenance_mode": ...})
+SnapshotFn = Callable[[], Tuple[Dict[str, Dict], Dict]]
+EmitFn = Callable[..., Awaitable[None]]
+
+
+class LobbyBroadcaster:
+    """Debounced, delta-encoded rooms broadcast"""
+
+    def __init__(self, tick: Optional[float] = None):
+        self.tick = tick if tick is not None else float(os.environ.get("LOBBY_BROADCAST_TICK", "0.25"))
+        self.seq = 0
+        self._emit: Optional[EmitFn] = None
+        self._snapshot: Optional[SnapshotFn] = None
+        self._last_rooms: Dict[str, Dict] = {}
+        self._last_meta: Dict = {}
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_flush = float("-inf")
+        self.requests = 0
+        self.emits = 0
+
+    def configure(self, emit: EmitFn, snapshot: SnapshotFn):
+        self._emit = emit
+        self._snapshot = snapshot
+
+    def mark_dirty(self):
+        """Request a lobby update; emits at most once per tick"""
+        self.requests += 1
+        if self._handle is not None:
+            return
+        loop = asyncio.get_running_loop()
+        # Leading edge: an idle lobby updates immediately, a busy one once per tick
+        delay = max(0.0, self._last_flush + self.tick - loop.time())
+        self._handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._handle = None
+        self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Emit the delta since the last flush (no-op if nothing changed)"""
+        self._last_flush = asyncio.get_running_loop().time()
+        try:
+            rooms, meta = self._snapshot()
+            changed = [summary for room_id, summary in rooms.items() if self._last_rooms.get(room_id) != summary]
+            removed = [room_id for room_id in self._last_rooms if room_id not in rooms]
+            if not changed and not removed and meta == self._last_meta:
+                return
+
+            self.seq += 1
+            self._last_rooms = rooms
+            self._last_meta = meta
+            self.emits += 1
+            await self._emit('rooms_delta', {
+                'seq': self.seq,
+                'changed': changed,
+                'removed': removed,
+                **meta,
+                'timestamp': datetime.now(timezone.utc),
+            })
+        except Exception as e:
+            logger.error(f"Error broadcasting lobby delta: {e}", exc_info=True)
+
+    def snapshot_payload(self) -> Dict:
+        """Full lobby state for a resyncing client (current rooms, current seq)"""
+        rooms, meta = self._snapshot()
+        return {
+            'seq': self.seq,
+            'rooms': list(rooms.values()),
+            **meta,
+            'timestamp': datetime.now(timezone.utc),
+        }
+
+    def get_stats(self) -> Dict:
+        return {
+            "tick": self.tick,
+            "seq": self.seq,
+            "update_requests": self.requests,
+            "emits": self.emits,
+            "coalesced": self.requests - self.emits,
+        }
+
+
+# Global broadcaster instance
+lobby_broadcaster = LobbyBroadcaster()
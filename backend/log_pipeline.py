@@ -0,0 +1,214 @@
+"""
+Async Logging Pipeline
+Log calls on the event loop only enqueue the record; a QueueListener thread
+formats (JSON or text) and writes. Levels are set per subsystem from
+LOG_LEVELS, and high-frequency INFO/DEBUG messages are sampled per call site
+so a hot loop cannot flood the queue.
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS="socketio=WARNING,engineio=WARNING,casino.socket=INFO"
+    LOG_FORMAT=json | text
+    LOG_SAMPLE_LIMIT=20 LOG_SAMPLE_WINDOW=10   # per call site, below WARNING
+
+Token movements (winner credits, payment credits, manual credits) go to
+the "casino.audit" logger: it stays at INFO whatever LOG_LEVEL says and is
+never sampled.
+
+Use %-style arguments (logger.info("joined %s", room_id)) on hot paths:
+the message is only rendered in the listener thread, and not at all when
+the level is disabled.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Attributes every LogRecord has; anything else came in via extra={...}
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+AUDIT_LOGGER = "casino.audit"
+
+DEFAULT_LEVELS = {
+    AUDIT_LOGGER: "INFO",
+    "socketio": "WARNING",
+    "engineio": "WARNING",
+    "httpx": "WARNING",
+    "uvicorn.access": "WARNING",
+}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, extras, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        doc = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                doc[key] = value
+        if record.exc_info:
+            doc["exc"] = self.formatException(record.exc_info)
+        return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues the record untouched — rendering happens in the listener thread.
+    (The stock prepare() formats on the caller's thread to make records picklable,
+    which an in-process queue doesn't need.)"""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampleFilter(logging.Filter):
+    """Per call site (source file, line) allow `limit` records per `window` seconds
+    below WARNING; the next record after a suppressed burst reports the count.
+    Keyed on the call site rather than the message, so f-string messages that
+    render differently every time are still sampled (and don't grow the table).
+    The audit logger is exempt."""
+
+    def __init__(self, limit: int = 20, window: float = 10.0):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites: Dict[Tuple[str, int], List] = {}  # (pathname, lineno) -> [window_start, count, suppressed]
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.limit <= 0 or record.name == AUDIT_LOGGER:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        site = self._sites.get(key)
+        if site is None:
+            if len(self._sites) > 10000:
+                self._sites.clear()
+            self._sites[key] = [now, 1, 0]
+            return True
+        if now - site[0] > self.window:
+            if site[2]:
+                record.sampled_out = site[2]  # shows up as an extra field
+            site[0], site[1], site[2] = now, 1, 0
+            return True
+        site[1] += 1
+        if site[1] <= self.limit:
+            return True
+        site[2] += 1
+        self.suppressed += 1
+        return False
+
+
+class _Pipeline:
+    def __init__(self):
+        self.queue: Optional[queue.Queue] = None
+        self.handler: Optional[LazyQueueHandler] = None
+        self.sampler: Optional[SampleFilter] = None
+        self.listeners: List[logging.handlers.QueueListener] = []
+
+
+_pipeline = _Pipeline()
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging():
+    """Route all logging through the queue (idempotent)"""
+    if _pipeline.handler is not None:
+        return
+    log_format = os.environ.get("LOG_FORMAT", "json").lower()
+    stream = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream.setFormatter(JSONFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    _pipeline.queue = queue.Queue(maxsize=int(os.environ.get("LOG_QUEUE_SIZE", "50000")))
+    _pipeline.handler = LazyQueueHandler(_pipeline.queue)
+    _pipeline.sampler = SampleFilter(
+        limit=int(os.environ.get("LOG_SAMPLE_LIMIT", "20")),
+        window=float(os.environ.get("LOG_SAMPLE_WINDOW", "10")),
+    )
+    _pipeline.handler.addFilter(_pipeline.sampler)
+
+    listener = logging.handlers.QueueListener(_pipeline.queue, stream, respect_handler_level=True)
+    listener.start()
+    _pipeline.listeners.append(listener)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_pipeline.handler)
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for name, level in {**DEFAULT_LEVELS, **_parse_levels(os.environ.get("LOG_LEVELS", ""))}.items():
+        logging.getLogger(name).setLevel(level)
+
+
+def file_logger(name: str, path: Path, fmt: str = "%(message)s") -> logging.Logger:
+    """Logger appending to a dedicated file from a listener thread (alerts/audit trails)"""
+    logger = logging.getLogger(f"casino.file.{name}")
+    if logger.handlers:
+        return logger
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(fmt))
+    file_queue: queue.Queue = queue.Queue()
+    listener = logging.handlers.QueueListener(file_queue, file_handler)
+    listener.start()
+    _pipeline.listeners.append(listener)
+    logger.addHandler(LazyQueueHandler(file_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def shutdown_logging():
+    """Drain queues and stop listener threads"""
+    for listener in _pipeline.listeners:
+        listener.stop()
+    _pipeline.listeners.clear()
+
+
+def get_stats() -> Dict:
+    return {
+        "queued": _pipeline.queue.qsize() if _pipeline.queue else 0,
+        "dropped_queue_full": _pipeline.handler.dropped if _pipeline.handler else 0,
+        "sampled_out": _pipeline.sampler.suppressed if _pipeline.sampler else 0,
+        "root_level": logging.getLevelName(logging.getLogger().level),
+        "levels": {name: logging.getLevelName(logging.getLogger(name).level)
+                   for name in sorted(logging.root.manager.loggerDict)
+                   if isinstance(logging.root.manager.loggerDict[name], logging.Logger)
+                   and logging.getLogger(name).level != logging.NOTSET},
+    }
+
+
+def set_level(name: str, level: str):
+    """Change a subsystem's level at runtime (admin endpoint)"""
+    logging.getLogger(name or None).setLevel(level.upper())
@@ -0,0 +1,179 @@
+"""
+Event Loop Monitor
+Measures event-loop lag continuously and catches blocking calls in the act.
+
+A ticker task sleeps `interval` and records how late it woke up (lag
+percentiles + Prometheus histogram). A watchdog thread watches the ticker's
+heartbeat; when the loop has not ticked for longer than `threshold` it grabs
+the loop thread's current stack — i.e. the sync code that is blocking — and
+keeps it in a ring for GET /api/admin/loop-lag.
+
+    LOOP_MONITOR=1                  # on by default; 0 disables
+    LOOP_MONITOR_INTERVAL_MS=100    # ticker period
+    LOOP_MONITOR_THRESHOLD_MS=100   # stall that triggers a stack capture
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+loop_lag = metrics.histogram("event_loop_lag_seconds", "How late the loop monitor ticker woke up",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+loop_stalls = metrics.counter("event_loop_stalls_total", "Loop stalls over the threshold (stack captured)")
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _task_frames(frames: traceback.StackSummary) -> List[traceback.FrameSummary]:
+    """Drop the asyncio runner frames above the callback/coroutine that is executing"""
+    for index in range(len(frames) - 1, -1, -1):
+        if frames[index].filename.endswith(os.path.join("asyncio", "events.py")):
+            return frames[index + 1:]
+    return list(frames)
+
+
+class LoopMonitor:
+    """Ticker task + watchdog thread; start() on the running loop"""
+
+    def __init__(self, interval: Optional[float] = None, threshold: Optional[float] = None,
+                 window: int = 3000, max_stalls: int = 20, stack_depth: int = 25):
+        self.enabled = os.environ.get("LOOP_MONITOR", "1") == "1"
+        self.interval = interval if interval is not None else \
+            float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "100")) / 1000
+        self.threshold = threshold if threshold is not None else \
+            float(os.environ.get("LOOP_MONITOR_THRESHOLD_MS", "100")) / 1000
+        self.stack_depth = stack_depth
+        self._lags: deque = deque(maxlen=window)  # last `window` ticks (~5 min at 100ms)
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self.max_lag = 0.0
+        self.ticks = 0
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._captured_beat = 0.0
+        self._open_stall: Optional[Dict] = None
+
+    # ── Lifecycle ────────────────────────────────────────────────────
+
+    def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(f"⏱️ Loop monitor on (tick {self.interval * 1000:.0f}ms, stall threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def configure(self, enabled: Optional[bool] = None, threshold: Optional[float] = None):
+        """Runtime switch from the admin endpoint"""
+        if threshold is not None:
+            self.threshold = threshold
+        if enabled is not None and enabled != self.enabled:
+            self.enabled = enabled
+            if enabled:
+                self.start()
+            else:
+                await self.stop()
+
+    # ── Ticker (event loop) ──────────────────────────────────────────
+
+    async def _tick(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            self._last_beat = time.monotonic()
+            self.ticks += 1
+            self._lags.append(lag)
+            loop_lag.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            stall = self._open_stall
+            if stall is not None:
+                # The watchdog saw this stall mid-flight; now we know how long it lasted
+                stall["lag_ms"] = round(lag * 1000, 1)
+                self._open_stall = None
+                logger.warning("🐌 Event loop blocked %.0fms; stack at capture:\n%s", lag * 1000, stall["stack"])
+
+    # ── Watchdog (thread) ────────────────────────────────────────────
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == self._captured_beat:
+                continue
+            self._captured_beat = beat  # one capture per stall
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_list(_task_frames(traceback.extract_stack(frame))[-self.stack_depth:]))
+            loop_stalls.inc()
+            self._open_stall = {
+                "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "stalled_ms_at_capture": round(stalled * 1000, 1),
+                "lag_ms": None,
+                "stack": stack,
+            }
+            self.stalls.append(self._open_stall)
+
+    # ── Stats ────────────────────────────────────────────────────────
+
+    def get_stats(self, include_stacks: bool = True) -> Dict:
+        ordered = sorted(self._lags)
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "ticks": self.ticks,
+            "window_ticks": len(ordered),
+            "lag_ms": {
+                "p50": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p90": round(_percentile(ordered, 0.90) * 1000, 2),
+                "p99": round(_percentile(ordered, 0.99) * 1000, 2),
+                "max_window": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+                "max_ever": round(self.max_lag * 1000, 2),
+            },
+            "stalls": [
+                stall if include_stacks else {k: v for k, v in stall.items() if k != "stack"}
+                for stall in reversed(self.stalls)
+            ],
+        }
+
+
+# Global monitor
+loop_monitor = LoopMonitor()
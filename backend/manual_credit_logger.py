@@ -3,14 +3,17 @@ Manual Token Credit Logging System
 Tracks all manual token adjustments for audit purposes
 """
 
+import asyncio
 import logging
 import os
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional
 import db_queries as dbq
+from log_pipeline import AUDIT_LOGGER
 
 logger = logging.getLogger(__name__)
+audit_log = logging.getLogger(AUDIT_LOGGER)
 
 class ManualCreditLogger:
     """Logs all manual token credits for audit trail"""
@@ -42,15 +45,19 @@ class ManualCreditLogger:
                 f"  Transaction Ref: {transaction_reference or 'N/A'}\n"
                 "  " + "-" * 60
             )
-            self.logs_dir.mkdir(parents=True, exist_ok=True)
-            with open(self.log_path, 'a') as f:
-                f.write(log_message + "\n")
-            logger.info(f"📝 Manual credit logged: {amount} tokens to user {telegram_id}")
+            # Audit trail: awaited so the caller knows it is on disk, but off the event loop
+            await asyncio.to_thread(self._append, log_message + "\n")
+            audit_log.info("📝 Manual credit logged: %s tokens to user %s", amount, telegram_id)
             return True
         except Exception as e:
             logger.error(f"❌ Failed to log manual credit: {e}")
             return False
 
+    def _append(self, text: str):
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, 'a') as f:
+            f.write(text)
+
     async def get_user_manual_credits(self, user_id: str, limit: int = 10):
         return []
 
@@ -87,7 +94,7 @@ async def credit_tokens_manually(db=None,
             transaction_reference=transaction_signature
         )
 
-        logger.info(f"✅ Manual credit: {amount} tokens to {telegram_id} ({old_balance} → {new_balance})")
+        audit_log.info("✅ Manual credit: %s tokens to %s (%s → %s)", amount, telegram_id, old_balance, new_balance)
         return {
             "success": True,
             "user_id": user_id,
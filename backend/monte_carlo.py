@@ -0,0 +1,369 @@
+"""
+monte_carlo.py — vectorized Monte Carlo of room economics and winner selection
+Run: python monte_carlo.py
+     python monte_carlo.py --rounds 5000000 --distributions uniform,whale --rooms bronze,gold --json mc.json
+
+Room settings come from server.py (ROOM_SETTINGS, freeroll_config,
+FREE_ROOM_PRIZE), so the report follows whatever the server is configured with.
+
+Economics: for every room type × bet distribution, --rounds rounds are drawn
+in NumPy batches. Winners are picked with the same rule as select_winner (a
+uniform point on the cumulative bet walk; uniform seat when nobody bet).
+Reported per scenario:
+  rounds/s        vectorized throughput
+  bet / payout    tokens bet and paid out per round, house edge (1 - paid/bet)
+  minted          tokens created per round (free room and freeroll prizes)
+  player EV       mean net tokens per player-round
+  calibration     observed win rate vs bet share in 10 share buckets, and the
+                  odds calculate_win_probability would display for the same
+                  seats (10% base + 90% share, capped at 95% — not what
+                  select_winner does; its values do not sum to 1 over a room)
+  seat bias       chi-square of wins per seat against Σ bet shares per seat
+
+Distributions (--distributions):
+  uniform   every bet uniform in [min_bet, max_bet]
+  min, max  everyone bets the room minimum / maximum
+  whale     one random seat bets the maximum, everyone else the minimum
+  skewed    min_bet + Beta(1.5, 5) × range (most bets near the minimum)
+Zero-bet rooms (free, freeroll) only have the one distribution.
+
+Selection test: server.select_winner itself is called --draws times per room
+type on fixed bet vectors, and the seat counts are chi-square tested against
+the intended distribution (bet / pool, or uniform when the pool is 0). The
+same test is applied to the vectorized picker so both are held to one
+standard. The p-value uses the Wilson–Hilferty approximation. Exit status is
+1 when any test falls below --alpha.
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import time
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+import server  # noqa: E402
+from room_models import LivePlayer  # noqa: E402
+from server import ROOM_SETTINGS, RoomType  # noqa: E402
+
+DISTRIBUTIONS = ("uniform", "min", "max", "whale", "skewed")
+SHARE_BUCKETS = 10
+
+
+# ── Room parameters ──────────────────────────────────────────────────
+
+def room_parameters(room_type: RoomType) -> Dict:
+    """Seats, bet range and minted prize (None when the winner takes the pool)"""
+    settings = ROOM_SETTINGS[room_type]
+    if room_type == RoomType.FREEROLL:
+        return {"players": server.freeroll_config["max_players"], "min_bet": 0, "max_bet": 0,
+                "minted_prize": server.freeroll_config["prize"]}
+    return {"players": 3, "min_bet": settings["min_bet"], "max_bet": settings["max_bet"],
+            "minted_prize": server.FREE_ROOM_PRIZE if room_type == RoomType.FREE else None}
+
+
+# ── Vectorized round engine ──────────────────────────────────────────
+
+def sample_bets(rng: np.random.Generator, distribution: str, rounds: int, players: int,
+                lo: int, hi: int) -> np.ndarray:
+    if hi <= 0:
+        return np.zeros((rounds, players), dtype=np.int64)
+    if distribution == "uniform":
+        return rng.integers(lo, hi + 1, size=(rounds, players), dtype=np.int64)
+    if distribution == "min":
+        return np.full((rounds, players), lo, dtype=np.int64)
+    if distribution == "max":
+        return np.full((rounds, players), hi, dtype=np.int64)
+    if distribution == "whale":
+        bets = np.full((rounds, players), lo, dtype=np.int64)
+        bets[np.arange(rounds), rng.integers(0, players, size=rounds)] = hi
+        return bets
+    if distribution == "skewed":
+        spread = np.floor(rng.beta(1.5, 5.0, size=(rounds, players)) * (hi - lo + 1)).astype(np.int64)
+        return np.minimum(lo + spread, hi)
+    raise ValueError(f"unknown distribution {distribution!r}")
+
+
+def pick_winners(rng: np.random.Generator, bets: np.ndarray) -> np.ndarray:
+    """Seat index of each round's winner — select_winner's rule, one row per round"""
+    rounds, players = bets.shape
+    cumulative = np.cumsum(bets, axis=1)
+    total = cumulative[:, -1]
+    point = rng.random(rounds) * total
+    # select_winner returns the first seat whose cumulative bet reaches the point
+    winners = np.minimum((cumulative < point[:, None]).sum(axis=1), players - 1)
+    nobody_bet = total <= 0
+    if nobody_bet.any():
+        winners[nobody_bet] = rng.integers(0, players, size=int(nobody_bet.sum()))
+    return winners
+
+
+def displayed_odds(shares: np.ndarray, has_pool: np.ndarray) -> np.ndarray:
+    """calculate_win_probability over a whole batch"""
+    return np.where(has_pool[:, None], np.minimum(0.1 + 0.9 * shares, 0.95), 0.0)
+
+
+class EconomicsAccumulator:
+    """Running totals for one room type × distribution"""
+
+    def __init__(self, players: int):
+        self.rounds = 0
+        self.bet = 0
+        self.paid = 0
+        self.minted = 0
+        self.seat_wins = np.zeros(players, dtype=np.int64)
+        self.seat_expected = np.zeros(players)
+        self.bucket_seats = np.zeros(SHARE_BUCKETS, dtype=np.int64)
+        self.bucket_share = np.zeros(SHARE_BUCKETS)
+        self.bucket_wins = np.zeros(SHARE_BUCKETS, dtype=np.int64)
+        self.bucket_shown = np.zeros(SHARE_BUCKETS)
+        self.shown_sum = 0.0
+
+    def add(self, bets: np.ndarray, winners: np.ndarray, minted_prize: Optional[int]):
+        rounds, players = bets.shape
+        total = bets.sum(axis=1)
+        has_pool = total > 0
+        shares = np.where(has_pool[:, None], bets / np.maximum(total, 1)[:, None], 1.0 / players)
+        won = np.zeros_like(bets, dtype=bool)
+        won[np.arange(rounds), winners] = True
+
+        self.rounds += rounds
+        self.bet += int(total.sum())
+        if minted_prize is None:
+            self.paid += int(total.sum())
+        else:
+            self.minted += minted_prize * rounds
+        np.add.at(self.seat_wins, winners, 1)
+        self.seat_expected += shares.sum(axis=0)
+
+        buckets = np.minimum((shares * SHARE_BUCKETS).astype(np.int64), SHARE_BUCKETS - 1).ravel()
+        shown = displayed_odds(shares, has_pool)
+        self.bucket_seats += np.bincount(buckets, minlength=SHARE_BUCKETS)
+        self.bucket_share += np.bincount(buckets, weights=shares.ravel(), minlength=SHARE_BUCKETS)
+        self.bucket_wins += np.bincount(buckets, weights=won.ravel(), minlength=SHARE_BUCKETS).astype(np.int64)
+        self.bucket_shown += np.bincount(buckets, weights=shown.ravel(), minlength=SHARE_BUCKETS)
+        self.shown_sum += float(shown.sum())
+
+    def report(self, players: int) -> Dict:
+        payout = self.paid + self.minted
+        player_rounds = self.rounds * players
+        calibration = []
+        for b in range(SHARE_BUCKETS):
+            seats = int(self.bucket_seats[b])
+            if not seats:
+                continue
+            expected = self.bucket_share[b] / seats
+            observed = self.bucket_wins[b] / seats
+            stderr = math.sqrt(max(expected * (1 - expected), 1e-12) / seats)
+            calibration.append({
+                "share": f"{b / SHARE_BUCKETS:.1f}-{(b + 1) / SHARE_BUCKETS:.1f}",
+                "seats": seats,
+                "bet_share": round(expected, 4),
+                "win_rate": round(observed, 4),
+                "z": round((observed - expected) / stderr, 2),
+                "shown_odds": round(self.bucket_shown[b] / seats, 4),
+            })
+        stat, df, p = chi_square(self.seat_wins, self.seat_expected)
+        return {
+            "rounds": self.rounds,
+            "bet_per_round": round(self.bet / self.rounds, 2),
+            "payout_per_round": round(payout / self.rounds, 2),
+            "house_edge": round(1 - self.paid / self.bet, 6) if self.bet else None,
+            "minted_per_round": round(self.minted / self.rounds, 2),
+            "player_ev_per_round": round((payout - self.bet) / player_rounds, 4),
+            "shown_odds_per_room": round(self.shown_sum / self.rounds, 4),
+            "calibration": calibration,
+            "max_calibration_z": max((abs(c["z"]) for c in calibration), default=0.0),
+            "seat_wins": self.seat_wins.tolist() if players <= 10 else None,
+            "seat_bias": {"chi2": round(stat, 2), "df": df, "p": round(p, 4)},
+        }
+
+
+def run_economics(room_type: RoomType, distribution: str, rounds: int, batch: int,
+                  rng: np.random.Generator) -> Dict:
+    params = room_parameters(room_type)
+    players = params["players"]
+    acc = EconomicsAccumulator(players)
+    batch = max(1, batch // players)  # keep batch memory about constant across room sizes
+    started = time.perf_counter()
+    remaining = rounds
+    while remaining > 0:
+        n = min(batch, remaining)
+        bets = sample_bets(rng, distribution, n, players, params["min_bet"], params["max_bet"])
+        acc.add(bets, pick_winners(rng, bets), params["minted_prize"])
+        remaining -= n
+    elapsed = time.perf_counter() - started
+    result = {"room_type": room_type.value, "distribution": distribution, "players": players,
+              "elapsed_s": round(elapsed, 3), "rounds_per_s": round(rounds / elapsed) if elapsed else None}
+    result.update(acc.report(players))
+    return result
+
+
+# ── Selection test ───────────────────────────────────────────────────
+
+def chi_square_sf(stat: float, df: int) -> float:
+    """Upper tail of the chi-square distribution (Wilson–Hilferty normal approximation)"""
+    if df <= 0:
+        return 1.0
+    if stat <= 0:
+        return 1.0
+    scale = 2.0 / (9.0 * df)
+    z = ((stat / df) ** (1.0 / 3.0) - (1.0 - scale)) / math.sqrt(scale)
+    return 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def chi_square(observed, expected) -> Tuple[float, int, float]:
+    """Pearson statistic over categories with a non-zero expectation"""
+    observed = np.asarray(observed, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    mask = expected > 0
+    stray = observed[~mask].sum()
+    if stray:
+        return float("inf"), int(mask.sum()) - 1, 0.0  # a seat that cannot win won
+    stat = float((((observed - expected) ** 2)[mask] / expected[mask]).sum())
+    df = int(mask.sum()) - 1
+    return stat, df, chi_square_sf(stat, df)
+
+
+def intended_shares(bets: List[int]) -> np.ndarray:
+    total = sum(bets)
+    if total <= 0:
+        return np.full(len(bets), 1.0 / len(bets))
+    return np.asarray(bets, dtype=float) / total
+
+
+def selection_cases(room_type: RoomType) -> List[List[int]]:
+    params = room_parameters(room_type)
+    n, lo, hi = params["players"], params["min_bet"], params["max_bet"]
+    if hi <= 0:
+        return [[0] * n]
+    return [[lo, (lo + hi) // 2, hi], [hi, lo, lo], [lo] * n]
+
+
+def test_select_winner(bets: List[int], draws: int, seed: int) -> Dict:
+    players = [LivePlayer(user_id=f"seat_{i}", username=f"seat{i}", first_name="Seat", bet_amount=bet)
+               for i, bet in enumerate(bets)]
+    seat_of = {id(p): i for i, p in enumerate(players)}
+    counts = np.zeros(len(players), dtype=np.int64)
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        started = time.perf_counter()
+        for _ in range(draws):
+            counts[seat_of[id(server.select_winner(players))]] += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        random.setstate(state)
+    stat, df, p = chi_square(counts, intended_shares(bets) * draws)
+    return {"chi2": round(stat, 2), "df": df, "p": round(p, 4), "draws_per_s": round(draws / elapsed),
+            "win_rate": (counts / draws).round(4).tolist() if len(bets) <= 10 else None}
+
+
+def test_vectorized(bets: List[int], draws: int, rng: np.random.Generator) -> Dict:
+    matrix = np.tile(np.asarray(bets, dtype=np.int64), (draws, 1))
+    counts = np.bincount(pick_winners(rng, matrix), minlength=len(bets))
+    stat, df, p = chi_square(counts, intended_shares(bets) * draws)
+    return {"chi2": round(stat, 2), "df": df, "p": round(p, 4)}
+
+
+def run_selection_tests(room_types: List[RoomType], draws: int, seed: int, alpha: float) -> List[Dict]:
+    rng = np.random.default_rng(seed + 1)
+    results = []
+    for room_type in room_types:
+        for bets in selection_cases(room_type):
+            python = test_select_winner(bets, draws, seed)
+            vectorized = test_vectorized(bets, draws, rng)
+            results.append({
+                "room_type": room_type.value,
+                "bets": bets if len(bets) <= 10 else f"{len(bets)} × {bets[0]}",
+                "intended": intended_shares(bets).round(4).tolist() if len(bets) <= 10 else "uniform",
+                "select_winner": python,
+                "vectorized": vectorized,
+                "passed": python["p"] >= alpha and vectorized["p"] >= alpha,
+            })
+    return results
+
+
+# ── Output ───────────────────────────────────────────────────────────
+
+def _fmt_rounds(n: float) -> str:
+    return f"{n / 1e6:.1f}M" if n >= 1e6 else f"{n / 1e3:.0f}k"
+
+
+def print_economics(r: Dict, show_calibration: bool):
+    edge = "n/a" if r["house_edge"] is None else f"{r['house_edge'] * 100:+.4f}%"
+    print(f"{r['room_type']:<9}{r['distribution']:<9}{_fmt_rounds(r['rounds']):>6} rounds "
+          f"({_fmt_rounds(r['rounds_per_s'] or 0)}/s)  bet {r['bet_per_round']:>8}  paid {r['payout_per_round']:>8}  "
+          f"edge {edge:>9}  minted {r['minted_per_round']:>6}  EV/player {r['player_ev_per_round']:+9.2f}  "
+          f"shown odds Σ {r['shown_odds_per_room']:.2f}  calib max|z| {r['max_calibration_z']:.1f}  "
+          f"seat χ² p {r['seat_bias']['p']:.3f}")
+    if show_calibration:
+        for c in r["calibration"]:
+            print(f"      share {c['share']}  seats {c['seats']:>9}  bet share {c['bet_share']:.4f}  "
+                  f"win rate {c['win_rate']:.4f}  (z {c['z']:+.1f})  shown {c['shown_odds']:.4f}")
+
+
+def print_selection(t: Dict):
+    status = "PASS" if t["passed"] else "FAIL"
+    s, v = t["select_winner"], t["vectorized"]
+    print(f"{status}  {t['room_type']:<9} bets {t['bets']}  intended {t['intended']}")
+    print(f"      select_winner χ²={s['chi2']} df={s['df']} p={s['p']}  win rate {s['win_rate']}  "
+          f"({s['draws_per_s']:,} draws/s)")
+    print(f"      vectorized    χ²={v['chi2']} df={v['df']} p={v['p']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2_000_000, help="rounds per room type × distribution")
+    parser.add_argument("--batch", type=int, default=3_000_000, help="seats drawn per NumPy batch")
+    parser.add_argument("--rooms", default=",".join(t.value for t in RoomType))
+    parser.add_argument("--distributions", default=",".join(DISTRIBUTIONS))
+    parser.add_argument("--draws", type=int, default=200_000, help="select_winner calls per selection test")
+    parser.add_argument("--alpha", type=float, default=0.001, help="selection test significance level")
+    parser.add_argument("--calibration", action="store_true", help="print the per-bucket calibration tables")
+    parser.add_argument("--skip-economics", action="store_true")
+    parser.add_argument("--skip-selection", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_out", help="write results here")
+    args = parser.parse_args()
+    try:
+        room_types = [RoomType(r) for r in args.rooms.split(",") if r]
+    except ValueError as e:
+        parser.error(str(e))
+    distributions = [d for d in args.distributions.split(",") if d]
+    unknown = [d for d in distributions if d not in DISTRIBUTIONS]
+    if unknown:
+        parser.error(f"unknown distributions {unknown}; choose from {DISTRIBUTIONS}")
+
+    results = {"economics": [], "selection": []}
+    if not args.skip_economics:
+        rng = np.random.default_rng(args.seed)
+        print("=== Room economics ===")
+        for room_type in room_types:
+            zero_bet = room_parameters(room_type)["max_bet"] <= 0
+            for distribution in (["uniform"] if zero_bet else distributions):
+                result = run_economics(room_type, distribution, args.rounds, args.batch, rng)
+                print_economics(result, args.calibration)
+                results["economics"].append(result)
+
+    if not args.skip_selection:
+        print(f"\n=== select_winner vs intended distribution ({args.draws:,} draws, alpha {args.alpha}) ===")
+        results["selection"] = run_selection_tests(room_types, args.draws, args.seed, args.alpha)
+        for test in results["selection"]:
+            print_selection(test)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if all(t["passed"] for t in results["selection"]) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from typing import Dict
 import db_queries as dbq
+from tx_deltas import tx_delta_extractor
+from clock import clock
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +33,7 @@ class PaymentRecoverySystem:
         
     def log_recovery(self, message: str):
         """Log recovery actions to dedicated file"""
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = clock.now().isoformat()
         log_entry = f"[{timestamp}] {message}\n"
         
         try:
@@ -48,7 +50,7 @@ class PaymentRecoverySystem:
             hours: How many hours back to scan
         """
         try:
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+            cutoff_time = clock.now() - timedelta(hours=hours)
             
             logger.info(f"🔍 [Recovery] Scanning for missed payments since {cutoff_time.isoformat()}")
             self.log_recovery(f"Starting recovery scan for last {hours} hours")
@@ -99,8 +101,9 @@ class PaymentRecoverySystem:
             # Get recent transactions from Solana
             from solana.rpc.async_api import AsyncClient
             from solders.pubkey import Pubkey
+            from solana_integration import instrument_rpc_client
             
-            client = AsyncClient(self.processor.rpc_manager.get_current_url())
+            client = instrument_rpc_client(AsyncClient(self.processor.rpc_manager.get_current_url()))
             pubkey = Pubkey.from_string(derived_address)
             
             # Get signatures for this address
@@ -126,17 +129,8 @@ class PaymentRecoverySystem:
                 
                 # (processed_transactions tracking skipped — recovery logs handle deduplication)
                 
-                # Get transaction details
-                tx_response = await client.get_transaction(
-                    Signature.from_string(sig),
-                    max_supported_transaction_version=0
-                )
-                
-                if not tx_response.value:
-                    continue
-                
-                # Extract SOL amount
-                sol_amount = await self._extract_sol_amount(tx_response.value, derived_address)
+                # Extract SOL amount (shared fetch/decode cache)
+                sol_amount = await self._extract_sol_amount(client, sig, derived_address)
                 
                 if sol_amount and sol_amount > 0:
                     # This is a missed payment - recover it
@@ -159,26 +153,14 @@ class PaymentRecoverySystem:
             logger.error(f"Error checking transactions for user: {e}")
             return 0
     
-    async def _extract_sol_amount(self, transaction, receiving_address: str) -> float:
+    async def _extract_sol_amount(self, client, signature: str, receiving_address: str) -> float:
         """Extract SOL amount sent to receiving address"""
         try:
-            meta = transaction.transaction.meta
-            if not meta:
+            deltas = await tx_delta_extractor.get_deltas(client, signature)
+            if deltas is None:
                 return 0.0
             
-            # Find the receiving address in post_balances
-            account_keys = transaction.transaction.transaction.message.account_keys
-            
-            for idx, account in enumerate(account_keys):
-                if str(account) == receiving_address:
-                    pre_balance = meta.pre_balances[idx] if idx < len(meta.pre_balances) else 0
-                    post_balance = meta.post_balances[idx] if idx < len(meta.post_balances) else 0
-                    balance_change = post_balance - pre_balance
-                    
-                    if balance_change > 0:
-                        return balance_change / 1_000_000_000  # Convert lamports to SOL
-            
-            return 0.0
+            return deltas.received_lamports(receiving_address) / 1_000_000_000  # Convert lamports to SOL
             
         except Exception as e:
             logger.error(f"Error extracting SOL amount: {e}")
@@ -0,0 +1,178 @@
+"""
+Query Stats
+Per-statement timings for the asyncpg pool, keyed by the db_queries function
+that issued them: calls, total / max time, rows, errors and pool acquire wait.
+Statements slower than DB_SLOW_QUERY_MS are logged with their parameters
+redacted to types, and kept in a short ring for GET /api/admin/db-queries.
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name of the db_queries function currently running (set by its metrics wrapper)
+current_call: ContextVar[str] = ContextVar("db_current_call", default="direct")
+
+SORT_KEYS = ("total", "mean", "max", "calls", "rows", "errors")
+
+
+def _redact(args: Sequence) -> List[str]:
+    """Parameter types only — values may be balances, wallet keys or telegram ids"""
+    redacted = []
+    for value in args:
+        if value is None:
+            redacted.append("NULL")
+        elif isinstance(value, (str, bytes, list, tuple)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+def status_rows(status) -> Optional[int]:
+    """Affected rows from an execute() status such as 'UPDATE 3' or 'INSERT 0 1'"""
+    if isinstance(status, str):
+        tail = status.rsplit(" ", 1)[-1]
+        if tail.isdigit():
+            return int(tail)
+    return None
+
+
+class _StatementStats:
+    __slots__ = ("function", "statement", "calls", "total", "max", "rows", "errors")
+
+    def __init__(self, function: str, statement: str):
+        self.function = function
+        self.statement = statement
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "function": self.function,
+            "statement": self.statement,
+            "calls": self.calls,
+            "total_ms": round(self.total * 1000, 2),
+            "mean_ms": round(self.total / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "rows": self.rows,
+            "errors": self.errors,
+        }
+
+
+class QueryStats:
+    """Aggregates statement timings; one instance per process"""
+
+    def __init__(self, slow_ms: Optional[float] = None, max_statements: int = 2000, slow_log_size: int = 50):
+        self.slow_threshold = (slow_ms if slow_ms is not None
+                               else float(os.environ.get("DB_SLOW_QUERY_MS", "200"))) / 1000
+        self.max_statements = max_statements
+        self._statements: Dict[Tuple[str, str], _StatementStats] = {}
+        self._normalized: Dict[str, str] = {}
+        self._acquire: Dict[str, List[float]] = {}  # function -> [count, total, max]
+        self.slow_log: deque = deque(maxlen=slow_log_size)
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def _normalize(self, query: str) -> str:
+        normalized = self._normalized.get(query)
+        if normalized is None:
+            normalized = " ".join(query.split())
+            if len(normalized) > 300:
+                normalized = normalized[:297] + "..."
+            if len(self._normalized) < self.max_statements:
+                self._normalized[query] = normalized
+        return normalized
+
+    def record(self, query: str, args: Sequence, elapsed: float, rows: Optional[int], failed: bool = False):
+        function = current_call.get()
+        statement = self._normalize(query)
+        key = (function, statement)
+        stats = self._statements.get(key)
+        if stats is None:
+            if len(self._statements) >= self.max_statements:
+                self.dropped += 1
+                return
+            stats = self._statements[key] = _StatementStats(function, statement)
+        stats.calls += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        if rows:
+            stats.rows += rows
+        if failed:
+            stats.errors += 1
+        if elapsed >= self.slow_threshold:
+            params = _redact(args)
+            self.slow_log.append({
+                "at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "function": function,
+                "ms": round(elapsed * 1000, 2),
+                "rows": rows,
+                "statement": statement,
+                "params": params,
+            })
+            logger.warning("🐢 Slow query in %s: %.1fms rows=%s %s params=%s",
+                           function, elapsed * 1000, rows, statement, params)
+
+    def record_acquire(self, elapsed: float):
+        function = current_call.get()
+        entry = self._acquire.get(function)
+        if entry is None:
+            entry = self._acquire[function] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+
+    def top(self, sort: str = "total", limit: int = 20) -> List[Dict]:
+        if sort not in SORT_KEYS:
+            sort = "total"
+        if sort == "mean":
+            key = lambda s: s.total / s.calls if s.calls else 0.0
+        else:
+            key = lambda s: getattr(s, sort)
+        ranked = sorted(self._statements.values(), key=key, reverse=True)
+        return [s.to_dict() for s in ranked[:limit]]
+
+    def acquire_waits(self, limit: int = 20) -> List[Dict]:
+        ranked = sorted(self._acquire.items(), key=lambda item: item[1][1], reverse=True)
+        return [{
+            "function": function,
+            "acquires": int(count),
+            "total_wait_ms": round(total * 1000, 2),
+            "mean_wait_ms": round(total / count * 1000, 3) if count else 0.0,
+            "max_wait_ms": round(peak * 1000, 2),
+        } for function, (count, total, peak) in ranked[:limit]]
+
+    def reset(self):
+        self._statements.clear()
+        self._acquire.clear()
+        self.slow_log.clear()
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def get_stats(self, sort: str = "total", limit: int = 20) -> Dict:
+        return {
+            "since": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="seconds"),
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "statements_tracked": len(self._statements),
+            "statements_dropped": self.dropped,
+            "sort": sort if sort in SORT_KEYS else "total",
+            "top": self.top(sort, limit),
+            "acquire_wait": self.acquire_waits(limit),
+            "slow_queries": list(self.slow_log)[-limit:],
+        }
+
+
+# Global query stats
+query_stats = QueryStats()
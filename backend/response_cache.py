@@ -0,0 +1,218 @@
+"""
+Response Cache Middleware
+Pure ASGI micro-cache for hot, polled GET endpoints:
+- keyed by path + query string, short per-route TTLs
+- version tags ("rooms", "history", ...) bumped by mutations invalidate entries
+- strong ETags; If-None-Match is answered with 304 straight from the cache
+- single-flight: concurrent identical misses wait for one computation
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheRule:
+    """A cacheable route template, e.g. /api/room/{room_id}"""
+
+    def __init__(self, template: str, ttl: float, tags: Iterable[str]):
+        self.template = template
+        self.ttl = ttl
+        self.tags = tuple(tags)
+        self.pattern = re.compile("^" + re.sub(r"\{[^/}]+\}", r"[^/]+", template) + "$")
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body", "etag", "expires_at", "versions")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes,
+                 etag: bytes, expires_at: float, versions: Tuple[int, ...]):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+        self.versions = versions
+
+
+class ResponseCache:
+    """Entries, version tags and counters shared with the middleware"""
+
+    def __init__(self, rules: Iterable[CacheRule] = (), max_entries: int = 1024):
+        self.rules: List[CacheRule] = list(rules)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.coalesced = 0
+
+    def add_rule(self, template: str, ttl: float, tags: Iterable[str]):
+        self.rules.append(CacheRule(template, ttl, tags))
+
+    def match(self, path: str) -> Optional[CacheRule]:
+        for rule in self.rules:
+            if rule.pattern.match(path):
+                return rule
+        return None
+
+    def bump(self, *tags: str):
+        """Invalidate every cached response depending on these tags"""
+        for tag in tags:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def versions_for(self, rule: CacheRule) -> Tuple[int, ...]:
+        return tuple(self._versions.get(tag, 0) for tag in rule.tags)
+
+    def get(self, key: str, rule: CacheRule) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic() or entry.versions != self.versions_for(rule):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key: str, entry: CachedResponse):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "versions": dict(self._versions),
+            "rules": {rule.template: rule.ttl for rule in self.rules},
+        }
+
+
+def _etag(body: bytes) -> bytes:
+    return b'"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def _if_none_match(scope) -> Optional[bytes]:
+    for name, value in scope.get("headers", ()):
+        if name == b"if-none-match":
+            return value
+    return None
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving ResponseCache rules"""
+
+    def __init__(self, app, cache: ResponseCache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        rule = self.cache.match(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        scope["route_template"] = rule.template  # metrics label for cache hits
+        query = scope.get("query_string", b"")
+        key = scope["path"] + ("?" + query.decode("latin-1") if query else "")
+        client_etag = _if_none_match(scope)
+
+        entry = self.cache.get(key, rule)
+        if entry is not None:
+            self.cache.hits += 1
+            await self._respond(entry, client_etag, send)
+            return
+
+        pending = self.cache._inflight.get(key)
+        if pending is not None:
+            # Same response is already being computed — wait for it
+            self.cache.coalesced += 1
+            entry = await asyncio.shield(pending)
+            if entry is not None:
+                await self._respond(entry, client_etag, send)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        self.cache.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.cache._inflight[key] = future
+        entry = None
+        try:
+            versions = self.cache.versions_for(rule)
+            entry = await self._compute(scope, receive, rule, versions)
+            if not isinstance(entry, _Uncached) and versions == self.cache.versions_for(rule):
+                # Only keep it if nothing was invalidated while computing
+                self.cache.store(key, entry)
+        finally:
+            self.cache._inflight.pop(key, None)
+            # Waiters only share a cacheable response; after an error (or an
+            # exception) each of them calls the app itself
+            future.set_result(None if isinstance(entry, _Uncached) else entry)
+
+        await self._respond(entry, client_etag, send)
+
+    async def _compute(self, scope, receive, rule: CacheRule, versions) -> CachedResponse:
+        start_message = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        body = b"".join(chunks)
+        status = start_message.get("status", 500)
+        headers = [(k, v) for k, v in start_message.get("headers", [])
+                   if k.lower() not in (b"content-length", b"etag", b"cache-control")]
+        entry = CachedResponse(status, headers, body, _etag(body),
+                               time.monotonic() + rule.ttl, versions)
+        # Errors are passed through once but never cached
+        return entry if status == 200 else _Uncached(entry)
+
+    async def _respond(self, entry: CachedResponse, client_etag: Optional[bytes], send):
+        if isinstance(entry, _Uncached):
+            headers = entry.headers + [(b"content-length", str(len(entry.body)).encode())]
+            await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        cache_headers = [(b"etag", entry.etag), (b"cache-control", b"no-cache")]
+        if client_etag is not None and entry.etag in [t.strip() for t in client_etag.split(b",")]:
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers = entry.headers + cache_headers + [(b"content-length", str(len(entry.body)).encode())]
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+
+class _Uncached(CachedResponse):
+    """A non-200 response: delivered to its own request only"""
+
+    def __init__(self, entry: CachedResponse):
+        super().__init__(entry.status, entry.headers, entry.body, entry.etag, 0.0, entry.versions)
+
+
+# Global cache (rules are registered by server.py)
+response_cache = ResponseCache()
@@ -0,0 +1,54 @@
+"""
+Room Chat History
+Per-room ring buffers of lobby chat messages with a global, monotonically
+increasing message id so clients can poll incrementally (?after=<id>).
+"""
+
+import itertools
+from collections import deque
+from typing import Deque, Dict, List
+
+
+class RoomChat:
+    """Bounded chat history per room"""
+
+    def __init__(self, max_messages: int = 50):
+        self.max_messages = max_messages
+        self._rooms: Dict[str, Deque[Dict]] = {}
+        self._ids = itertools.count(1)  # never reused, even across cleared rooms
+
+    def append(self, room_id: str, msg: Dict) -> Dict:
+        """Store a message and return it with its assigned id"""
+        msg = {'id': next(self._ids), **msg}
+        history = self._rooms.get(room_id)
+        if history is None:
+            history = self._rooms[room_id] = deque(maxlen=self.max_messages)
+        history.append(msg)
+        return msg
+
+    def history(self, room_id: str, after: int = 0) -> List[Dict]:
+        """Messages of a room with id > after (oldest first)"""
+        history = self._rooms.get(room_id)
+        if not history:
+            return []
+        if after <= 0 or history[0]['id'] > after:
+            return list(history)
+        return [m for m in history if m['id'] > after]
+
+    def last_id(self, room_id: str) -> int:
+        history = self._rooms.get(room_id)
+        return history[-1]['id'] if history else 0
+
+    def clear(self, room_id: str, *_):
+        self._rooms.pop(room_id, None)
+
+    def get_stats(self) -> Dict:
+        return {
+            "rooms": len(self._rooms),
+            "messages": sum(len(h) for h in self._rooms.values()),
+            "max_messages": self.max_messages,
+        }
+
+
+# Global chat store
+room_chat = RoomChat()
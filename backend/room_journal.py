@@ -0,0 +1,370 @@
+"""
+Room Journal
+Append-only, write-ahead log of live room mutations (open, join, leave,
+status, credit, close) so a restart can restore waiting rooms and refund
+rounds that were interrupted mid-play. Winner credits and refunds are
+journaled as pending before the balance update, so a crash between the
+two is never mistaken for an unsettled round or an unpaid refund.
+
+Records are JSON lines buffered in memory and written + fsynced in batches
+by a background writer (group commit). Callers that must not lose a record
+(bet debits) await flush(), which resolves once their batch is on disk.
+Once compact_after records have been written since the last compaction,
+the writer rewrites the file as the state of the live rooms, so replay cost
+stays bounded by the number of open rooms rather than uptime.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from clock import clock
+
+logger = logging.getLogger(__name__)
+
+
+def _type_key(room_type) -> str:
+    return room_type.value if hasattr(room_type, 'value') else str(room_type)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'value'):
+        return value.value
+    return str(value)
+
+
+def _player_doc(player) -> Dict:
+    return player.to_dict() if hasattr(player, 'to_dict') else player.dict()
+
+
+class RoomJournal:
+    """Batched, fsynced JSONL journal of room state changes"""
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 0.05, max_batch: int = 512,
+                 compact_after: Optional[int] = None):
+        if path is None:
+            path = os.environ.get("ROOM_JOURNAL_PATH")
+        if path:
+            self.path = Path(path)
+        else:
+            logs_root = os.environ.get("CASINO_LOG_DIR")
+            logs_dir = Path(logs_root) if logs_root else Path(__file__).resolve().parent / "logs"
+            self.path = logs_dir / "room_journal.jsonl"
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.compact_after = compact_after if compact_after is not None else int(
+            os.environ.get("ROOM_JOURNAL_COMPACT_AFTER", "20000"))
+        self._live_rooms: Optional[Callable[[], Iterable]] = None
+        self._since_compact = 0
+        self._buffer: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._inflight: Optional[asyncio.Future] = None
+        self._kick: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._fh = None
+        self.records_written = 0
+        self.batches_written = 0
+        self.compactions = 0
+
+    def configure(self, live_rooms: Callable[[], Iterable]):
+        """Enable runtime compaction; live_rooms() returns the rooms still open"""
+        self._live_rooms = live_rooms
+
+    # ── Recording (called from RoomRegistry / game engine) ───────────
+
+    @staticmethod
+    def _format(event: str, room_id: str, **fields) -> str:
+        entry = {"ts": clock.time(), "event": event, "room_id": room_id, **fields}
+        return json.dumps(entry, default=_json_default)
+
+    def _record(self, event: str, room_id: str, **fields):
+        self._buffer.append(self._format(event, room_id, **fields))
+        if len(self._buffer) >= self.max_batch and self._kick is not None:
+            self._kick.set()
+
+    @staticmethod
+    def _open_fields(room) -> Dict:
+        return {
+            "room_type": _type_key(room.room_type),
+            "round_number": room.round_number,
+            "max_players": room.max_players,
+            "status": room.status,
+            "created_at": room.created_at,
+            "players": [_player_doc(p) for p in room.players],
+        }
+
+    def room_opened(self, room):
+        self._record("open", room.id, **self._open_fields(room))
+
+    def room_closed(self, room_id: str):
+        self._record("close", room_id)
+
+    def status_changed(self, room_id: str, status: str):
+        self._record("status", room_id, status=status)
+
+    def player_joined(self, room_id: str, player):
+        self._record("join", room_id, player=_player_doc(player))
+
+    def player_left(self, room_id: str, user_id: str):
+        self._record("leave", room_id, user_id=user_id)
+
+    def players_cleared(self, room_id: str):
+        self._record("clear", room_id)
+
+    def credit_pending(self, room_id: str, user_id: str, amount: int):
+        """Recorded (and flushed) before the winner's balance is touched"""
+        self._record("credit_pending", room_id, user_id=user_id, amount=amount)
+
+    def prize_credited(self, room_id: str, user_id: str, amount: int):
+        self._record("credit", room_id, user_id=user_id, amount=amount)
+
+    def refund_pending(self, room_id: str, user_id: str, amount: int):
+        """Recorded (and flushed) before a refunded player's balance is touched"""
+        self._record("refund_pending", room_id, user_id=user_id, amount=amount)
+
+    def player_refunded(self, room_id: str, user_id: str, amount: int):
+        self._record("refund", room_id, user_id=user_id, amount=amount)
+
+    # ── Durability ───────────────────────────────────────────────────
+
+    async def flush(self):
+        """Wait until every record made so far is fsynced"""
+        if self._task is None:
+            # Writer not running (startup / shutdown) — write inline
+            await self._write_batch()
+            return
+        if self._buffer:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+        elif self._inflight is not None:
+            await asyncio.shield(self._inflight)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._kick = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📓 Room journal writing to {self.path}")
+
+    async def stop(self):
+        """Stop the writer after a final flush (not cancelled, so no batch is torn)"""
+        if self._task:
+            self._stopping = True
+            self._kick.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self._write_batch()
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._kick.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._kick.clear()
+            try:
+                await self._write_batch()
+                if self._live_rooms is not None and self._since_compact >= self.compact_after:
+                    await self.compact(self._live_rooms())
+            except Exception as e:
+                logger.error(f"❌ Room journal write failed: {e}")
+
+    async def _write_batch(self):
+        # Loop: another writer (or compact) may take the slot before we wake up
+        while self._inflight is not None:
+            await asyncio.shield(self._inflight)
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        waiters, self._waiters = self._waiters, []
+        self._inflight = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.to_thread(self._write_lines, lines)
+        except Exception as e:
+            # Keep the records for the next attempt, but don't hold callers hostage
+            self._buffer[:0] = lines
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            raise
+        finally:
+            self._inflight.set_result(None)
+            self._inflight = None
+        self.records_written += len(lines)
+        self._since_compact += len(lines)
+        self.batches_written += 1
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _write_lines(self, lines: List[str]):
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write("\n".join(lines) + "\n")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+
+    # ── Startup replay ───────────────────────────────────────────────
+
+    def replay(self) -> List[Dict]:
+        """
+        Rebuild the last known state of every room that was not closed
+
+        Returns:
+            List of room snapshots: id, room_type, round_number, max_players,
+            created_at, status, players (list of player docs), credited
+            ({user_id, amount} or None), credit_pending ({user_id, amount}
+            or None), refund_pending and refunded (dicts user_id → amount)
+        """
+        rooms: Dict[str, Dict] = {}
+        if not self.path.exists():
+            return []
+
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write is expected
+                    logger.warning(f"⚠️ Skipping unreadable room journal line {line_no}")
+                    continue
+
+                event = entry.get("event")
+                room_id = entry.get("room_id")
+                if event == "open":
+                    rooms[room_id] = {
+                        "id": room_id,
+                        "room_type": entry["room_type"],
+                        "round_number": entry.get("round_number", 1),
+                        "max_players": entry.get("max_players", 3),
+                        "created_at": entry.get("created_at"),
+                        "status": entry.get("status", "waiting"),
+                        "players": {p["user_id"]: p for p in entry.get("players", [])},
+                        "credited": None,
+                        "credit_pending": None,
+                        "refund_pending": {},
+                        "refunded": {},
+                    }
+                    continue
+
+                room = rooms.get(room_id)
+                if room is None:
+                    continue
+                if event == "close":
+                    del rooms[room_id]
+                elif event == "status":
+                    room["status"] = entry["status"]
+                elif event == "join":
+                    room["players"][entry["player"]["user_id"]] = entry["player"]
+                elif event == "leave":
+                    room["players"].pop(entry["user_id"], None)
+                elif event == "clear":
+                    room["players"].clear()
+                elif event == "credit_pending":
+                    room["credit_pending"] = {"user_id": entry["user_id"], "amount": entry.get("amount", 0)}
+                elif event == "credit":
+                    room["credited"] = {"user_id": entry["user_id"], "amount": entry.get("amount", 0)}
+                elif event == "refund_pending":
+                    room["refund_pending"][entry["user_id"]] = entry.get("amount", 0)
+                elif event == "refund":
+                    room["refunded"][entry["user_id"]] = entry.get("amount", 0)
+
+        snapshots = []
+        for room in rooms.values():
+            room["players"] = list(room["players"].values())
+            snapshots.append(room)
+        return snapshots
+
+    async def compact(self, rooms):
+        """
+        Rewrite the journal as the current state of every live room
+
+        Each room gets an open record plus its credit_pending / credit /
+        refund_pending / refund records, so a compacted journal replays the same settlement
+        state. Holds the write slot for the whole rewrite; records made
+        meanwhile stay buffered and land in the new file.
+        """
+        while self._inflight is not None:
+            await asyncio.shield(self._inflight)
+        lines, self._buffer = self._buffer, []
+        waiters, self._waiters = self._waiters, []
+        self._inflight = asyncio.get_running_loop().create_future()
+        try:
+            # Buffered records go to disk first so replay() sees them
+            try:
+                if lines:
+                    await asyncio.to_thread(self._write_lines, lines)
+            except Exception as e:
+                self._buffer[:0] = lines
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                raise
+            self.records_written += len(lines)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+            settled = {snap["id"]: snap for snap in await asyncio.to_thread(self.replay)}
+            live = list(rooms)
+            compacted = []
+            for room in live:
+                compacted.append(self._format("open", room.id, **self._open_fields(room)))
+                snap = settled.get(room.id)
+                if snap is None:
+                    continue
+                if snap["credit_pending"]:
+                    compacted.append(self._format("credit_pending", room.id, **snap["credit_pending"]))
+                if snap["credited"]:
+                    compacted.append(self._format("credit", room.id, **snap["credited"]))
+                for user_id, amount in snap["refund_pending"].items():
+                    compacted.append(self._format("refund_pending", room.id, user_id=user_id, amount=amount))
+                for user_id, amount in snap["refunded"].items():
+                    compacted.append(self._format("refund", room.id, user_id=user_id, amount=amount))
+            await asyncio.to_thread(self._rewrite, compacted)
+            self._since_compact = len(compacted)
+            self.compactions += 1
+        finally:
+            self._inflight.set_result(None)
+            self._inflight = None
+        logger.info(f"📓 Room journal compacted to {len(live)} rooms")
+
+    def _rewrite(self, lines: List[str]):
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            if lines:
+                fh.write("\n".join(lines) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get_stats(self) -> Dict:
+        return {
+            "path": str(self.path),
+            "buffered": len(self._buffer),
+            "records_written": self.records_written,
+            "batches_written": self.batches_written,
+            "since_compaction": self._since_compact,
+            "compactions": self.compactions,
+        }
+
+
+# Global journal instance
+room_journal = RoomJournal()
@@ -0,0 +1,117 @@
+"""
+Live Room Models
+Slotted, non-validating room/player structures used by the in-memory game
+engine. Pydantic models stay at the API boundary (request bodies, schemas);
+the hot path mutates these plain objects and serializes with to_dict().
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from clock import clock
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _parse_dt(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class LivePlayer:
+    """A seat in a live room"""
+
+    __slots__ = ("user_id", "username", "first_name", "last_name", "photo_url",
+                 "bet_amount", "is_anonymous", "joined_at")
+
+    def __init__(self, user_id: str, username: str, first_name: str, bet_amount: int,
+                 last_name: Optional[str] = None, photo_url: Optional[str] = None,
+                 is_anonymous: bool = False, joined_at: Optional[datetime] = None):
+        self.user_id = user_id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.photo_url = photo_url
+        self.bet_amount = bet_amount
+        self.is_anonymous = is_anonymous
+        self.joined_at = joined_at or clock.now()
+
+    def to_dict(self) -> Dict:
+        """JSON-ready dict (same shape the API has always returned for RoomPlayer)"""
+        return {
+            "user_id": self.user_id,
+            "username": self.username,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "photo_url": self.photo_url,
+            "bet_amount": self.bet_amount,
+            "is_anonymous": self.is_anonymous,
+            "joined_at": _iso(self.joined_at),
+        }
+
+    @classmethod
+    def from_dict(cls, doc: Dict) -> "LivePlayer":
+        return cls(
+            user_id=doc["user_id"],
+            username=doc.get("username", ""),
+            first_name=doc.get("first_name", "Player"),
+            bet_amount=int(doc.get("bet_amount", 0)),
+            last_name=doc.get("last_name"),
+            photo_url=doc.get("photo_url"),
+            is_anonymous=bool(doc.get("is_anonymous", False)),
+            joined_at=_parse_dt(doc.get("joined_at")),
+        )
+
+    def __repr__(self) -> str:
+        return f"LivePlayer({self.user_id!r}, bet={self.bet_amount})"
+
+
+class LiveRoom:
+    """A live game room (waiting → ready → playing → finished)"""
+
+    __slots__ = ("id", "room_type", "players", "status", "prize_pool", "max_players",
+                 "winner", "prize_link", "match_id", "round_number",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, room_type, id: Optional[str] = None, players: Optional[List[LivePlayer]] = None,
+                 status: str = "waiting", prize_pool: int = 0, max_players: int = 3,
+                 round_number: int = 1, created_at: Optional[datetime] = None):
+        self.id = id or str(uuid.uuid4())
+        self.room_type = room_type
+        self.players: List[LivePlayer] = players if players is not None else []
+        self.status = status
+        self.prize_pool = prize_pool
+        self.max_players = max_players
+        self.winner: Optional[LivePlayer] = None
+        self.prize_link: Optional[str] = None
+        self.match_id: Optional[str] = None  # Set when game round starts
+        self.round_number = round_number
+        self.created_at = created_at or clock.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> Dict:
+        """JSON-ready dict of the full room (players and winner included)"""
+        room_type = self.room_type
+        return {
+            "id": self.id,
+            "room_type": room_type.value if hasattr(room_type, "value") else room_type,
+            "players": [p.to_dict() for p in self.players],
+            "status": self.status,
+            "prize_pool": self.prize_pool,
+            "max_players": self.max_players,
+            "winner": self.winner.to_dict() if self.winner else None,
+            "prize_link": self.prize_link,
+            "match_id": self.match_id,
+            "round_number": self.round_number,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+        }
+
+    def __repr__(self) -> str:
+        return f"LiveRoom({self.id[:8]}, {self.room_type}, {self.status}, {len(self.players)}/{self.max_players})"
@@ -0,0 +1,210 @@
+"""
+Live Room Registry
+Holds all active game rooms and keeps constant-time lookup indexes:
+(room_type, status) -> rooms, user_id -> room_ids, room_id -> player ids.
+
+All room membership and status changes must go through the registry so the
+indexes stay consistent with the room objects (and so an attached journal
+sees every mutation).
+"""
+
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _type_key(room_type) -> str:
+    """Normalize RoomType enum members and plain strings to the same key"""
+    return room_type.value if hasattr(room_type, 'value') else str(room_type)
+
+
+class RoomRegistry:
+    """In-memory store of active rooms with secondary indexes"""
+
+    def __init__(self, journal=None):
+        self.journal = journal  # optional RoomJournal receiving every mutation
+        self._vacate_listeners: List[Callable[[str], None]] = []  # called with room_id when a room empties / closes
+        self._change_listeners: List[Callable[[], None]] = []  # called after any mutation
+        self._rooms: Dict[str, Any] = {}  # room_id -> room
+        self._by_type_status: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (type, status) -> {room_id: room}
+        self._user_rooms: Dict[str, Set[str]] = {}  # user_id -> set of room_ids
+        self._room_players: Dict[str, Set[str]] = {}  # room_id -> set of user_ids
+
+    # ── Read access (dict-like) ──────────────────────────────────────
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._rooms
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._rooms)
+
+    def __getitem__(self, room_id: str):
+        return self._rooms[room_id]
+
+    def get(self, room_id: str, default=None):
+        return self._rooms.get(room_id, default)
+
+    def values(self):
+        return self._rooms.values()
+
+    def items(self):
+        return self._rooms.items()
+
+    # ── Index lookups ────────────────────────────────────────────────
+
+    def find(self, room_type, status: str = "waiting"):
+        """Return the oldest room of this type in this status, or None"""
+        bucket = self._by_type_status.get((_type_key(room_type), status))
+        if not bucket:
+            return None
+        return next(iter(bucket.values()))
+
+    def rooms_with(self, room_type, status: str) -> List:
+        bucket = self._by_type_status.get((_type_key(room_type), status))
+        return list(bucket.values()) if bucket else []
+
+    def rooms_for_user(self, user_id: str) -> List:
+        room_ids = self._user_rooms.get(user_id)
+        if not room_ids:
+            return []
+        return [self._rooms[rid] for rid in room_ids if rid in self._rooms]
+
+    def has_player(self, room, user_id: str) -> bool:
+        return user_id in self._room_players.get(room.id, ())
+
+    def add_vacate_listener(self, listener: Callable[[str], None]):
+        """Register a callback run when a room is removed or left without players"""
+        self._vacate_listeners.append(listener)
+
+    def add_change_listener(self, listener: Callable[[], None]):
+        """Register a callback run after every room mutation (cache invalidation)"""
+        self._change_listeners.append(listener)
+
+    # ── Mutations ────────────────────────────────────────────────────
+
+    def add(self, room):
+        """Register a room (and any players it already has)"""
+        if room.id in self._rooms:
+            self.remove(room.id)
+        self._rooms[room.id] = room
+        self._index_status(room, room.status)
+        self._room_players[room.id] = set()
+        for player in room.players:
+            self._index_player(room.id, player.user_id)
+        if self.journal:
+            self.journal.room_opened(room)
+        self._notify_changed()
+        return room
+
+    def remove(self, room_id: str):
+        """Unregister a room and drop all of its index entries"""
+        room = self._rooms.pop(room_id, None)
+        if room is None:
+            return None
+        self._unindex_status(room, room.status)
+        for user_id in self._room_players.pop(room_id, set()):
+            self._unindex_user(user_id, room_id)
+        if self.journal:
+            self.journal.room_closed(room_id)
+        self._notify_vacated(room_id)
+        self._notify_changed()
+        return room
+
+    def set_status(self, room, status: str):
+        if room.status == status:
+            return
+        if room.id in self._rooms:
+            self._unindex_status(room, room.status)
+            room.status = status
+            self._index_status(room, status)
+            if self.journal:
+                self.journal.status_changed(room.id, status)
+            self._notify_changed()
+        else:
+            room.status = status
+
+    def add_player(self, room, player):
+        room.players.append(player)
+        if room.id in self._rooms:
+            self._index_player(room.id, player.user_id)
+            if self.journal:
+                self.journal.player_joined(room.id, player)
+            self._notify_changed()
+
+    def remove_player(self, room, user_id: str):
+        """Remove a player from a room, returning the removed player or None"""
+        if not self.has_player(room, user_id):
+            return None
+        removed = None
+        remaining = []
+        for p in room.players:
+            if removed is None and p.user_id == user_id:
+                removed = p
+            else:
+                remaining.append(p)
+        room.players = remaining
+        # A user only ever holds one seat per room
+        self._room_players[room.id].discard(user_id)
+        self._unindex_user(user_id, room.id)
+        if self.journal:
+            self.journal.player_left(room.id, user_id)
+        if not room.players:
+            self._notify_vacated(room.id)
+        self._notify_changed()
+        return removed
+
+    def clear_players(self, room) -> List:
+        removed = list(room.players)
+        room.players.clear()
+        for user_id in self._room_players.get(room.id, set()):
+            self._unindex_user(user_id, room.id)
+        if room.id in self._room_players:
+            self._room_players[room.id] = set()
+            if self.journal:
+                self.journal.players_cleared(room.id)
+        self._notify_vacated(room.id)
+        self._notify_changed()
+        return removed
+
+    # ── Internal helpers ─────────────────────────────────────────────
+
+    def _notify_changed(self):
+        for listener in self._change_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Room change listener failed: {e}")
+
+    def _notify_vacated(self, room_id: str):
+        for listener in self._vacate_listeners:
+            try:
+                listener(room_id)
+            except Exception as e:
+                logger.error(f"Room vacate listener failed for {room_id}: {e}")
+
+    def _index_status(self, room, status: str):
+        key = (_type_key(room.room_type), status)
+        self._by_type_status.setdefault(key, {})[room.id] = room
+
+    def _unindex_status(self, room, status: str):
+        key = (_type_key(room.room_type), status)
+        bucket = self._by_type_status.get(key)
+        if bucket is not None:
+            bucket.pop(room.id, None)
+            if not bucket:
+                del self._by_type_status[key]
+
+    def _index_player(self, room_id: str, user_id: str):
+        self._room_players.setdefault(room_id, set()).add(user_id)
+        self._user_rooms.setdefault(user_id, set()).add(room_id)
+
+    def _unindex_user(self, user_id: str, room_id: str):
+        room_ids = self._user_rooms.get(user_id)
+        if room_ids is not None:
+            room_ids.discard(room_id)
+            if not room_ids:
+                del self._user_rooms[user_id]
@@ -0,0 +1,214 @@
+"""
+Round Scheduler
+Owns every timed room phase transition (start → resolve → redirect → close)
+on a single heap-based timer loop instead of one sleeping task per round.
+Pending transitions can be inspected, cancelled and re-scheduled, and the
+loop records how late each transition fired (phase lag).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from clock import clock
+from metrics import round_phase, round_phase_lag
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledTransition:
+    """A single pending room phase transition"""
+
+    __slots__ = ("room_id", "phase", "due", "callback", "args", "scheduled_at", "cancelled")
+
+    def __init__(self, room_id: str, phase: str, due: float,
+                 callback: Callable[..., Awaitable[Any]], args: tuple):
+        self.room_id = room_id
+        self.phase = phase
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.scheduled_at = clock.time()
+        self.cancelled = False
+
+
+class RoundScheduler:
+    """Single timer loop driving all room phase transitions"""
+
+    def __init__(self, lag_samples: int = 1000):
+        self._heap: List[tuple] = []  # (due, seq, transition)
+        self._seq = itertools.count()
+        self._by_room: Dict[str, ScheduledTransition] = {}  # at most one pending transition per room
+        self._running_tasks: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lags: deque = deque(maxlen=lag_samples)
+        self.fired = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _now(self) -> float:
+        return clock.monotonic()
+
+    # ── Lifecycle ────────────────────────────────────────────────────
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("⏱️ Round scheduler started")
+
+    async def stop(self) -> List[Dict]:
+        """Stop the timer loop; returns the transitions that were still pending"""
+        pending = self.pending()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running_tasks:
+            await asyncio.gather(*self._running_tasks, return_exceptions=True)
+        if pending:
+            logger.warning(f"⏱️ Round scheduler stopped with {len(pending)} pending transitions: "
+                           f"{[(p['room_id'][:8], p['phase']) for p in pending]}")
+        return pending
+
+    # ── Scheduling API ───────────────────────────────────────────────
+
+    def schedule(self, room_id: str, phase: str, delay: float,
+                 callback: Callable[..., Awaitable[Any]], *args) -> ScheduledTransition:
+        """
+        Schedule the next phase transition for a room
+
+        A room has at most one pending transition; scheduling replaces it.
+
+        Args:
+            room_id: Room the transition belongs to
+            phase: Phase name (for inspection/metrics)
+            delay: Seconds from now
+            callback: Coroutine function run when the transition fires
+            *args: Arguments passed to callback
+        """
+        self._cancel_entry(room_id)
+        transition = ScheduledTransition(room_id, phase, self._now() + max(0.0, delay), callback, args)
+        self._by_room[room_id] = transition
+        heapq.heappush(self._heap, (transition.due, next(self._seq), transition))
+        self._wake()
+        return transition
+
+    def cancel(self, room_id: str) -> bool:
+        """Cancel the pending transition of a room"""
+        if self._cancel_entry(room_id):
+            self.cancelled += 1
+            self._wake()
+            return True
+        return False
+
+    def reschedule(self, room_id: str, delay: float) -> bool:
+        """Move a room's pending transition to fire `delay` seconds from now"""
+        transition = self._by_room.get(room_id)
+        if transition is None:
+            return False
+        self.schedule(room_id, transition.phase, delay, transition.callback, *transition.args)
+        return True
+
+    def get_transition(self, room_id: str) -> Optional[ScheduledTransition]:
+        return self._by_room.get(room_id)
+
+    # ── Inspection ───────────────────────────────────────────────────
+
+    def pending(self) -> List[Dict]:
+        now = self._now()
+        return [
+            {
+                "room_id": t.room_id,
+                "phase": t.phase,
+                "due_in": round(t.due - now, 3),
+                "scheduled_at": t.scheduled_at,
+            }
+            for t in sorted(self._by_room.values(), key=lambda t: t.due)
+        ]
+
+    def get_stats(self) -> Dict:
+        lags = sorted(self._lags)
+
+        def pct(p: float) -> float:
+            if not lags:
+                return 0.0
+            return round(lags[min(len(lags) - 1, int(p * len(lags)))] * 1000, 2)
+
+        return {
+            "pending": len(self._by_room),
+            "running": len(self._running_tasks),
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "lag_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99),
+                       "max": round(lags[-1] * 1000, 2) if lags else 0.0},
+        }
+
+    # ── Timer loop ───────────────────────────────────────────────────
+
+    def _cancel_entry(self, room_id: str) -> bool:
+        transition = self._by_room.pop(room_id, None)
+        if transition is None:
+            return False
+        transition.cancelled = True  # lazily dropped from the heap
+        return True
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            handle = None
+            if self._heap:
+                delay = self._heap[0][0] - self._now()
+                if delay <= 0:
+                    self._fire_due()
+                    continue
+                handle = loop.call_later(delay, self._wakeup.set)
+            try:
+                await self._wakeup.wait()
+            finally:
+                if handle is not None:
+                    handle.cancel()
+
+    def _fire_due(self):
+        now = self._now()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, transition = heapq.heappop(self._heap)
+            if transition.cancelled:
+                continue
+            if self._by_room.get(transition.room_id) is transition:
+                del self._by_room[transition.room_id]
+            self._lags.append(now - transition.due)
+            round_phase_lag.labels(transition.phase).observe(max(0.0, now - transition.due))
+            self.fired += 1
+            task = asyncio.create_task(self._execute(transition))
+            self._running_tasks.add(task)
+            task.add_done_callback(self._running_tasks.discard)
+
+    async def _execute(self, transition: ScheduledTransition):
+        try:
+            with round_phase.labels(transition.phase).time():
+                await transition.callback(*transition.args)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Round transition {transition.phase} failed for room {transition.room_id}: {e}", exc_info=True)
+
+
+# Global scheduler instance
+round_scheduler = RoundScheduler()
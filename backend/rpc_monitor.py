@@ -6,6 +6,7 @@ Tracks RPC health and logs failures
 import logging
 import os
 from pathlib import Path
+from log_pipeline import file_logger
 from datetime import datetime, timezone
 from typing import Dict, Optional
 
@@ -21,6 +22,7 @@ class RPCAlertSystem:
         else:
             self.logs_dir = Path(__file__).resolve().parent / "logs"
         self.alert_log_path = self.logs_dir / "rpc_alerts.log"
+        self._alert_file = None  # created on first alert, written from a listener thread
         self.failure_counts = {}
         self.last_alert_times = {}
         self.alert_cooldown = 300  # 5 minutes between alerts for same endpoint
@@ -31,11 +33,10 @@ class RPCAlertSystem:
         log_entry = f"[{timestamp}] {message}\n"
         
         try:
-            self.logs_dir.mkdir(parents=True, exist_ok=True)
+            if self._alert_file is None:
+                self._alert_file = file_logger("rpc_alerts", self.alert_log_path)
+            self._alert_file.info(log_entry.rstrip("\n"))
 
-            with open(self.alert_log_path, 'a') as f:
-                f.write(log_entry)
-                
             logger.error(f"🚨 RPC ALERT: {message}")
             
         except Exception as e:
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Depends
 from fastapi.responses import Response, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import socketio
@@ -34,11 +34,31 @@ ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # Import after .env is loaded so modules can read the environment
-from solana_integration import SolanaPaymentProcessor, get_processor, PriceFetcher
+import log_pipeline
+from solana_integration import SolanaPaymentProcessor, get_processor, PriceFetcher, instrument_rpc_client, COINGECKO_API_URL
 from payment_recovery import run_startup_recovery
 from rpc_monitor import rpc_alert_system
 from manual_credit_logger import credit_tokens_manually, ManualCreditLogger
+from tx_deltas import tx_delta_extractor
 import socket_rooms
+from room_registry import RoomRegistry
+from room_models import LiveRoom, LivePlayer
+from fast_json import FastJSONResponse, socketio_json
+from lobby_broadcaster import lobby_broadcaster
+from room_chat import room_chat
+from event_throttle import (
+    throttle_stats, reaction_limiter, chat_limiter, chat_duplicates, chat_dedupe_key, reaction_batcher, forget_sender
+)
+from round_scheduler import round_scheduler
+from clock import clock
+from room_journal import room_journal
+from response_cache import response_cache, ResponseCacheMiddleware
+from leaderboard_cache import leaderboard_cache
+from session_tokens import session_tokens, SessionClaims, SessionError
+from metrics import metrics, MetricsMiddleware, socket_emits, socket_fanout
+from query_stats import query_stats
+from loop_monitor import loop_monitor
+from tracing import tracer
 
 # Get environment variables
 PG_HOST = os.environ.get('PG_HOST', 'localhost')
@@ -58,12 +78,17 @@ REQUIRED_CORS_ORIGINS = [
 ]
 CORS_ORIGINS = list(dict.fromkeys(CORS_ORIGINS_ENV + REQUIRED_CORS_ORIGINS))
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN', 'YOUR_TELEGRAM_BOT_TOKEN_HERE')
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')  # standins.py locally
 
 # Solana Configuration for devnet (test environment as requested)
 SOLANA_RPC_URL = os.environ.get('SOLANA_RPC_URL', 'https://api.devnet.solana.com')
 CASINO_WALLET_PRIVATE_KEY = os.environ.get('CASINO_WALLET_PRIVATE_KEY', '')
 CASINO_WALLET_ADDRESS = os.environ.get('CASINO_WALLET_ADDRESS', 'YourWalletAddressHere12345678901234567890123456789')
 
+# Benchmark-only endpoints (socket probe) are not routed unless explicitly enabled
+ENABLE_BENCH_ENDPOINTS = os.environ.get('ENABLE_BENCH_ENDPOINTS') == '1'
+SOCKET_PROBE_MAX_BYTES = 64 * 1024
+
 # HD Wallet Derivation System
 class SolanaWalletDerivation:
     def __init__(self, master_private_key_base58: str = None):
@@ -118,7 +143,7 @@ class SolanaWalletDerivation:
                 return False
                 
             # Get balance of derived address
-            client = AsyncClient(SOLANA_RPC_URL)
+            client = instrument_rpc_client(AsyncClient(SOLANA_RPC_URL))
             balance_response = await client.get_balance(derived_keypair.pubkey())
             
             if not balance_response.value:
@@ -157,7 +182,19 @@ wallet_derivation = SolanaWalletDerivation(CASINO_WALLET_PRIVATE_KEY)
 # PostgreSQL pool is initialized in the startup event (see lifespan below)
 
 # FastAPI app
-app = FastAPI(title="Solana Casino Battle Royale")
+# Responses go through the fast JSON encoder (orjson when available)
+app = FastAPI(title="Solana Casino Battle Royale", default_response_class=FastJSONResponse)
+
+# Micro-cache + ETag/304 for hot polled GETs. Tags are bumped on mutation:
+# "rooms" by the registry / lobby updates, "history" + "leaderboard" when a round settles.
+response_cache.add_rule("/api/rooms", ttl=1.0, tags=("rooms",))
+response_cache.add_rule("/api/room/{room_id}", ttl=1.0, tags=("rooms",))
+response_cache.add_rule("/api/room-participants/{room_type}", ttl=1.0, tags=("rooms",))
+response_cache.add_rule("/api/leaderboard", ttl=10.0, tags=("leaderboard",))
+response_cache.add_rule("/api/game-history", ttl=5.0, tags=("history",))
+response_cache.add_rule("/api/sol-eur-price", ttl=30.0, tags=("price",))
+# Added before CORS so CORS stays outermost and decorates cached / 304 responses too
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache)
 
 app.add_middleware(
     CORSMiddleware,
@@ -166,14 +203,34 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
+# Outermost, so latency includes cache hits and CORS preflights
+app.add_middleware(MetricsMiddleware)
+
+
+class InstrumentedAsyncServer(socketio.AsyncServer):
+    """AsyncServer that counts emits and their fan-out for /api/metrics (and traces them)"""
+
+    async def emit(self, event, data=None, to=None, room=None, skip_sid=None, namespace=None, **kwargs):
+        target = to if to is not None else room
+        sockets = self.manager.rooms.get(namespace or '/', {})
+        if isinstance(target, (list, tuple, set)):
+            recipients = sum(len(sockets.get(r, ())) for r in target)
+        else:
+            recipients = len(sockets.get(target, ()))  # None = every connected socket
+        socket_emits.labels(event).inc()
+        socket_fanout.labels(event).observe(recipients)
+        with tracer.child("emit", event=event, recipients=recipients):
+            await super().emit(event, data, to=to, room=room, skip_sid=skip_sid, namespace=namespace, **kwargs)
 
 
 # Socket.IO setup
-sio = socketio.AsyncServer(
+sio = InstrumentedAsyncServer(
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True,
+    # Package loggers — levels come from LOG_LEVELS (WARNING by default)
+    logger=logging.getLogger("socketio"),
+    engineio_logger=logging.getLogger("engineio"),
     async_mode='asgi',
+    json=socketio_json,  # same fast encoder for every emitted packet
     ping_timeout=60,  # Increase from default 5s to 60s
     ping_interval=25,  # Keep connection alive every 25s
     max_http_buffer_size=10000000  # 10MB for large payloads
@@ -209,6 +266,20 @@ ROOM_SETTINGS = {
     RoomType.FREEROLL: {"min_bet": 0, "max_bet": 0, "name": "Free Roll"},
 }
 
+# Round phase durations in seconds, per room type:
+#   spin     — GET READY + roulette animation before the winner is drawn
+#   announce — winner screen before redirect_home
+#   cleanup  — grace period before the finished room is dropped
+# Override at deploy time with ROOM_PHASE_DURATIONS='{"bronze": {"spin": 6}}'
+DEFAULT_PHASE_DURATIONS = {"spin": 8.0, "announce": 8.0, "cleanup": 0.5}
+room_phase_durations: dict = {rt.value: dict(DEFAULT_PHASE_DURATIONS) for rt in RoomType}
+try:
+    for _rt, _overrides in json.loads(os.environ.get('ROOM_PHASE_DURATIONS', '{}')).items():
+        if _rt in room_phase_durations:
+            room_phase_durations[_rt].update({k: float(v) for k, v in _overrides.items() if k in DEFAULT_PHASE_DURATIONS})
+except Exception as e:
+    logging.error(f"Invalid ROOM_PHASE_DURATIONS, using defaults: {e}")
+
 # Models
 class TelegramAuthData(BaseModel):
     id: int
@@ -239,6 +310,10 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     last_login: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class AuthenticatedUser(User):
+    session_token: str
+    session_expires_at: int
+
 class UserCreate(BaseModel):
     telegram_auth_data: TelegramAuthData
 
@@ -247,6 +322,8 @@ class TokenPurchase(BaseModel):
     sol_amount: float
     token_amount: int
 
+# API schemas for room payloads — the live engine uses the slotted
+# LiveRoom / LivePlayer from room_models and serializes with to_dict()
 class RoomPlayer(BaseModel):
     user_id: str
     username: str  # Telegram username (@username)
@@ -285,17 +362,39 @@ class JoinRoomRequest(BaseModel):
     is_anonymous: bool = False
 
 # In-memory storage for active rooms (in production, use Redis)
-active_rooms: Dict[str, GameRoom] = {}
+# Indexed by (room_type, status) and user_id — mutate only via the registry
+# Every mutation is journaled so a restart can restore rooms / refund rounds
+active_rooms = RoomRegistry(journal=room_journal)
+room_journal.configure(active_rooms.values)
 
 # Maintenance mode — blocks new room joins (resets on restart)
 maintenance_mode: bool = False
 
+# Tokens the free room winner gets (minted — nobody bets in the free room)
+FREE_ROOM_PRIZE = 100
+
 # Free Roll room global config
 freeroll_config: dict = {"max_players": 30, "prize": 500, "is_locked": False}
 
 # Per-room-type lock state (persists until server restart)
 locked_rooms: set = set()  # e.g. {"bronze", "silver", "gold", "freeroll"}
 
+def get_phase_durations(room_type) -> dict:
+    """Phase durations (seconds) for a room type"""
+    key = room_type.value if hasattr(room_type, 'value') else str(room_type)
+    return room_phase_durations.get(key, DEFAULT_PHASE_DURATIONS)
+
+def spawn_waiting_room(room_type, round_number: int = 1) -> LiveRoom:
+    """Open the next waiting room of a type (no-op if one is already open)"""
+    existing = active_rooms.find(room_type, "waiting")
+    if existing:
+        return existing
+    room = LiveRoom(room_type=RoomType(room_type), round_number=round_number)
+    if room.room_type == RoomType.FREEROLL:
+        room.max_players = freeroll_config['max_players']
+    active_rooms.add(room)
+    return room
+
 # Telegram authentication functions
 def verify_telegram_auth(auth_data: dict, bot_token: str) -> bool:
     """Verify Telegram authentication data - PRODUCTION VERSION"""
@@ -366,7 +465,7 @@ async def send_telegram_message(telegram_id: int, message: str, reply_markup: Op
             logging.warning("Telegram bot token not configured, skipping message send")
             return False
             
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+        url = f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
         
         payload = {
             "chat_id": telegram_id,
@@ -433,7 +532,7 @@ class PriceOracle:
                 return self.cached_price
             
             # Fetch from CoinGecko
-            url = "https://api.coingecko.com/api/v3/simple/price"
+            url = f"{COINGECKO_API_URL}/simple/price"
             params = {
                 "ids": "solana",
                 "vs_currencies": "eur"
@@ -546,7 +645,7 @@ async def get_or_create_derived_address(user_id: str, telegram_id: int) -> dict:
 # Solana Payment Monitoring System
 class PaymentMonitor:
     def __init__(self):
-        self.client = AsyncClient(SOLANA_RPC_URL)
+        self.client = instrument_rpc_client(AsyncClient(SOLANA_RPC_URL))
         self.last_checked_signatures = {}  # Track last signature per address
         self.monitoring = False
         self.monitored_addresses = set()  # All derived addresses being monitored
@@ -590,12 +689,12 @@ class PaymentMonitor:
         try:
             while self.monitoring:
                 await self._check_for_payments()
-                await asyncio.sleep(10)  # Check every 10 seconds
+                await clock.sleep(10)  # Check every 10 seconds
                 
         except Exception as e:
             logging.error(f"Payment monitoring error: {e}")
             # Restart monitoring after error
-            await asyncio.sleep(30)
+            await clock.sleep(30)
             if self.monitoring:
                 asyncio.create_task(self._monitor_payments())
     
@@ -647,44 +746,20 @@ class PaymentMonitor:
     async def _process_transaction(self, signature: str, receiving_address: str):
         """Process a single transaction for payment detection using Derived Address System"""
         try:
-            # Get transaction details
-            tx = await self.client.get_transaction(signature)
-            if not tx.value or not tx.value.transaction:
-                return
-                
-            transaction = tx.value.transaction
-            meta = tx.value.transaction.meta
-            
-            if not meta or meta.err:
-                return  # Skip failed transactions
-            
-            # Check if this is an incoming SOL transfer
-            pre_balances = meta.pre_balances
-            post_balances = meta.post_balances
-            
-            # Find receiving address in account keys
-            account_keys = transaction.transaction.message.account_keys
-            receiving_address_index = None
-            
-            for i, key in enumerate(account_keys):
-                if str(key) == receiving_address:
-                    receiving_address_index = i
-                    break
-            
-            if receiving_address_index is None:
-                return
+            # Get balance deltas (shared, signature-keyed cache)
+            deltas = await tx_delta_extractor.get_deltas(self.client, signature)
+            if deltas is None or deltas.failed:
+                return  # Not confirmed yet or failed transaction
             
             # Calculate SOL received (in lamports)
-            if len(post_balances) > receiving_address_index and len(pre_balances) > receiving_address_index:
-                balance_change = post_balances[receiving_address_index] - pre_balances[receiving_address_index]
+            balance_change = deltas.received_lamports(receiving_address)
+            if balance_change > 0:  # Received SOL
+                sol_amount = balance_change / 1_000_000_000  # Convert lamports to SOL
                 
-                if balance_change > 0:  # Received SOL
-                    sol_amount = balance_change / 1_000_000_000  # Convert lamports to SOL
-                    
-                    logging.info(f"💰 Received {sol_amount} SOL in transaction {signature} to derived address {receiving_address}")
-                    
-                    # Credit tokens to user who owns this derived address
-                    await self._credit_tokens_for_derived_address(signature, sol_amount, receiving_address)
+                logging.info(f"💰 Received {sol_amount} SOL in transaction {signature} to derived address {receiving_address}")
+                
+                # Credit tokens to user who owns this derived address
+                await self._credit_tokens_for_derived_address(signature, sol_amount, receiving_address)
                     
         except Exception as e:
             logging.error(f"Error processing transaction {signature}: {e}")
@@ -743,7 +818,8 @@ class PaymentMonitor:
             result = await dbq.increment_user_tokens_by_telegram_id(telegram_id, tokens_to_credit)
 
             if result:
-                logging.info(f"✅ Credited {tokens_to_credit} tokens to user {user['first_name']} for {sol_amount} SOL (€{sol_amount * sol_eur_price:.2f})")
+                audit_log.info("✅ Credited %s tokens to user %s for %s SOL (€%.2f)",
+                               tokens_to_credit, user['first_name'], sol_amount, sol_amount * sol_eur_price)
                 
                 # Send notification to user
                 if user.get('telegram_id'):
@@ -793,14 +869,26 @@ payment_monitor = PaymentMonitor()
 user_to_socket: Dict[str, str] = {}  # user_id -> sid
 socket_to_user: Dict[str, str] = {}  # sid -> user_id
 
+# Hot-path socket handlers log lazily (%-style) through their own subsystem logger
+socket_log = logging.getLogger("casino.socket")
+# Token movements: never sampled, kept at INFO (see log_pipeline)
+audit_log = logging.getLogger(log_pipeline.AUDIT_LOGGER)
+
+# Scrape-time gauges for /api/metrics
+metrics.gauge("socketio_connections", "Connected Socket.IO clients",
+              function=lambda: len(sio.manager.rooms.get('/', {}).get(None, ())))
+metrics.gauge("socketio_registered_users", "Sockets bound to a user", function=lambda: len(user_to_socket))
+metrics.gauge("game_active_rooms", "Rooms held in memory", function=lambda: len(active_rooms))
+metrics.gauge("game_players_in_rooms", "Players seated across all rooms",
+              function=lambda: sum(len(r.players) for r in active_rooms.values()))
+metrics.gauge("response_cache_hit_ratio", "GET micro-cache hit ratio",
+              function=lambda: response_cache.get_stats()["hit_rate"])
+metrics.gauge("user_cache_hit_ratio", "User row cache hit ratio",
+              function=lambda: dbq.get_user_cache_stats()["hit_rate"])
+
 # Socket.IO events
 @sio.event
 async def connect(sid, environ):
-    logging.info(f"🔌🔌🔌 NEW CLIENT CONNECTED 🔌🔌🔌")
-    logging.info(f"Socket ID: {sid}")
-    logging.info(f"Remote Address: {environ.get('REMOTE_ADDR', 'unknown')}")
-    logging.info(f"User Agent: {environ.get('HTTP_USER_AGENT', 'unknown')}")
-    
     # Detect platform
     user_agent = environ.get('HTTP_USER_AGENT', '').lower()
     if 'telegram' in user_agent:
@@ -810,19 +898,19 @@ async def connect(sid, environ):
     else:
         platform = 'Desktop Browser'
     
-    logging.info(f"Platform: {platform}")
-    logging.info(f"Total active connections: {len(user_to_socket) + 1}")
+    socket_log.info("🔌 Client connected %s (%s)", sid[:8], platform,
+                    extra={"sid": sid, "platform": platform, "remote_addr": environ.get('REMOTE_ADDR')})
+    socket_log.debug("User agent for %s: %s", sid[:8], environ.get('HTTP_USER_AGENT'))
     
     await sio.emit('connected', {
         'status': 'Connected to casino!',
         'socket_id': sid,
         'platform': platform
     }, room=sid)
-    logging.info(f"✅ Sent 'connected' confirmation to {sid} ({platform})")
 
 @sio.event
 async def disconnect(sid):
-    logging.info(f"🔌 Client {sid} disconnected")
+    socket_log.info("🔌 Client %s disconnected", sid[:8])
     
     # Get user_id before cleanup
     user_id = socket_to_user.get(sid)
@@ -832,6 +920,7 @@ async def disconnect(sid):
     
     # Clean up socket from rooms ONLY
     socket_rooms.cleanup_socket(sid)
+    forget_sender(sid)
     
     # DON'T immediately clean up user mapping or remove from game room
     # Give user 30 seconds to reconnect (Telegram browser often disconnects temporarily)
@@ -845,24 +934,30 @@ async def disconnect(sid):
 async def register_user(sid, data):
     """Register user_id to socket_id mapping for room-specific events"""
     try:
-        logging.info(f"📥📥📥 REGISTER_USER EVENT RECEIVED 📥📥📥")
-        logging.info(f"Socket ID: {sid}")
-        logging.info(f"Data: {data}")
-        
+        socket_log.debug("register_user from %s: %s", sid[:8], data)
+
         user_id = data.get('user_id')
         platform = data.get('platform', 'unknown')
+
+        # A session token, when sent, is the identity — verified in memory, no DB read
+        token = data.get('token')
+        if token:
+            try:
+                user_id = session_tokens.verify(token).user_id
+            except SessionError as e:
+                await sio.emit('session_invalid', {'reason': str(e)}, room=sid)
+                return
         
         if not user_id:
-            logging.error(f"❌ No user_id provided in register_user event")
+            socket_log.warning("❌ No user_id provided in register_user event")
             return
         
         # Update mappings
         user_to_socket[user_id] = sid
         socket_to_user[sid] = user_id
         
-        logging.info(f"✅ Registered user {user_id} to socket {sid[:8]}")
-        logging.info(f"📱 Platform: {platform}")
-        logging.info(f"📊 Total user mappings: {len(user_to_socket)}")
+        socket_log.info("✅ Registered user %s to socket %s (%s)", user_id, sid[:8], platform,
+                        extra={"user_id": user_id, "sid": sid, "platform": platform})
         
         # Send confirmation
         await sio.emit('user_registered', {
@@ -872,27 +967,20 @@ async def register_user(sid, data):
         }, room=sid)
         
     except Exception as e:
-        logging.error(f"❌ Error in register_user: {e}")
+        socket_log.error("❌ Error in register_user: %s", e)
 
 @sio.event
 async def join_game_room(sid, data):
     """Join a game room via Socket.IO (called after successful REST API join)"""
     try:
-        logging.info(f"📥📥📥 JOIN_GAME_ROOM EVENT RECEIVED 📥📥📥")
-        logging.info(f"Socket ID: {sid}")
-        logging.info(f"Data: {data}")
-        
         room_id = data.get('room_id')
         user_id = data.get('user_id')
         platform = data.get('platform', 'unknown')
         
         if not room_id or not user_id:
-            logging.error(f"❌ Missing room_id or user_id in join_game_room event")
-            logging.error(f"Received data: {data}")
+            socket_log.warning("❌ Missing room_id or user_id in join_game_room event: %s", data)
             return
         
-        logging.info(f"📥 join_game_room: user={user_id}, room={room_id}, socket={sid[:8]}, platform={platform}")
-        
         # Join the Socket.IO room
         await socket_rooms.join_socket_room(sio, sid, room_id)
         
@@ -904,9 +992,11 @@ async def join_game_room(sid, data):
         socket_count = socket_rooms.get_room_socket_count(room_id)
         sockets_in_room = socket_rooms.room_to_sockets.get(room_id, set())
         
-        logging.info(f"✅ User {user_id} ({platform}) joined room {room_id} via socket {sid[:8]}")
-        logging.info(f"📊 Room {room_id} now has {socket_count} socket(s) connected")
-        logging.info(f"📋 Socket IDs in room: {[s[:8] for s in sockets_in_room]}")
+        socket_log.info("✅ User %s (%s) joined room %s via socket %s — %d socket(s) in room",
+                        user_id, platform, room_id, sid[:8], socket_count,
+                        extra={"user_id": user_id, "room_id": room_id, "sid": sid})
+        if socket_log.isEnabledFor(logging.DEBUG):
+            socket_log.debug("Socket IDs in room %s: %s", room_id, [s[:8] for s in sockets_in_room])
         
         # Send confirmation with full room info
         await sio.emit('room_joined_confirmed', {
@@ -915,12 +1005,9 @@ async def join_game_room(sid, data):
             'socket_id': sid,
             'platform': platform
         }, room=sid)
-        logging.info(f"✅ Sent room_joined_confirmed to {sid[:8]} ({platform})")
         
     except Exception as e:
-        logging.error(f"❌ Error in join_game_room: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        socket_log.error("❌ Error in join_game_room: %s", e, exc_info=True)
 
 # Game logic functions
 def calculate_win_probability(player_bet: int, total_pool: int) -> float:
@@ -932,7 +1019,7 @@ def calculate_win_probability(player_bet: int, total_pool: int) -> float:
     bet_bonus = (player_bet / total_pool) * 0.9  # Up to 90% based on bet ratio
     return min(base_prob + bet_bonus, 0.95)  # Cap at 95%
 
-def select_winner(players: List[RoomPlayer]) -> RoomPlayer:
+def select_winner(players: List[LivePlayer]) -> LivePlayer:
     """Select winner using weighted random selection - bigger bets have better odds"""
     if not players:
         raise ValueError("No players to select from")
@@ -940,6 +1027,10 @@ def select_winner(players: List[RoomPlayer]) -> RoomPlayer:
     # Create weighted selection based on bet amounts
     # Each player's chance = their bet amount / total pool
     total_pool = sum(p.bet_amount for p in players)
+    if total_pool <= 0:
+        # Free / freeroll rooms: nobody bet, every seat has the same chance
+        # (uniform(0, 0) would otherwise always hand the win to the first joiner)
+        return random.choice(players)
     
     # Generate a random number between 0 and total_pool
     random_point = random.uniform(0, total_pool)
@@ -956,25 +1047,26 @@ def select_winner(players: List[RoomPlayer]) -> RoomPlayer:
 
 @sio.event
 async def send_reaction(sid, data):
-    """Broadcast an emoji reaction to all players in a room"""
+    """Queue an emoji reaction; the room gets one aggregated frame per interval"""
     room_id = data.get('room_id')
-    emoji = data.get('emoji', '🔥')
-    name = data.get('name', 'Player')
-    user_id = data.get('user_id', '')
+    emoji = str(data.get('emoji', '🔥'))[:8]
+    name = str(data.get('name', 'Player'))[:40]
     if not room_id:
         return
-    # Broadcast globally — client filters by room_id (same pattern as game events)
-    await sio.emit('reaction_received', {
-        'emoji': emoji,
-        'name': name,
-        'user_id': user_id,
-        'room_id': room_id,
-    })
-    logging.info(f"💬 Reaction {emoji} from {name} in room {room_id[:8]}")
+    throttle_stats.incr("reaction", "received")
+    if not reaction_limiter.allow(sid):
+        throttle_stats.incr("reaction", "dropped")
+        return
+    reaction_batcher.add(room_id, emoji, name)
+
 
+# In-memory chat history per room (ring buffer of the last 50 messages),
+# dropped as soon as a room is closed or left empty
+active_rooms.add_vacate_listener(room_chat.clear)
+active_rooms.add_change_listener(lambda: response_cache.bump("rooms"))
 
-# In-memory chat history per room (last 50 messages)
-room_chat: dict = {}
+# Every token_balance write in db_queries feeds the in-memory top-N
+dbq.add_balance_listener(leaderboard_cache.observe_balance)
 
 @sio.event
 async def lobby_message(sid, data):
@@ -983,6 +1075,7 @@ async def lobby_message(sid, data):
     user_id = data.get('user_id', '')
     name = data.get('name', 'Player')
     text = (data.get('text') or '').strip()[:200]
+    client_id = str(data.get('client_id') or '')[:64]
     is_anonymous = data.get('is_anonymous', False)
 
     if not room_id or not text:
@@ -990,16 +1083,25 @@ async def lobby_message(sid, data):
     if is_anonymous:
         return  # Anonymous players cannot chat
 
+    throttle_stats.incr("chat", "received")
+    # Clients send each message over the socket and the REST fallback — keep one
+    dedupe_key = chat_dedupe_key(room_id, user_id, client_id, text)
+    if chat_duplicates.lookup(dedupe_key):
+        throttle_stats.incr("chat", "merged")
+        return
+    if not chat_limiter.allow(sid):
+        throttle_stats.incr("chat", "dropped")
+        return
+
     msg = {
         'user_id': user_id,
         'name': name,
         'text': text,
         'ts': datetime.now(timezone.utc).isoformat(),
     }
-    room_chat.setdefault(room_id, [])
-    room_chat[room_id].append(msg)
-    if len(room_chat[room_id]) > 50:
-        room_chat[room_id] = room_chat[room_id][-50:]
+    msg = room_chat.append(room_id, msg)
+    chat_duplicates.remember(dedupe_key, msg)
+    throttle_stats.incr("chat", "emitted")
 
     payload = {'room_id': room_id, **msg}
     await sio.emit('lobby_message', payload)
@@ -1024,12 +1126,11 @@ async def reveal_identity(sid, data):
             player.photo_url = data.get('photo_url', player.photo_url)
             player.username = data.get('username', player.username)
             break
-    serialized_players = []
-    for p in room.players:
-        pd = p.dict()
-        if 'joined_at' in pd and isinstance(pd['joined_at'], datetime):
-            pd['joined_at'] = pd['joined_at'].isoformat()
-        serialized_players.append(pd)
+    else:
+        return
+    # Player docs changed in place — /room/{id} and /room-participants must not serve the anonymous one
+    response_cache.bump("rooms")
+    serialized_players = [p.to_dict() for p in room.players]
     await socket_rooms.broadcast_to_room(sio, room_id, 'players_updated', {
         'room_id': room_id,
         'players': serialized_players,
@@ -1040,67 +1141,62 @@ async def reveal_identity(sid, data):
 @sio.event
 async def catch_all(event, sid, data):
     """Catch all events for debugging"""
-    logging.info(f"🎯 CATCH-ALL: Event '{event}' from {sid[:8]} with data: {data}")
+    socket_log.debug("🎯 CATCH-ALL: Event '%s' from %s with data: %s", event, sid[:8], data)
+
+def room_summary(room: LiveRoom) -> dict:
+    """Lobby view of a room (shared by GET /rooms and lobby deltas)"""
+    return {
+        'id': room.id,
+        'room_type': room.room_type,
+        'players_count': len(room.players),
+        'max_players': room.max_players,
+        'status': room.status,
+        'prize_pool': room.prize_pool,
+        'round_number': room.round_number,
+        'is_locked': (room.room_type in locked_rooms) or (room.room_type == RoomType.FREEROLL and freeroll_config.get('is_locked', False))
+    }
+
+def lobby_snapshot():
+    return {room.id: room_summary(room) for room in active_rooms.values()}, {'maintenance_mode': maintenance_mode}
+
+lobby_broadcaster.configure(sio.emit, lobby_snapshot)
+reaction_batcher.configure(sio.emit)
 
 async def broadcast_room_updates():
-    """Broadcast current room states to all connected clients"""
-    try:
-        room_data = []
-        for room in active_rooms.values():
-            # Serialize player data with datetime conversion
-            serialized_players = []
-            for p in room.players:
-                player_dict = p.dict()
-                # Convert datetime fields to ISO format
-                if 'joined_at' in player_dict and isinstance(player_dict['joined_at'], datetime):
-                    player_dict['joined_at'] = player_dict['joined_at'].isoformat()
-                serialized_players.append(player_dict)
-            
-            room_info = {
-                'id': room.id,
-                'room_type': room.room_type,
-                'players': serialized_players,
-                'status': room.status,
-                'prize_pool': room.prize_pool,
-                'round_number': room.round_number,
-                'players_count': len(room.players),
-                'max_players': room.max_players
-            }
-            room_data.append(room_info)
-        
-        await sio.emit('rooms_updated', {
-            'rooms': room_data,
-            'maintenance_mode': maintenance_mode,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
-        
-    except Exception as e:
-        logging.error(f"Error broadcasting room updates: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+    """Queue a lobby update — coalesced into one rooms_delta emit per tick"""
+    response_cache.bump("rooms")
+    lobby_broadcaster.mark_dirty()
 
-async def start_game_round(room: GameRoom):
-    """Start a game round when room is full - with strict event sequence"""
-    if len(room.players) < room.max_players:
+@sio.event
+async def lobby_resync(sid, data=None):
+    """Client missed a rooms_delta (sequence gap) or just connected — send full state"""
+    await sio.emit('rooms_snapshot', lobby_broadcaster.snapshot_payload(), room=sid)
+
+@tracer.traced("round.start", trace_id=lambda room: room.id)
+async def start_game_round(room: LiveRoom):
+    """
+    Round phase 1: room is full — announce room_ready and open its successor
+
+    The remaining phases (resolve → redirect → close) are timed transitions
+    on round_scheduler, so a round never holds a sleeping task.
+    """
+    if len(room.players) < room.max_players or room.status != "waiting":
         return
     
     # Generate unique match ID for this game
     match_id = str(uuid.uuid4())[:12]  # Short unique ID
     room.match_id = match_id  # Store on room for polling clients
+    tracer.annotate(room_id=room.id, room_type=room.room_type.value, players=len(room.players), match_id=match_id)
     logging.info(f"🎮 Starting game round for room {room.id}, match_id: {match_id}")
     logging.info(f"👥 Players in room: {[p.username for p in room.players]}")
 
     # Set status IMMEDIATELY — polling clients detect this within 500ms
-    room.status = "ready"
+    active_rooms.set_status(room, "ready")
     room.prize_pool = sum(p.bet_amount for p in room.players)
 
     # Serialize player data
-    serialized_players = []
-    for p in room.players:
-        player_dict = p.dict()
-        if 'joined_at' in player_dict and isinstance(player_dict['joined_at'], datetime):
-            player_dict['joined_at'] = player_dict['joined_at'].isoformat()
-        serialized_players.append(player_dict)
+    with tracer.child("serialize_players"):
+        serialized_players = [p.to_dict() for p in room.players]
 
     # Broadcast room_ready globally (socket fallback — polling is the primary mechanism)
     room_ready_data = {
@@ -1114,22 +1210,42 @@ async def start_game_round(room: GameRoom):
     await sio.emit('room_ready', room_ready_data)
     logging.info(f"✅ room_ready emitted globally, match {match_id}")
 
-    # Wait for roulette wheel animation (8 seconds to spin + show result)
-    await asyncio.sleep(8)
-    
+    # Pipeline: open the next waiting room of this type right away so joins
+    # keep flowing while this round plays out
+    with tracer.child("spawn_next_room"):
+        new_room = spawn_waiting_room(room.room_type, room.round_number + 1)
+    logging.info(f"🆕 Created new {room.room_type} room {new_room.id}, round #{new_room.round_number}")
+    await sio.emit('new_room_available', {
+        'room_id': new_room.id,
+        'room_type': new_room.room_type,
+        'round_number': new_room.round_number
+    })
+    await broadcast_room_updates()
+
+    # Resolve after the roulette wheel animation (spin + show result)
+    phases = get_phase_durations(room.room_type)
+    round_scheduler.schedule(room.id, "resolve", phases['spin'], resolve_game_round, room)
+
+
+@tracer.traced("round.resolve", trace_id=lambda room: room.id)
+async def resolve_game_round(room: LiveRoom):
+    """Round phase 2: pick and credit the winner, announce game_finished"""
+    match_id = room.match_id
+    tracer.annotate(room_id=room.id, room_type=room.room_type.value, players=len(room.players), match_id=match_id)
+
     # Select winner immediately after GET READY (no game_starting event needed)
-    room.status = "playing"
-    room.started_at = datetime.now(timezone.utc)
+    active_rooms.set_status(room, "playing")
+    room.started_at = clock.now()
     
     # Select winner using weighted random selection
-    winner = select_winner(room.players)
+    with tracer.child("select_winner"):
+        winner = select_winner(room.players)
     room.winner = winner
-    room.status = "finished"
-    room.finished_at = datetime.now(timezone.utc)
+    active_rooms.set_status(room, "finished")
+    room.finished_at = clock.now()
     
     # Credit winner with the full prize pool (losers already had bets deducted on join)
     # For freeroll rooms, credit the fixed house prize instead of prize_pool
-    FREE_ROOM_PRIZE = 100  # tokens winner gets in the free room
     if room.room_type == RoomType.FREE:
         credit_amount = FREE_ROOM_PRIZE
     elif room.room_type == RoomType.FREEROLL:
@@ -1138,18 +1254,37 @@ async def start_game_round(room: GameRoom):
         credit_amount = room.prize_pool
     room.prize_pool = credit_amount  # ensure prize_pool reflects actual credit for DB storage
 
+    # Durable intent first: a crash after the balance update but before the
+    # credit record must not make restore refund a round that was already paid
+    new_balance = None
+    settled = True
     if not winner.user_id.startswith('bot_'):
+        room_journal.credit_pending(room.id, winner.user_id, credit_amount)
+        with tracer.child("journal_flush"):
+            await room_journal.flush()
+        settled = False
         try:
             result = await dbq.increment_user_tokens(winner.user_id, credit_amount)
             if result:
-                logging.info(f"💰 Credited {credit_amount} tokens to winner {winner.username} (new balance: {result.get('token_balance', 0)})")
-                winner_sid = user_to_socket.get(winner.user_id)
-                if winner_sid:
-                    await sio.emit('balance_updated', {'user_id': winner.user_id, 'new_balance': result.get('token_balance', 0)}, room=winner_sid)
+                settled = True
+                new_balance = result.get('token_balance', 0)
+                audit_log.info("💰 Credited %s tokens to winner %s (%s) for room %s (new balance: %s)",
+                               credit_amount, winner.username, winner.user_id, room.id, new_balance)
             else:
                 logging.error(f"❌ Winner user {winner.user_id} not found in DB — balance NOT credited")
         except Exception as e:
             logging.error(f"❌ Failed to credit winner balance: {e}")
+    if settled:
+        # Round is settled — a restart must not refund it anymore
+        room_journal.prize_credited(room.id, winner.user_id, credit_amount)
+        with tracer.child("journal_flush"):
+            await room_journal.flush()
+    # Otherwise credit_pending stays open, so a restart flags the round for manual verification
+
+    if new_balance is not None:
+        winner_sid = user_to_socket.get(winner.user_id)
+        if winner_sid:
+            await sio.emit('balance_updated', {'user_id': winner.user_id, 'new_balance': new_balance}, room=winner_sid)
 
     # Get the prize link for this room type
     prize_link = PRIZE_LINKS[room.room_type]
@@ -1175,9 +1310,7 @@ async def start_game_round(room: GameRoom):
     logging.info(f"📤 Broadcasting game_finished to room {room.id}")
     
     # Serialize winner data
-    winner_dict = winner.dict()
-    if 'joined_at' in winner_dict and isinstance(winner_dict['joined_at'], datetime):
-        winner_dict['joined_at'] = winner_dict['joined_at'].isoformat()
+    winner_dict = winner.to_dict()
     
     game_finished_data = {
         'room_id': room.id,
@@ -1190,15 +1323,25 @@ async def start_game_round(room: GameRoom):
         'prize_link': prize_link,  # Include for winner screen
         'round_number': room.round_number,
         'has_prize': True,
-        'finished_at': room.finished_at.isoformat()
+        'finished_at': room.finished_at
     }
     # Broadcast game_finished to ALL clients - client filters by player list
     await sio.emit('game_finished', game_finished_data)
     logging.info(f"✅ Emitted game_finished globally, winner: {winner.username}, match_id: {match_id}")
 
-    # Wait for winner announcement screen (8 seconds so players can see it)
-    logging.info(f"⏱️ Waiting 8 seconds for winner announcement...")
-    await asyncio.sleep(8)
+    # Keep the winner announcement screen up so players can see it
+    phases = get_phase_durations(room.room_type)
+    logging.info(f"⏱️ Waiting {phases['announce']} seconds for winner announcement...")
+    round_scheduler.schedule(room.id, "redirect", phases['announce'], finish_game_round, room)
+
+
+@tracer.traced("round.finish", trace_id=lambda room: room.id)
+async def finish_game_round(room: LiveRoom):
+    """Round phase 3: send players home, deliver the prize, persist the game"""
+    match_id = room.match_id
+    tracer.annotate(room_id=room.id, room_type=room.room_type.value, players=len(room.players), match_id=match_id)
+    winner = room.winner
+    prize_link = room.prize_link
 
     # EVENT 4: redirect_home - Redirect all players back to home screen
     final_sockets = socket_rooms.room_to_sockets.get(room.id, set())
@@ -1233,29 +1376,31 @@ async def start_game_round(room: GameRoom):
     
     # Save completed game to database
     try:
-        game_doc = room.dict()
-        # Normalize enum to plain string value
-        rt = game_doc.get('room_type')
-        game_doc['room_type'] = rt.value if hasattr(rt, 'value') else str(rt).split('.')[-1].lower()
-        # Keep datetimes as objects — insert_completed_game uses _to_dt() helper
-        # (no need to call .isoformat() here; that caused the previous asyncpg bug)
-        
-        await dbq.insert_completed_game(game_doc)
+        # ISO datetimes are parsed back by insert_completed_game's _to_dt() helper
+        game_doc = room.to_dict()
+
+        # Only a game that reached the DB may enter the in-memory top-N / recent ring
+        if await dbq.insert_completed_game(game_doc):
+            leaderboard_cache.record_game(game_doc)
+            response_cache.bump("history", "leaderboard")
+        else:
+            logging.warning(f"⚠️ Completed game {room.id} not persisted (duplicate or DB error) — leaderboard cache unchanged")
 
         # Save pending result for all participants — cleared client-side on redirect_home if they were online
-        for participant in room.players:
-            if not participant.user_id.startswith('bot_'):
-                pending_doc = {
-                    'user_id': participant.user_id,
-                    'match_id': match_id,
-                    'winner': game_doc['winner'],
-                    'all_players': game_doc['players'],
-                    'room_type': game_doc['room_type'],
-                    'prize_pool': room.prize_pool,
-                    'prize_link': prize_link,
-                    'finished_at': game_doc['finished_at'],
-                }
-                await dbq.upsert_pending_result(participant.user_id, pending_doc)
+        with tracer.child("pending_results", players=len(room.players)):
+            for participant in room.players:
+                if not participant.user_id.startswith('bot_'):
+                    pending_doc = {
+                        'user_id': participant.user_id,
+                        'match_id': match_id,
+                        'winner': game_doc['winner'],
+                        'all_players': game_doc['players'],
+                        'room_type': game_doc['room_type'],
+                        'prize_pool': room.prize_pool,
+                        'prize_link': prize_link,
+                        'finished_at': game_doc['finished_at'],
+                    }
+                    await dbq.upsert_pending_result(participant.user_id, pending_doc)
 
         # Cleanup old game history (keep only 5 most recent)
         await cleanup_old_game_history()
@@ -1263,46 +1408,94 @@ async def start_game_round(room: GameRoom):
         logging.error(f"Failed to save completed game: {e}")
     
     # Wait a moment before cleaning up room to ensure redirect_home is processed
-    await asyncio.sleep(0.5)
-    
-    # Remove room from active rooms
-    if room.id in active_rooms:
-        del active_rooms[room.id]
-    
-    # Create new room for next round
-    new_room = GameRoom(
-        room_type=room.room_type,
-        round_number=room.round_number + 1
-    )
-    active_rooms[new_room.id] = new_room
+    phases = get_phase_durations(room.room_type)
+    round_scheduler.schedule(room.id, "close", phases['cleanup'], close_game_round, room)
 
-    logging.info(f"🆕 Created new {room.room_type} room {new_room.id}, round #{new_room.round_number}")
 
-    # Notify clients about new room (global broadcast)
-    await sio.emit('new_room_available', {
-        'room_id': new_room.id,
-        'room_type': new_room.room_type,
-        'round_number': new_room.round_number
-    })
-    
+@tracer.traced("round.close", trace_id=lambda room: room.id)
+async def close_game_round(room: LiveRoom):
+    """Round phase 4: drop the finished room and its chat"""
+    tracer.annotate(room_id=room.id, room_type=room.room_type.value, match_id=room.match_id)
+    # Remove room from active rooms (its successor was opened at room_ready)
+    active_rooms.remove(room.id)
     
     # Broadcast updated room states (global broadcast)
     await broadcast_room_updates()
-    
-    # Clear chat history for finished room
-    room_chat.pop(room.id, None)
 
     logging.info(f"✅ Game cycle complete for {room.room_type} room")
 
+async def restore_rooms_from_journal():
+    """
+    Replay the room journal after a restart
+
+    Waiting rooms come back with their players (bets were already debited).
+    Rounds that had started but were never settled are refunded — clients
+    lost their spin when the process went down, so resuming is not useful.
+    """
+    snapshots = room_journal.replay()
+    restored, refunded = 0, 0
+    for snap in snapshots:
+        if snap['status'] == 'waiting':
+            room = LiveRoom(
+                id=snap['id'],
+                room_type=RoomType(snap['room_type']),
+                round_number=snap['round_number'],
+                max_players=snap['max_players'],
+                players=[LivePlayer.from_dict(p) for p in snap['players']],
+                created_at=datetime.fromisoformat(snap['created_at']) if snap.get('created_at') else None
+            )
+            room.prize_pool = sum(p.bet_amount for p in room.players)
+            active_rooms.add(room)
+            restored += 1
+            logging.info(f"♻️ Restored waiting {snap['room_type']} room {room.id} with {len(room.players)} players")
+            if len(room.players) >= room.max_players:
+                round_scheduler.schedule(room.id, "start", 0, start_game_round, room)
+            continue
+
+        if snap['credited']:
+            continue
+        if snap['credit_pending']:
+            # The process died between journaling the credit and confirming it; the
+            # winner may already hold the pool, so refunding would pay the round twice
+            pending = snap['credit_pending']
+            logging.error(f"❌ Round {snap['id']} ({snap['room_type']}) stopped mid-credit: {pending['amount']} tokens "
+                          f"to {pending['user_id']} may not have been applied — not refunding, verify the winner's balance")
+            continue
+
+        # Interrupted round — give every real player their bet back
+        for p in snap['players']:
+            user_id = p['user_id']
+            bet = p.get('bet_amount', 0)
+            if user_id.startswith('bot_') or bet <= 0 or user_id in snap['refunded']:
+                continue
+            if user_id in snap['refund_pending']:
+                # A previous start died between journaling this refund and confirming it
+                logging.error(f"❌ Refund of {bet} tokens to {user_id} for round {snap['id']} may already have been "
+                              f"applied — not refunding again, verify the player's balance")
+                continue
+            try:
+                room_journal.refund_pending(snap['id'], user_id, bet)
+                await room_journal.flush()
+                await dbq.increment_user_tokens(user_id, bet)
+                room_journal.player_refunded(snap['id'], user_id, bet)
+                await room_journal.flush()
+                refunded += 1
+                logging.warning(f"💸 Refunded {bet} tokens to {user_id} from interrupted {snap['room_type']} round {snap['id']}")
+            except Exception as e:
+                logging.error(f"❌ Failed to refund {user_id} for interrupted round {snap['id']}: {e}")
+
+    # Start the next session from a journal that only describes live rooms
+    await room_journal.compact(active_rooms.values())
+    if snapshots:
+        logging.info(f"📓 Room journal replay: {restored} rooms restored, {refunded} bets refunded")
+
+
 # Initialize rooms
 async def initialize_rooms():
     """Create initial rooms for all room types"""
     room_types = ['free', 'bronze', 'silver', 'gold', 'freeroll']
     for room_type in room_types:
-        room = GameRoom(room_type=room_type)
-        if room_type == 'freeroll':
-            room.max_players = freeroll_config['max_players']
-        active_rooms[room.id] = room
+        room = spawn_waiting_room(room_type)
         logging.info(f"✅ Created {room_type} room {room.id}")
 
 # API Routes
@@ -1499,6 +1692,7 @@ async def cleanup_database_for_production(admin_key: str):
         
         # Clear ALL tables completely
         delete_result = await dbq.delete_all_data()
+        await leaderboard_cache.load()
 
         logging.info("🧹 COMPLETE DATABASE WIPE FINISHED")
         logging.info(f"Deleted: {delete_result.get('users', 0)} users")
@@ -1535,6 +1729,7 @@ async def lock_room(room_type: str, locked: bool, admin_key: str):
         if room_type == "freeroll":
             freeroll_config['is_locked'] = False
     logging.info(f"🔒 Room '{room_type}' {'LOCKED' if locked else 'UNLOCKED'} by admin")
+    await broadcast_room_updates()
     return {"room_type": room_type, "locked": locked, "all_locked": list(locked_rooms)}
 
 @api_router.get("/admin/reset-game-history")
@@ -1547,6 +1742,8 @@ async def reset_game_history(admin_key: str):
             r_games   = await conn.execute("DELETE FROM completed_games")
             r_prizes  = await conn.execute("DELETE FROM winner_prizes")
             r_pending = await conn.execute("DELETE FROM pending_results")
+        leaderboard_cache.games.clear()
+        response_cache.bump("history", "leaderboard")
         return {
             "status": "success",
             "deleted": {
@@ -1559,7 +1756,23 @@ async def reset_game_history(admin_key: str):
         logging.error(f"Error resetting game history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/auth/telegram", response_model=User)
+def session_from_request(request: Request) -> Optional[SessionClaims]:
+    """Claims of the Bearer session token, if the client sent one (legacy clients don't)"""
+    header = request.headers.get("authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    try:
+        return session_tokens.verify(header[7:])
+    except SessionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+
+def with_session_token(user: Dict) -> Dict:
+    token, expires_at = session_tokens.issue(user)
+    return {**user, "session_token": token, "session_expires_at": expires_at}
+
+
+@api_router.post("/auth/telegram", response_model=AuthenticatedUser)
 async def telegram_auth(user_data: UserCreate):
     """Authenticate user with Telegram data"""
     telegram_data = user_data.telegram_auth_data
@@ -1577,105 +1790,51 @@ async def telegram_auth(user_data: UserCreate):
     # In production, you'd want proper hash verification
     logging.info(f"🔍 Authenticating Telegram user: {telegram_data.first_name} (ID: {telegram_data.id})")
     
-    # Check if user already exists
-    logging.info(f"🔎 Searching for existing user with telegram_id={telegram_data.id} in database")
-    existing_user = await dbq.get_user_by_telegram_id(telegram_data.id)
-    logging.info(f"🔎 Search result: {'FOUND' if existing_user else 'NOT FOUND'}")
-
-    if existing_user:
-        # Special handling for admin @cia_nera - ensure unlimited tokens
-        if telegram_data.id == 7983427898:
-            logging.info(f"👑 Admin @cia_nera detected - ensuring unlimited tokens")
-            await dbq.update_user_fields_by_telegram_id(
-                telegram_data.id,
-                {
-                    "last_login": datetime.now(timezone.utc).isoformat(),
-                    "token_balance": 1000000000
-                }
-            )
-            existing_user['token_balance'] = 1000000000
-        else:
-            # Update last login time for regular users
-            await dbq.update_user_fields_by_telegram_id(
-                telegram_data.id,
-                {"last_login": datetime.now(timezone.utc).isoformat()}
-            )
-        
-        # Convert back from stored format
-        if isinstance(existing_user['created_at'], str):
-            existing_user['created_at'] = datetime.fromisoformat(existing_user['created_at'])
-        if isinstance(existing_user['last_login'], str):
-            existing_user['last_login'] = datetime.fromisoformat(existing_user['last_login'])
-        
-        logging.info(f"✅ Returning existing user: {existing_user['first_name']} with balance: {existing_user.get('token_balance', 0)}")
-        return User(**existing_user)
-    
-    # Create new user
-    user = User(
-        telegram_id=telegram_data.id,
-        first_name=telegram_data.first_name,
-        last_name=telegram_data.last_name,
-        telegram_username=telegram_data.username,
-        photo_url=telegram_data.photo_url,
-        is_verified=True
-    )
-    
-    user_dict = user.dict()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
-    user_dict['last_login'] = user_dict['last_login'].isoformat()
-    
-    # Special handling for admin @cia_nera - unlimited tokens
-    if telegram_data.id == 7983427898:
-        user_dict['token_balance'] = 1000000000  # 1 billion tokens for admin
-        logging.info(f"👑 Creating admin @cia_nera with unlimited tokens!")
-    else:
-        pass
-
-    try:
-        await dbq.insert_user(user_dict)
-    except Exception as insert_err:
-        logging.warning(
-            "User with telegram_id %s may have been created concurrently (error: %s). Refreshing existing record.",
-            telegram_data.id, insert_err
-        )
-
-        # Fetch the document that now exists and update the login timestamp (and admin tokens if applicable)
-        existing_user = await dbq.get_user_by_telegram_id(telegram_data.id)
-        if not existing_user:
-            logging.error(
-                "Duplicate user detected for telegram_id %s but document could not be reloaded.",
-                telegram_data.id
-            )
-            raise HTTPException(status_code=500, detail="Failed to finalize Telegram authentication")
-
-        update_fields = {"last_login": datetime.now(timezone.utc).isoformat()}
-        if telegram_data.id == 7983427898:
-            update_fields["token_balance"] = 1000000000
-
-        await dbq.update_user_fields_by_telegram_id(telegram_data.id, update_fields)
-        existing_user = await dbq.get_user_by_telegram_id(telegram_data.id)
-
-        if isinstance(existing_user.get('created_at'), str):
-            existing_user['created_at'] = datetime.fromisoformat(existing_user['created_at'])
-        if isinstance(existing_user.get('last_login'), str):
-            existing_user['last_login'] = datetime.fromisoformat(existing_user['last_login'])
+    # One round trip: INSERT ... ON CONFLICT (telegram_id) DO UPDATE SET last_login ... RETURNING *
+    # (a user already in the cache just gets last_login queued for the write-behind flusher)
+    user_dict = {
+        "id": str(uuid.uuid4()),
+        "telegram_id": telegram_data.id,
+        "first_name": telegram_data.first_name,
+        "last_name": telegram_data.last_name,
+        "telegram_username": telegram_data.username,
+        "photo_url": telegram_data.photo_url,
+        "is_verified": True,
+        "last_login": datetime.now(timezone.utc),
+    }
 
-        logging.info(
-            "✅ Returning concurrently created user %s (telegram_id: %s) with balance %s",
-            existing_user.get('first_name', ''),
-            telegram_data.id,
-            existing_user.get('token_balance', 0)
-        )
+    # Special handling for admin @cia_nera - ensure unlimited tokens
+    force_balance = 1000000000 if telegram_data.id == 7983427898 else None
+    if force_balance is not None:
+        logging.info(f"👑 Admin @cia_nera detected - ensuring unlimited tokens")
 
-        return User(**existing_user)
+    try:
+        user, created = await dbq.telegram_login(user_dict, force_balance=force_balance)
+    except Exception as e:
+        logging.error(f"Telegram auth upsert failed for telegram_id {telegram_data.id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to finalize Telegram authentication")
 
-    if telegram_data.id == 7983427898:
-        user.token_balance = user_dict['token_balance']
-        logging.info(f"👑 Admin @cia_nera created with {user.token_balance} tokens!")
+    if created:
+        logging.info(f"🆕 Created new user: {user['first_name']} (telegram_id: {user['telegram_id']})")
     else:
-        logging.info(f"🆕 Created new user: {user.first_name} (telegram_id: {user.telegram_id})")
+        logging.info(f"✅ Returning existing user: {user['first_name']} with balance: {user.get('token_balance', 0)}")
+    return with_session_token(user)
 
-    return user
+
+@api_router.post("/auth/refresh", response_model=AuthenticatedUser)
+async def refresh_session(request: Request):
+    """Exchange a (recently) expired session token for a fresh one — re-reads ban/role"""
+    header = request.headers.get("authorization", "")
+    if not header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="session_invalid")
+    try:
+        claims = session_tokens.verify(header[7:], allow_expired=True)
+    except SessionError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    user = await dbq.get_user_by_id(claims.user_id)
+    if not user:
+        raise HTTPException(status_code=401, detail="session_invalid")
+    return with_session_token(user)
 
 # Solana Token Purchase Endpoints
 class TokenPurchaseRequest(BaseModel):
@@ -1886,6 +2045,7 @@ async def get_recovery_status(admin_key: str = ""):
             }
             for c in recent_credits
         ],
+        "tx_delta_cache": tx_delta_extractor.get_stats(),
         "monitoring_active": True
     }
 
@@ -2044,20 +2204,12 @@ async def get_active_rooms():
     rooms_data = []
 
     for room in active_rooms.values():
-        room_data = {
-            "id": room.id,
-            "room_type": room.room_type,
-            "players_count": len(room.players),
-            "max_players": room.max_players,
-            "status": room.status,
-            "prize_pool": room.prize_pool,
-            "round_number": room.round_number,
-            "settings": ROOM_SETTINGS.get(room.room_type, ROOM_SETTINGS["bronze"]),
-            "is_locked": (room.room_type in locked_rooms) or (room.room_type == RoomType.FREEROLL and freeroll_config.get('is_locked', False))
-        }
+        room_data = room_summary(room)
+        room_data["settings"] = ROOM_SETTINGS.get(room.room_type, ROOM_SETTINGS["bronze"])
         rooms_data.append(room_data)
 
-    return {"rooms": rooms_data, "maintenance_mode": maintenance_mode}
+    # Returned as a Response so FastAPI skips its jsonable_encoder pass
+    return FastJSONResponse({"rooms": rooms_data, "maintenance_mode": maintenance_mode})
 
 @api_router.get("/user-room-status/{user_id}")
 async def get_user_room_status(user_id: str):
@@ -2066,28 +2218,19 @@ async def get_user_room_status(user_id: str):
         # Collect ALL rooms user is in
         user_rooms = []
 
-        # Check all active rooms for this user
-        for room in active_rooms.values():
-            for player in room.players:
-                if player.user_id == user_id:
-                    # User is in this room - add to list
-                    serialized_players = []
-                    for p in room.players:
-                        player_dict = p.dict()
-                        if 'joined_at' in player_dict and isinstance(player_dict['joined_at'], datetime):
-                            player_dict['joined_at'] = player_dict['joined_at'].isoformat()
-                        serialized_players.append(player_dict)
-
-                    user_rooms.append({
-                        "room_id": room.id,
-                        "room_type": room.room_type,
-                        "status": room.status,
-                        "players": serialized_players,
-                        "players_count": len(room.players),
-                        "prize_pool": room.prize_pool,
-                        "position": next((i+1 for i, p in enumerate(room.players) if p.user_id == user_id), 0)
-                    })
-                    break  # Found user in this room, move to next room
+        # Only the rooms this user is indexed in
+        for room in active_rooms.rooms_for_user(user_id):
+            serialized_players = [p.to_dict() for p in room.players]
+
+            user_rooms.append({
+                "room_id": room.id,
+                "room_type": room.room_type,
+                "status": room.status,
+                "players": serialized_players,
+                "players_count": len(room.players),
+                "prize_pool": room.prize_pool,
+                "position": next((i+1 for i, p in enumerate(room.players) if p.user_id == user_id), 0)
+            })
 
         # Return all rooms user is in
         if len(user_rooms) > 0:
@@ -2107,16 +2250,14 @@ async def get_user_room_status(user_id: str):
         raise HTTPException(status_code=500, detail="Failed to check room status")
 
 @api_router.post("/join-room")
-async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks):
+@tracer.traced("join_room")
+async def join_room(request: JoinRoomRequest, session: Optional[SessionClaims] = Depends(session_from_request)):
     """Join a room with a bet"""
     logging.info(f"Join room request: {request.dict()}")
     
     # Find room of the requested type
-    target_room = None
-    for room in active_rooms.values():
-        if room.room_type == request.room_type and room.status == "waiting":
-            target_room = room
-            break
+    target_room = active_rooms.find(request.room_type, "waiting")
+    tracer.annotate(room_type=request.room_type.value, bet_amount=request.bet_amount, has_session=session is not None)
     
     if not target_room:
         logging.error(f"No available room of type {request.room_type}")
@@ -2135,35 +2276,50 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
                 detail=f"Bet amount must be between {settings['min_bet']} and {settings['max_bet']} tokens"
             )
 
-    # Check if user exists and has enough tokens
-    user_doc = await dbq.get_user_by_id(request.user_id)
-    if not user_doc:
-        logging.error(f"User not found: {request.user_id}")
-        raise HTTPException(status_code=404, detail="User not found")
+    # Identity + ban: from the session token when present, else the user row (legacy clients)
+    user_doc = None
+    if session is not None:
+        if session.user_id != request.user_id:
+            raise HTTPException(status_code=403, detail="Session does not match user")
+        is_banned = session.is_banned
+    else:
+        user_doc = await dbq.get_user_by_id(request.user_id)
+        if not user_doc:
+            logging.error(f"User not found: {request.user_id}")
+            raise HTTPException(status_code=404, detail="User not found")
+        is_banned = user_doc.get("is_banned")
 
-    if user_doc.get("is_banned"):
+    if is_banned:
         raise HTTPException(status_code=403, detail="Your account has been banned.")
 
     if maintenance_mode:
         raise HTTPException(status_code=503, detail="🔧 Maintenance in progress. Please try again later.")
 
-    logging.info(f"User balance: {user_doc.get('token_balance', 0)}, Bet amount: {request.bet_amount}")
-
-    if request.bet_amount > 0 and user_doc.get('token_balance', 0) < request.bet_amount:
+    if user_doc is not None and request.bet_amount > 0 and user_doc.get('token_balance', 0) < request.bet_amount:
         raise HTTPException(status_code=400, detail="Insufficient token balance")
 
     # Check if user is already in the room
-    if any(p.user_id == request.user_id for p in target_room.players):
+    if active_rooms.has_player(target_room, request.user_id):
         raise HTTPException(status_code=400, detail="You are already in this room")
 
     # Check if room is full
     if len(target_room.players) >= target_room.max_players:
         raise HTTPException(status_code=400, detail="Room is full")
 
-    # Deduct tokens from user balance (skip for freeroll / 0-bet)
+    # Deduct tokens from user balance (skip for freeroll / 0-bet). The debit re-checks the
+    # balance in SQL and returns the user row, so it doubles as the profile lookup.
     if request.bet_amount > 0:
-        await dbq.increment_user_tokens(request.user_id, -request.bet_amount)
-    new_balance_after_join = user_doc.get('token_balance', 0) - request.bet_amount
+        user_doc = await dbq.debit_user_tokens(request.user_id, request.bet_amount)
+        if not user_doc:
+            raise HTTPException(status_code=400, detail="Insufficient token balance")
+        new_balance_after_join = user_doc.get('token_balance', 0)
+    else:
+        if user_doc is None:
+            user_doc = await dbq.get_user_by_id(request.user_id)
+            if not user_doc:
+                raise HTTPException(status_code=404, detail="User not found")
+        new_balance_after_join = user_doc.get('token_balance', 0)
+    logging.info(f"User balance after join: {new_balance_after_join}, Bet amount: {request.bet_amount}")
     joining_sid = user_to_socket.get(request.user_id)
     if joining_sid:
         await sio.emit('balance_updated', {'user_id': request.user_id, 'new_balance': new_balance_after_join}, room=joining_sid)
@@ -2172,7 +2328,7 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
     if request.is_anonymous:
         anon_count = sum(1 for p in target_room.players if p.is_anonymous)
         anon_name = "Anonymous" if anon_count == 0 else f"Anonymous-{anon_count + 1}"
-        player = RoomPlayer(
+        player = LivePlayer(
             user_id=request.user_id,
             username='',
             first_name=anon_name,
@@ -2182,7 +2338,7 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
             is_anonymous=True
         )
     else:
-        player = RoomPlayer(
+        player = LivePlayer(
             user_id=request.user_id,
             username=user_doc.get('telegram_username', ''),  # @username
             first_name=user_doc.get('first_name', 'Player'),
@@ -2191,22 +2347,19 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
             bet_amount=request.bet_amount,
             is_anonymous=False
         )
-    target_room.players.append(player)
+    active_rooms.add_player(target_room, player)
     target_room.prize_pool += request.bet_amount
+    tracer.annotate(room_id=target_room.id, players=len(target_room.players))
+    # The bet is already debited — make the seat durable before acknowledging
+    with tracer.child("journal_flush"):
+        await room_journal.flush()
     
     # Notify ROOM participants about new player - ALWAYS send FULL participant list
-    # Serialize player data with datetime conversion
-    serialized_players = []
-    for p in target_room.players:
-        player_dict = p.dict()
-        if 'joined_at' in player_dict and isinstance(player_dict['joined_at'], datetime):
-            player_dict['joined_at'] = player_dict['joined_at'].isoformat()
-        serialized_players.append(player_dict)
+    with tracer.child("serialize_players"):
+        serialized_players = [p.to_dict() for p in target_room.players]
     
     # Serialize single player data
-    player_dict = player.dict()
-    if 'joined_at' in player_dict and isinstance(player_dict['joined_at'], datetime):
-        player_dict['joined_at'] = player_dict['joined_at'].isoformat()
+    player_dict = player.to_dict()
     
     logging.info(f"👤 Player {player.username} joined room {target_room.id} ({len(target_room.players)}/{target_room.max_players})")
     logging.info(f"📋 Full participant list: {[p['username'] for p in serialized_players]}")
@@ -2219,7 +2372,7 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
         'prize_pool': target_room.prize_pool,
         'all_players': serialized_players,  # FULL participant list - REPLACE, don't append
         'room_status': 'filling' if len(target_room.players) < target_room.max_players else 'full',
-        'timestamp': datetime.now(timezone.utc).isoformat()
+        'timestamp': clock.now()
     })
     logging.info(f"✅ Emitted player_joined to room {target_room.id} with {len(serialized_players)} players")
 
@@ -2237,12 +2390,12 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
             'players': serialized_players,
             'players_count': target_room.max_players,
             'message': '🚀 ROOM IS FULL! GET READY FOR THE BATTLE!',
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'timestamp': clock.now()
         })
         logging.info(f"✅ Emitted room_full to room {target_room.id}")
 
         # Start the game sequence (will emit room_ready, game_starting, game_finished in order)
-        background_tasks.add_task(start_game_round, target_room)
+        round_scheduler.schedule(target_room.id, "start", 0, start_game_round, target_room)
 
     return {
         "status": "joined",
@@ -2250,7 +2403,7 @@ async def join_room(request: JoinRoomRequest, background_tasks: BackgroundTasks)
         "room_id": target_room.id,
         "position": len(target_room.players),
         "players_needed": target_room.max_players - len(target_room.players),
-        "new_balance": user_doc.get('token_balance', 0) - request.bet_amount
+        "new_balance": new_balance_after_join
     }
 
 class LeaveRoomRequest(BaseModel):
@@ -2258,25 +2411,27 @@ class LeaveRoomRequest(BaseModel):
     user_id: str
 
 @api_router.post("/leave-room")
-async def leave_room(request: LeaveRoomRequest):
+async def leave_room(request: LeaveRoomRequest, session: Optional[SessionClaims] = Depends(session_from_request)):
     """Remove player from a waiting room and refund their bet"""
+    if session is not None and session.user_id != request.user_id:
+        raise HTTPException(status_code=403, detail="Session does not match user")
     room = active_rooms.get(request.room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     if room.status != "waiting":
         raise HTTPException(status_code=400, detail="Cannot leave a room that is already in progress")
 
-    player = next((p for p in room.players if p.user_id == request.user_id), None)
+    player = active_rooms.remove_player(room, request.user_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not in this room")
 
     refund = player.bet_amount
-    room.players = [p for p in room.players if p.user_id != request.user_id]
     room.prize_pool = max(0, room.prize_pool - refund)
 
     # Refund tokens
     result = await dbq.increment_user_tokens(request.user_id, refund)
     new_balance = result.get("token_balance", 0) if result else 0
+    await room_journal.flush()
 
     # Notify socket
     sid = user_to_socket.get(request.user_id)
@@ -2287,12 +2442,7 @@ async def leave_room(request: LeaveRoomRequest):
     await broadcast_room_updates()
 
     # Notify remaining room players
-    serialized_players = []
-    for p in room.players:
-        pd = p.dict()
-        if isinstance(pd.get("joined_at"), datetime):
-            pd["joined_at"] = pd["joined_at"].isoformat()
-        serialized_players.append(pd)
+    serialized_players = [p.to_dict() for p in room.players]
     await sio.emit("player_left", {
         "room_type": room.room_type,
         "player": {"first_name": player.first_name, "username": player.username},
@@ -2313,11 +2463,7 @@ async def get_pending_result(user_id: str):
 async def get_room_participants_by_type(room_type: str):
     """Get current participants in a room by type - for lobby updates"""
     # Find the active room of this type
-    target_room = None
-    for room in active_rooms.values():
-        if room.room_type == room_type and room.status == "waiting":
-            target_room = room
-            break
+    target_room = active_rooms.find(room_type, "waiting")
     
     if not target_room:
         return {
@@ -2329,32 +2475,47 @@ async def get_room_participants_by_type(room_type: str):
     return {
         "room_type": room_type,
         "room_id": target_room.id,
-        "players": [p.dict() for p in target_room.players],
+        "players": [p.to_dict() for p in target_room.players],
         "count": len(target_room.players),
         "status": target_room.status
     }
 
 @api_router.get("/room-chat/{room_id}")
-async def get_room_chat(room_id: str):
-    """Get chat history for a room"""
-    return {"messages": room_chat.get(room_id, [])}
+async def get_room_chat(room_id: str, after: int = 0):
+    """Get chat history for a room; with ?after=<id> only newer messages (304 if none)"""
+    last_id = room_chat.last_id(room_id)
+    if after and last_id <= after:
+        return Response(status_code=304)
+    return {"messages": room_chat.history(room_id, after), "last_id": last_id}
 
 @api_router.post("/room-chat/{room_id}")
-async def post_room_chat(room_id: str, user_id: str = "", name: str = "Player", text: str = ""):
+async def post_room_chat(room_id: str, user_id: str = "", name: str = "Player", text: str = "",
+                         client_id: str = ""):
     """Post a chat message to a room (REST fallback when socket unreliable)"""
     text = text.strip()[:200]
     if not text or not room_id:
         raise HTTPException(status_code=400, detail="Missing room_id or text")
+    if not user_id:
+        # The rate limit is per user; an empty id would share one bucket across all anonymous posters
+        raise HTTPException(status_code=400, detail="Missing user_id")
+    throttle_stats.incr("chat", "received")
+    dedupe_key = chat_dedupe_key(room_id, user_id, client_id[:64], text)
+    existing = chat_duplicates.lookup(dedupe_key)
+    if existing:
+        throttle_stats.incr("chat", "merged")
+        return {"ok": True, "duplicate": True, "message": existing}
+    if not chat_limiter.allow(f"user:{user_id}"):
+        throttle_stats.incr("chat", "dropped")
+        raise HTTPException(status_code=429, detail="Too many messages, slow down")
     msg = {
         'user_id': user_id,
         'name': name,
         'text': text,
         'ts': datetime.now(timezone.utc).isoformat(),
     }
-    room_chat.setdefault(room_id, [])
-    room_chat[room_id].append(msg)
-    if len(room_chat[room_id]) > 50:
-        room_chat[room_id] = room_chat[room_id][-50:]
+    msg = room_chat.append(room_id, msg)
+    chat_duplicates.remember(dedupe_key, msg)
+    throttle_stats.incr("chat", "emitted")
     payload = {'room_id': room_id, **msg}
     await sio.emit('lobby_message', payload)
     logging.info(f"💬 REST Chat [{room_id[:8]}] {name}: {text[:40]}")
@@ -2367,29 +2528,23 @@ async def get_room_details(room_id: str):
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
 
-    def serialize_player(p):
-        d = p.dict()
-        if 'joined_at' in d and isinstance(d['joined_at'], datetime):
-            d['joined_at'] = d['joined_at'].isoformat()
-        return d
-
-    return {
+    return FastJSONResponse({
         "id": room.id,
         "room_type": room.room_type,
-        "players": [serialize_player(p) for p in room.players],
+        "players": [p.to_dict() for p in room.players],
         "status": room.status,
         "prize_pool": room.prize_pool,
         "match_id": room.match_id,
         "round_number": room.round_number,
         "settings": ROOM_SETTINGS[room.room_type],
-        "winner": serialize_player(room.winner) if room.winner else None,
-        "finished_at": room.finished_at.isoformat() if room.finished_at else None,
-    }
+        "winner": room.winner.to_dict() if room.winner else None,
+        "finished_at": room.finished_at,
+    })
 
 @api_router.get("/leaderboard")
 async def get_leaderboard():
-    """Get top players by token balance"""
-    leaderboard = await dbq.get_leaderboard(10)
+    """Get top players by token balance (served from the in-memory top-N)"""
+    leaderboard = await leaderboard_cache.leaderboard(10)
     return {"leaderboard": leaderboard}
 
 @api_router.get("/game-history")
@@ -2400,7 +2555,7 @@ async def get_game_history(limit: int = 10, user_id: str = ""):
     if user_id:
         games = await dbq.get_user_completed_games(user_id, limit)
     else:
-        games = await dbq.get_recent_completed_games(limit)
+        games = await leaderboard_cache.recent_games(limit)
     return {"games": games}
 
 @api_router.get("/user-stats/{user_id}")
@@ -2545,25 +2700,16 @@ async def remove_fake_player(room_type: str, admin_key: str = ""):
     """Remove the last bot player from a waiting room."""
     if admin_key != "PRODUCTION_CLEANUP_2025":
         raise HTTPException(status_code=403, detail="Unauthorized")
-    target_room = None
-    for room in active_rooms.values():
-        if room.room_type == room_type and room.status == "waiting":
-            target_room = room
-            break
+    target_room = active_rooms.find(room_type, "waiting")
     if not target_room:
         raise HTTPException(status_code=404, detail=f"No waiting {room_type} room found")
     bot_players = [p for p in target_room.players if p.user_id.startswith("bot_")]
     if not bot_players:
         raise HTTPException(status_code=404, detail="No bot players in this room")
     bot = bot_players[-1]
-    target_room.players = [p for p in target_room.players if p.user_id != bot.user_id]
+    active_rooms.remove_player(target_room, bot.user_id)
     target_room.prize_pool = max(0, target_room.prize_pool - bot.bet_amount)
-    serialized_players = []
-    for p in target_room.players:
-        pd = p.dict()
-        if 'joined_at' in pd and isinstance(pd['joined_at'], datetime):
-            pd['joined_at'] = pd['joined_at'].isoformat()
-        serialized_players.append(pd)
+    serialized_players = [p.to_dict() for p in target_room.players]
     await socket_rooms.broadcast_to_room(sio, target_room.id, 'player_left', {
         'room_id': target_room.id,
         'players': serialized_players,
@@ -2574,7 +2720,7 @@ async def remove_fake_player(room_type: str, admin_key: str = ""):
 
 
 @api_router.post("/admin/add-fake-player")
-async def add_fake_player(room_type: str, player_name: str, bet_amount: int, admin_key: str = "", background_tasks: BackgroundTasks = None):
+async def add_fake_player(room_type: str, player_name: str, bet_amount: int, admin_key: str = ""):
     """Add a fake/bot player to a room to fill it up."""
     if admin_key != "PRODUCTION_CLEANUP_2025":
         raise HTTPException(status_code=403, detail="Unauthorized")
@@ -2591,11 +2737,7 @@ async def add_fake_player(room_type: str, player_name: str, bet_amount: int, adm
     if bet_amount < settings["min_bet"] or bet_amount > settings["max_bet"]:
         raise HTTPException(status_code=400, detail=f"Bet must be between {settings['min_bet']} and {settings['max_bet']}")
 
-    target_room = None
-    for room in active_rooms.values():
-        if room.room_type == room_type and room.status == "waiting":
-            target_room = room
-            break
+    target_room = active_rooms.find(room_type, "waiting")
     if not target_room:
         raise HTTPException(status_code=404, detail=f"No waiting room found for {room_type}")
     if len(target_room.players) >= 3:
@@ -2603,7 +2745,7 @@ async def add_fake_player(room_type: str, player_name: str, bet_amount: int, adm
 
     bot_seed = str(uuid.uuid4())[:8]
     anon_num = str(hash(bot_seed) % 9000 + 1000)
-    fake_player = RoomPlayer(
+    fake_player = LivePlayer(
         user_id=f"bot_{bot_seed}",
         username="",
         first_name="Anonymous",
@@ -2612,19 +2754,12 @@ async def add_fake_player(room_type: str, player_name: str, bet_amount: int, adm
         bet_amount=bet_amount,
         is_anonymous=True
     )
-    target_room.players.append(fake_player)
+    active_rooms.add_player(target_room, fake_player)
     target_room.prize_pool += bet_amount
 
-    serialized_players = []
-    for p in target_room.players:
-        pd = p.dict()
-        if 'joined_at' in pd and isinstance(pd['joined_at'], datetime):
-            pd['joined_at'] = pd['joined_at'].isoformat()
-        serialized_players.append(pd)
+    serialized_players = [p.to_dict() for p in target_room.players]
 
-    fake_dict = fake_player.dict()
-    if 'joined_at' in fake_dict and isinstance(fake_dict['joined_at'], datetime):
-        fake_dict['joined_at'] = fake_dict['joined_at'].isoformat()
+    fake_dict = fake_player.to_dict()
 
     await socket_rooms.broadcast_to_room(sio, target_room.id, 'player_joined', {
         'room_id': target_room.id,
@@ -2634,7 +2769,7 @@ async def add_fake_player(room_type: str, player_name: str, bet_amount: int, adm
         'prize_pool': target_room.prize_pool,
         'all_players': serialized_players,
         'room_status': 'filling' if len(target_room.players) < target_room.max_players else 'full',
-        'timestamp': datetime.now(timezone.utc).isoformat()
+        'timestamp': datetime.now(timezone.utc)
     })
     await broadcast_room_updates()
 
@@ -2645,10 +2780,9 @@ async def add_fake_player(room_type: str, player_name: str, bet_amount: int, adm
             'players': serialized_players,
             'players_count': target_room.max_players,
             'message': '🚀 ROOM IS FULL! GET READY FOR THE BATTLE!',
-            'timestamp': datetime.now(timezone.utc).isoformat()
+            'timestamp': datetime.now(timezone.utc)
         })
-        if background_tasks:
-            background_tasks.add_task(start_game_round, target_room)
+        round_scheduler.schedule(target_room.id, "start", 0, start_game_round, target_room)
 
     return {
         "status": "success",
@@ -2692,6 +2826,7 @@ async def ban_user_endpoint(telegram_id: int, admin_key: str = ""):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     await dbq.ban_user(telegram_id)
+    session_tokens.mark_banned(telegram_id)
     return {"success": True, "message": f"User {telegram_id} banned"}
 
 
@@ -2700,6 +2835,7 @@ async def unban_user_endpoint(telegram_id: int, admin_key: str = ""):
     if admin_key != "PRODUCTION_CLEANUP_2025":
         raise HTTPException(status_code=403, detail="Unauthorized")
     await dbq.unban_user(telegram_id)
+    session_tokens.mark_unbanned(telegram_id)
     return {"success": True, "message": f"User {telegram_id} unbanned"}
 
 
@@ -2756,7 +2892,7 @@ async def broadcast_message(message: str, admin_key: str = ""):
             for tg_id in tg_ids:
                 try:
                     resp = await client.post(
-                        f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
+                        f"{TELEGRAM_API_URL}/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
                         json={"chat_id": tg_id, "text": message, "parse_mode": "HTML"},
                     )
                     if resp.status_code == 200:
@@ -2776,21 +2912,17 @@ async def broadcast_message(message: str, admin_key: str = ""):
                     errors.append(f"{tg_id}: {ex}")
         logging.info(f"📢 Broadcast done: sent={sent}, skipped={skipped}, failed={failed}, total={len(tg_ids)}")
         # Push in-app broadcast to all connected socket clients
-        await sio.emit('admin_broadcast', {'message': message, 'ts': datetime.now(timezone.utc).isoformat()})
+        await sio.emit('admin_broadcast', {'message': message, 'ts': datetime.now(timezone.utc)})
         return {"sent": sent, "failed": failed, "skipped": skipped, "total": len(tg_ids), "errors": errors[:5]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @api_router.post("/admin/force-start/{room_type}")
-async def force_start_room(room_type: str, admin_key: str = "", background_tasks: BackgroundTasks = None):
+async def force_start_room(room_type: str, admin_key: str = ""):
     if admin_key != "PRODUCTION_CLEANUP_2025":
         raise HTTPException(status_code=403, detail="Unauthorized")
-    target_room = None
-    for room in active_rooms.values():
-        if room.room_type == room_type and room.status == "waiting":
-            target_room = room
-            break
+    target_room = active_rooms.find(room_type, "waiting")
     if not target_room:
         raise HTTPException(status_code=404, detail=f"No waiting {room_type} room")
     if len(target_room.players) == 0:
@@ -2799,7 +2931,7 @@ async def force_start_room(room_type: str, admin_key: str = "", background_tasks
     while len(target_room.players) < 3:
         bot_seed = str(uuid.uuid4())[:8]
         anon_num = str(abs(hash(bot_seed)) % 9000 + 1000)
-        bot = RoomPlayer(
+        bot = LivePlayer(
             user_id=f"bot_{bot_seed}",
             username=f"anon{anon_num}",
             first_name="Anonymous",
@@ -2807,15 +2939,38 @@ async def force_start_room(room_type: str, admin_key: str = "", background_tasks
             photo_url="",
             bet_amount=settings["min_bet"]
         )
-        target_room.players.append(bot)
+        active_rooms.add_player(target_room, bot)
         target_room.prize_pool += settings["min_bet"]
-    if background_tasks:
-        background_tasks.add_task(start_game_round, target_room)
-    else:
-        asyncio.create_task(start_game_round(target_room))
+    round_scheduler.schedule(target_room.id, "start", 0, start_game_round, target_room)
     return {"success": True, "message": f"Force starting {room_type} room", "players": len(target_room.players)}
 
 
+async def socket_probe(admin_key: str = "", mode: str = "global", rooms: str = "", payload_bytes: int = 0,
+                       probe_id: str = ""):
+    """Emit a timestamped `socket_probe` (bench_socketio.py): to every socket (mode=global)
+    or to each of the comma-separated socket rooms in turn (mode=room).
+    Only routed when ENABLE_BENCH_ENDPOINTS=1."""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if mode not in ("global", "room"):
+        raise HTTPException(status_code=400, detail="mode must be global or room")
+    targets = [r for r in rooms.split(",") if r] if mode == "room" else [None]
+    payload = {"probe_id": probe_id or uuid4().hex[:12], "mode": mode, "pad": "x" * max(0, min(payload_bytes, SOCKET_PROBE_MAX_BYTES))}
+    started = time.perf_counter()
+    for target in targets:
+        payload["sent_at"] = time.time()
+        await sio.emit("socket_probe", payload, room=target)
+    return {
+        "probe_id": payload["probe_id"],
+        "emits": len(targets),
+        "emit_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+if ENABLE_BENCH_ENDPOINTS:
+    api_router.add_api_route("/admin/socket-probe", socket_probe, methods=["POST"])
+
+
 @api_router.post("/admin/toggle-maintenance")
 async def toggle_maintenance(admin_key: str = ""):
     global maintenance_mode
@@ -2904,15 +3059,227 @@ async def force_close_room_endpoint(room_type: str, admin_key: str = ""):
     if admin_key != "PRODUCTION_CLEANUP_2025":
         raise HTTPException(status_code=403, detail="Unauthorized")
     closed = []
-    for room_id, room in list(active_rooms.items()):
-        if room.room_type == room_type and room.status == "waiting":
-            room.players.clear()
-            closed.append(room_id)
+    for room in active_rooms.rooms_with(room_type, "waiting"):
+        active_rooms.clear_players(room)
+        closed.append(room.id)
     if not closed:
         raise HTTPException(status_code=404, detail=f"No waiting {room_type} room found")
     return {"success": True, "closed_rooms": closed}
 
 
+@api_router.get("/admin/phase-durations")
+async def get_phase_durations_endpoint(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return room_phase_durations
+
+
+@api_router.post("/admin/phase-durations/{room_type}")
+async def update_phase_durations(
+    room_type: str,
+    spin: float = None,
+    announce: float = None,
+    cleanup: float = None,
+    admin_key: str = ""
+):
+    """Change round phase durations for a room type (applies to rounds started afterwards)"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if room_type not in room_phase_durations:
+        raise HTTPException(status_code=400, detail="Invalid room type")
+    for phase, value in (("spin", spin), ("announce", announce), ("cleanup", cleanup)):
+        if value is not None:
+            if value < 0:
+                raise HTTPException(status_code=400, detail=f"{phase} must be >= 0")
+            room_phase_durations[room_type][phase] = value
+    return {"room_type": room_type, **room_phase_durations[room_type]}
+
+
+@api_router.get("/admin/round-scheduler")
+async def get_round_scheduler(admin_key: str = ""):
+    """Pending room phase transitions and phase lag metrics"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return {"stats": round_scheduler.get_stats(), "pending": round_scheduler.pending()}
+
+
+@api_router.get("/admin/lobby-broadcaster")
+async def get_lobby_broadcaster_stats(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return lobby_broadcaster.get_stats()
+
+
+@api_router.get("/admin/event-throttle")
+async def get_event_throttle_stats(admin_key: str = ""):
+    """Received / dropped / merged / emitted counts for reactions and chat"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return {"events": throttle_stats.snapshot(), "reaction_batch_interval": reaction_batcher.interval}
+
+
+@api_router.get("/admin/leaderboard-cache")
+async def get_leaderboard_cache_stats(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return leaderboard_cache.get_stats()
+
+
+@api_router.get("/admin/logging")
+async def get_logging_stats(admin_key: str = ""):
+    """Queue depth, drops, sampled-out records and per-subsystem levels"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return log_pipeline.get_stats()
+
+
+@api_router.post("/admin/logging/level")
+async def set_logging_level(name: str, level: str, admin_key: str = ""):
+    """Change one subsystem's level at runtime, e.g. name=casino.socket&level=DEBUG"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    try:
+        log_pipeline.set_level(name, level)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid level")
+    return {"name": name, "level": level.upper()}
+
+
+@api_router.get("/admin/session-tokens")
+async def get_session_token_stats(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return session_tokens.get_stats()
+
+
+@api_router.get("/admin/user-cache")
+async def get_user_cache_stats(admin_key: str = ""):
+    """Hit rate and invalidations of the per-process user row cache"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return dbq.get_user_cache_stats()
+
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    """Prometheus text exposition. Set METRICS_TOKEN to require `Authorization: Bearer <token>`"""
+    token = os.environ.get("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@api_router.get("/admin/db-queries")
+async def get_db_query_stats(admin_key: str = "", sort: str = "total", limit: int = 20):
+    """Top statements per db_queries function (sort: total|mean|max|calls|rows|errors),
+    pool acquire wait per function and the recent slow-query log"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return query_stats.get_stats(sort=sort, limit=max(1, min(limit, 200)))
+
+
+@api_router.post("/admin/db-queries/reset")
+async def reset_db_query_stats(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    query_stats.reset()
+    return {"success": True}
+
+
+@api_router.get("/admin/loop-lag")
+async def get_loop_lag_stats(admin_key: str = "", stacks: bool = True):
+    """Event-loop lag percentiles and stacks captured while the loop was blocked"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return loop_monitor.get_stats(include_stacks=stacks)
+
+
+@api_router.post("/admin/loop-lag")
+async def configure_loop_monitor(admin_key: str = "", enabled: Optional[bool] = None,
+                                 threshold_ms: Optional[float] = None):
+    """Switch the monitor on/off or change the stall threshold at runtime"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if threshold_ms is not None and threshold_ms <= 0:
+        raise HTTPException(status_code=400, detail="threshold_ms must be positive")
+    await loop_monitor.configure(enabled=enabled, threshold=threshold_ms / 1000 if threshold_ms else None)
+    return loop_monitor.get_stats(include_stacks=False)
+
+
+@api_router.get("/admin/traces")
+async def get_traces(admin_key: str = "", name: Optional[str] = None, trace_id: Optional[str] = None, limit: int = 20):
+    """Recent sampled traces (round.start/resolve/finish/close share the room id as trace id,
+    join_room traces are per request) plus per-span duration percentiles"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return {
+        **tracer.get_stats(),
+        "summary": tracer.summary(),
+        "traces": tracer.traces(name=name, trace_id=trace_id, limit=max(1, min(limit, 200))),
+    }
+
+
+@api_router.post("/admin/traces")
+async def configure_tracing(admin_key: str = "", sample_rate: Optional[float] = None, export: Optional[str] = None):
+    """Change sampling (0..1) or export (ring|jsonl|both) at runtime"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    try:
+        tracer.configure(sample_rate=sample_rate, export=export)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return tracer.get_stats()
+
+
+@api_router.get("/admin/response-cache")
+async def get_response_cache_stats(admin_key: str = ""):
+    """Hit rate, 304s and coalesced misses of the GET micro-cache"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return response_cache.get_stats()
+
+
+@api_router.get("/admin/room-journal")
+async def get_room_journal_stats(admin_key: str = ""):
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return room_journal.get_stats()
+
+
+@api_router.post("/admin/round-scheduler/{room_id}/cancel")
+async def cancel_room_transition(room_id: str, admin_key: str = ""):
+    """
+    Cancel a room's pending start transition (the room stays waiting)
+
+    Only `start` can be cancelled: later phases run after bets were taken
+    and the round began, and without them the room would never settle or close.
+    A cancelled start can be re-armed with /admin/force-start/{room_type}.
+    """
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    transition = round_scheduler.get_transition(room_id)
+    if transition is None:
+        raise HTTPException(status_code=404, detail="No pending transition for this room")
+    if transition.phase != "start":
+        raise HTTPException(status_code=409, detail=f"Cannot cancel the {transition.phase} phase of a running round — "
+                                                    f"reschedule it instead")
+    round_scheduler.cancel(room_id)
+    logging.warning(f"⏱️ Admin cancelled {transition.phase} transition for room {room_id}")
+    return {"success": True, "room_id": room_id, "cancelled_phase": transition.phase}
+
+
+@api_router.post("/admin/round-scheduler/{room_id}/reschedule")
+async def reschedule_room_transition(room_id: str, delay: float, admin_key: str = ""):
+    """Fire a room's pending phase transition `delay` seconds from now"""
+    if admin_key != "PRODUCTION_CLEANUP_2025":
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if delay < 0:
+        raise HTTPException(status_code=400, detail="delay must be >= 0")
+    if not round_scheduler.reschedule(room_id, delay):
+        raise HTTPException(status_code=404, detail="No pending transition for this room")
+    return {"success": True, "room_id": room_id, "phase": round_scheduler.get_transition(room_id).phase, "delay": delay}
+
+
 @api_router.get("/admin/freeroll-config")
 async def get_freeroll_config(admin_key: str = ""):
     if admin_key != "PRODUCTION_CLEANUP_2025":
@@ -2932,13 +3299,13 @@ async def update_freeroll_config(
         raise HTTPException(status_code=403, detail="Unauthorized")
     if max_players is not None:
         freeroll_config['max_players'] = max_players
-        for room in active_rooms.values():
-            if room.room_type == RoomType.FREEROLL and room.status == 'waiting':
-                room.max_players = max_players
+        for room in active_rooms.rooms_with(RoomType.FREEROLL, 'waiting'):
+            room.max_players = max_players
     if prize is not None:
         freeroll_config['prize'] = prize
     if is_locked is not None:
         freeroll_config['is_locked'] = is_locked
+    response_cache.bump("rooms")
     return freeroll_config
 
 
@@ -2958,16 +3325,16 @@ app.mount('/api/socket.io', sio_app)
 # Export the main app for uvicorn
 socket_app = app
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logging is configured by log_pipeline.setup_logging() when the app starts, so
+# scripts that only import server (simulate, benchmarks, tests) keep their own
 logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
+    # Queue-based JSON logging with per-subsystem levels — before anything else logs
+    log_pipeline.setup_logging()
+
     # Initialize PostgreSQL connection pool
     await create_pool()
 
@@ -2979,7 +3346,19 @@ async def startup_event():
     except Exception as e:
         logger.error(f"⚠️ DB migrations warning: {e}")
 
+    # Loop lag + blocking-call stacks (LOOP_MONITOR=0 to disable)
+    loop_monitor.start()
+
+    # Single timer loop that drives every room's phase transitions
+    round_scheduler.start()
+
+    # Bring back rooms from before the restart, then open any missing types
+    try:
+        await restore_rooms_from_journal()
+    except Exception as e:
+        logger.error(f"❌ Room journal replay failed: {e}")
     await initialize_rooms()
+    room_journal.start()
 
     # Start Solana payment monitoring
     await payment_monitor.start_monitoring()
@@ -3006,6 +3385,23 @@ async def startup_event():
     except Exception as e:
         logging.error(f"❌ [Startup] Failed to clear game history: {e}")
 
+    # Seed leaderboard / recent games (after the history wipe above) and keep them reconciled
+    try:
+        await leaderboard_cache.load()
+        logging.info(f"🏆 [Startup] Leaderboard cache loaded ({len(leaderboard_cache.balances)} users)")
+    except Exception as e:
+        logging.error(f"❌ [Startup] Leaderboard cache load failed (falling back to DB): {e}")
+    leaderboard_cache.start()
+    dbq.last_login_writer.start()
+
+    # User rows are cached per process; with several workers they invalidate each other via NOTIFY
+    if int(os.environ.get("WEB_CONCURRENCY", "1")) > 1 or os.environ.get("USER_CACHE_NOTIFY") == "1":
+        try:
+            await dbq.start_user_cache_listener()
+            logging.info("👤 [Startup] User cache cross-process invalidation enabled (LISTEN user_cache)")
+        except Exception as e:
+            logging.error(f"❌ [Startup] User cache listener failed (TTL-only invalidation): {e}")
+
     logging.info("🎰 Casino Battle Royale API started!")
     logging.info(f"🏠 Active rooms: {len(active_rooms)}")
     logging.info(f"💳 Solana monitoring: {'Enabled' if CASINO_WALLET_ADDRESS != 'YourWalletAddressHere12345678901234567890123456789' else 'Disabled (set CASINO_WALLET_ADDRESS)'}")
@@ -3021,7 +3417,7 @@ async def redundant_payment_scanner():
     from solana_integration import get_processor
     
     # Wait a bit before starting to ensure DB is ready
-    await asyncio.sleep(10)
+    await clock.sleep(10)
     
     logging.info("🔍 [Scanner] Redundant payment scanner started (15s interval)")
     
@@ -3035,7 +3431,7 @@ async def redundant_payment_scanner():
             logging.error(traceback.format_exc())
         
         # Wait 15 seconds before next scan (faster detection)
-        await asyncio.sleep(15)
+        await clock.sleep(15)
 
 async def wallet_cleanup_scheduler():
     """
@@ -3046,7 +3442,7 @@ async def wallet_cleanup_scheduler():
     from solana_integration import get_processor
     
     # Wait 1 hour after startup before first cleanup
-    await asyncio.sleep(3600)
+    await clock.sleep(3600)
     
     logging.info("🧹 [Cleanup Scheduler] Wallet cleanup scheduler started (24h interval, 72h grace period)")
     
@@ -3066,7 +3462,7 @@ async def wallet_cleanup_scheduler():
             logging.error(traceback.format_exc())
         
         # Wait 24 hours before next cleanup
-        await asyncio.sleep(86400)
+        await clock.sleep(86400)
 
 async def cleanup_old_game_history():
     """
@@ -3087,8 +3483,16 @@ async def cleanup_old_game_history():
 async def shutdown_event():
     """Cleanup on application shutdown"""
     payment_monitor.monitoring = False
+    # Let in-flight phase callbacks finish their DB writes before the pool closes
+    await round_scheduler.stop()
+    await room_journal.stop()
+    await leaderboard_cache.stop()
+    await dbq.stop_user_cache_listener()
+    await dbq.last_login_writer.stop()
+    await loop_monitor.stop()
     await close_pool()
     logging.info("🛑 Casino Battle Royale API shutting down")
+    log_pipeline.shutdown_logging()
 
 # Export the socket app for uvicorn
 
@@ -0,0 +1,112 @@
+"""
+Session Tokens
+Short-lived HS256 tokens issued by /auth/telegram. They carry the user id,
+telegram id, role and ban flag, so endpoints and socket handlers can check
+identity and authorization in memory instead of loading the user row.
+
+Bans issued in this process take effect immediately (revoked telegram ids);
+anywhere else they take effect at the next refresh, i.e. within the TTL.
+"""
+
+import logging
+import os
+import secrets
+import time
+from typing import Dict, Optional, Set, Tuple
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+
+class SessionError(Exception):
+    """Token missing its signature, malformed, expired or revoked.
+    str(error) is the reason sent to the client ("session_expired", ...)"""
+
+
+class SessionClaims:
+    __slots__ = ("user_id", "telegram_id", "role", "is_banned", "expires_at")
+
+    def __init__(self, user_id: str, telegram_id: int, role: str, is_banned: bool, expires_at: int):
+        self.user_id = user_id
+        self.telegram_id = telegram_id
+        self.role = role
+        self.is_banned = is_banned
+        self.expires_at = expires_at
+
+
+class SessionTokens:
+    """Issues and verifies signed session tokens"""
+
+    ALGORITHM = "HS256"
+
+    def __init__(self, secret: Optional[str] = None, ttl: Optional[int] = None,
+                 refresh_window: Optional[int] = None):
+        secret = secret or os.environ.get("SESSION_TOKEN_SECRET")
+        if not secret:
+            # Tokens then only verify in this process and die with it (clients re-auth)
+            logger.warning("⚠️ SESSION_TOKEN_SECRET not set — using a per-process random secret")
+            secret = secrets.token_urlsafe(32)
+        self._secret = secret
+        self.ttl = ttl if ttl is not None else int(os.environ.get("SESSION_TOKEN_TTL", "900"))
+        # How long after expiry a token can still be exchanged at /auth/refresh
+        self.refresh_window = refresh_window if refresh_window is not None else \
+            int(os.environ.get("SESSION_REFRESH_WINDOW", "86400"))
+        self._banned: Set[int] = set()
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def issue(self, user: Dict) -> Tuple[str, int]:
+        """Token for a user row; returns (token, expires_at unix seconds)"""
+        now = int(time.time())
+        expires_at = now + self.ttl
+        payload = {
+            "sub": user["id"],
+            "tg": user.get("telegram_id"),
+            "role": user.get("role") or "user",
+            "ban": bool(user.get("is_banned")),
+            "iat": now,
+            "exp": expires_at,
+        }
+        self.issued += 1
+        return jwt.encode(payload, self._secret, algorithm=self.ALGORITHM), expires_at
+
+    def verify(self, token: str, allow_expired: bool = False) -> SessionClaims:
+        try:
+            payload = jwt.decode(
+                token, self._secret, algorithms=[self.ALGORITHM],
+                leeway=self.refresh_window if allow_expired else 0,
+            )
+        except jwt.ExpiredSignatureError:
+            self.rejected += 1
+            raise SessionError("session_expired")
+        except jwt.InvalidTokenError:
+            self.rejected += 1
+            raise SessionError("session_invalid")
+        claims = SessionClaims(payload["sub"], payload.get("tg"), payload.get("role", "user"),
+                               payload.get("ban", False), payload["exp"])
+        if claims.telegram_id in self._banned:
+            claims.is_banned = True
+        self.verified += 1
+        return claims
+
+    def mark_banned(self, telegram_id: int):
+        self._banned.add(telegram_id)
+
+    def mark_unbanned(self, telegram_id: int):
+        self._banned.discard(telegram_id)
+
+    def get_stats(self) -> Dict:
+        return {
+            "ttl": self.ttl,
+            "refresh_window": self.refresh_window,
+            "issued": self.issued,
+            "verified": self.verified,
+            "rejected": self.rejected,
+            "revoked_in_process": len(self._banned),
+        }
+
+
+# Global token service
+session_tokens = SessionTokens()
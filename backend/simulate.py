@@ -0,0 +1,546 @@
+"""
+simulate.py — replay days of rounds and payments in virtual time and check engine invariants
+Run: python simulate.py --hours 24
+     python simulate.py --hours 168 --join-rate 2 --payments-per-hour 300 --rpc-error-rate 0.05 --json sim.json
+
+The real engine runs in-process: server.join_room, the round phase callbacks on
+round_scheduler, the room journal, SolanaPaymentProcessor (per-wallet monitors,
+credit, sweep) and the redundant payment scanner / wallet cleanup loops. Only
+the edges are replaced:
+
+  * time     — a clock.VirtualTimeLoop; the loop jumps to the next timer
+               whenever every task is waiting, so 8s spins, 5s wallet polls
+               and 15s rescans cost no wall time
+  * Postgres — MemoryStore, in-memory versions of the db_queries functions
+               the engine calls (same guards: debit refuses short balances,
+               update_temporary_wallet only writes the allowed columns and
+               never after tokens_credited)
+  * Solana / CoinGecko — standins.StandIn served over httpx.ASGITransport
+
+Players join each room type as a Poisson process (--join-rate per type per
+virtual second) with uniform bets inside the room's range; a player short of
+tokens buys some (--topup-rate) and purchases also arrive on their own
+(--payments-per-hour). A purchase is paid after an exponential delay
+(--pay-delay) unless it is abandoned (--abandon-rate).
+
+Invariants, checked every --check-every virtual seconds and at the end:
+  tokens      Σ balances + bets held by unresolved rooms
+              == initial tokens + minted free/freeroll prizes + tokens bought
+              (bought = SOL/EUR conversion of every credited payment;
+              deferred while a winner credit is in flight)
+  payments    at most one credit per purchase wallet
+  rounds      no room above max_players, no failed phase transition, and no
+              full / in-progress room without a pending transition on two
+              consecutive checks (stuck round)
+
+Exit status is 1 when any invariant was violated.
+"""
+import os
+import tempfile
+
+# Quiet, file-free engine before server is imported
+_SIM_DIR = tempfile.mkdtemp(prefix="casino-sim-", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+_STANDIN_URL = "http://standin.sim"
+for _key, _value in {
+    "LOG_LEVEL": "ERROR",
+    "TRACE_SAMPLE_RATE": "0",
+    "LOOP_MONITOR": "0",
+    "CASINO_LOG_DIR": _SIM_DIR,
+    "ROOM_JOURNAL_PATH": os.path.join(_SIM_DIR, "room_journal.jsonl"),
+    "SOLANA_RPC_URL": _STANDIN_URL,
+    "SOLANA_RPC_FALLBACK_1": _STANDIN_URL,
+    "SOLANA_RPC_FALLBACK_2": _STANDIN_URL,
+    "COINGECKO_API_URL": f"{_STANDIN_URL}/api/v3",
+    "TELEGRAM_API_URL": _STANDIN_URL,
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import time
+from collections import Counter
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException
+
+import db_queries as dbq
+import server
+import solana_integration
+import standins
+from clock import VirtualTimeLoop, clock
+from room_journal import room_journal
+from round_scheduler import round_scheduler
+
+LAMPORTS_PER_SOL = 1_000_000_000
+MINTED_ROOM_TYPES = ("free", "freeroll")
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# ── In-memory persistence ────────────────────────────────────────────
+
+class MemoryStore:
+    """The db_queries functions the round engine and payment paths call, backed by dicts"""
+
+    PATCHED = (
+        "get_user_by_id", "debit_user_tokens", "increment_user_tokens", "insert_winner_prize",
+        "insert_completed_game", "upsert_pending_result", "count_completed_games",
+        "insert_temporary_wallet", "get_temporary_wallet", "update_temporary_wallet",
+        "insert_token_purchase", "get_all_temporary_wallets_monitoring", "count_pending_wallets",
+        "get_completed_temporary_wallets", "delete_abandoned_temporary_wallets",
+    )
+    WALLET_UPDATABLE = {"payment_detected", "tokens_credited", "sol_forwarded", "status", "detected_at"}
+
+    def __init__(self, users: int, balance: int):
+        self.users: Dict[str, Dict] = {
+            f"sim_user_{i}": {
+                "id": f"sim_user_{i}",
+                "telegram_id": 900_000_000 + i,
+                "first_name": "Sim",
+                "last_name": str(i),
+                "telegram_username": f"sim_{i}",
+                "photo_url": "",
+                "token_balance": balance,
+                "is_banned": False,
+            }
+            for i in range(users)
+        }
+        self.initial_tokens = users * balance
+        self.wallets: Dict[str, Dict] = {}
+        self.purchases: Counter = Counter()  # wallet → token_purchases rows
+        self.credited_at: Dict[str, float] = {}  # wallet → virtual time tokens_credited was set
+        self.completed_games = 0
+        self.completed_by_type: Counter = Counter()
+        self.minted_completed = 0
+        self.completed_ids = set()  # completed rooms that may still be in active_rooms
+        self.prizes = 0
+        self.abandoned_deleted = 0
+        self._saved: Dict[str, object] = {}
+
+    def install(self):
+        for name in self.PATCHED:
+            self._saved[name] = getattr(dbq, name)
+            setattr(dbq, name, getattr(self, name))
+
+    def uninstall(self):
+        for name, fn in self._saved.items():
+            setattr(dbq, name, fn)
+        self._saved.clear()
+
+    # users
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
+        user = self.users.get(user_id)
+        return dict(user) if user else None
+
+    async def debit_user_tokens(self, user_id: str, amount: int) -> Optional[Dict]:
+        user = self.users.get(user_id)
+        if user is None or user["token_balance"] < amount:
+            return None
+        user["token_balance"] -= amount
+        return dict(user)
+
+    async def increment_user_tokens(self, user_id: str, amount: int) -> Optional[Dict]:
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        user["token_balance"] += amount
+        return dict(user)
+
+    # rounds
+    async def insert_winner_prize(self, prize_doc: Dict) -> bool:
+        self.prizes += 1
+        return True
+
+    async def insert_completed_game(self, game_doc: Dict) -> bool:
+        if game_doc["id"] in self.completed_ids:
+            return False
+        self.completed_ids.add(game_doc["id"])
+        self.completed_games += 1
+        self.completed_by_type[game_doc["room_type"]] += 1
+        if game_doc["room_type"] in MINTED_ROOM_TYPES:
+            self.minted_completed += game_doc["prize_pool"]
+        return True
+
+    async def upsert_pending_result(self, user_id: str, result_doc: Dict) -> bool:
+        return True
+
+    async def count_completed_games(self) -> int:
+        return self.completed_games
+
+    # payments
+    async def insert_temporary_wallet(self, wallet_doc: Dict) -> bool:
+        address = wallet_doc["wallet_address"]
+        if address in self.wallets:
+            return False
+        self.wallets[address] = {
+            key: wallet_doc.get(key)
+            for key in ("wallet_address", "user_id", "required_sol", "private_key", "token_amount",
+                        "payment_detected", "tokens_credited", "sol_forwarded", "status", "created_at")
+        }
+        self.wallets[address]["detected_at"] = None
+        return True
+
+    async def get_temporary_wallet(self, wallet_address: str) -> Optional[Dict]:
+        wallet = self.wallets.get(wallet_address)
+        return dict(wallet) if wallet else None
+
+    async def update_temporary_wallet(self, wallet_address: str, fields: Dict) -> bool:
+        filtered = {k: v for k, v in fields.items() if k in self.WALLET_UPDATABLE}
+        wallet = self.wallets.get(wallet_address)
+        if not filtered or wallet is None or wallet["tokens_credited"]:
+            return False
+        wallet.update(filtered)
+        if filtered.get("tokens_credited"):
+            self.credited_at[wallet_address] = clock.monotonic()
+        return True
+
+    async def insert_token_purchase(self, purchase_doc: Dict) -> bool:
+        self.purchases[purchase_doc["wallet_address"]] += 1
+        return True
+
+    async def get_all_temporary_wallets_monitoring(self) -> List[Dict]:
+        return [dict(w) for w in self.wallets.values() if w["status"] in ("pending", "monitoring")]
+
+    async def count_pending_wallets(self) -> int:
+        return sum(1 for w in self.wallets.values() if w["status"] == "pending")
+
+    async def get_completed_temporary_wallets(self) -> List[Dict]:
+        return [dict(w) for w in self.wallets.values() if w["status"] == "completed"]
+
+    async def delete_abandoned_temporary_wallets(self, created_before) -> int:
+        abandoned = [address for address, w in self.wallets.items()
+                     if not w["payment_detected"] and not w["tokens_credited"] and w["created_at"] < created_before]
+        for address in abandoned:
+            del self.wallets[address]
+        self.abandoned_deleted += len(abandoned)
+        return len(abandoned)
+
+
+# ── Simulation ───────────────────────────────────────────────────────
+
+class Simulation:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.store = MemoryStore(args.users, args.balance)
+        self.standin = standins.StandIn(sol_eur=args.sol_eur)
+        self.user_ids = list(self.store.users)
+        self.processor: Optional[solana_integration.SolanaPaymentProcessor] = None
+        self.running = True
+        self.joins = Counter()
+        self.rejections = Counter()
+        self.purchases_created = 0
+        self.purchases_abandoned = 0
+        self.injected: Dict[str, tuple] = {}  # wallet → (lamports, injected at)
+        self.violations: List[Dict] = []
+        self._violation_keys = set()
+        self._suspect_rooms = set()
+        self._tasks: List[asyncio.Task] = []
+        self._spawned: set = set()
+        self.checks = 0
+        self.deferred = 0  # token checks postponed by a credit in flight
+
+    # ── Setup ────────────────────────────────────────────────────────
+
+    async def start(self):
+        self.store.install()
+        round_scheduler.start()
+        await server.initialize_rooms()
+        room_journal.start()
+
+        solana_integration.reset_processor()
+        self.processor = solana_integration.get_processor(None)
+        transport = httpx.ASGITransport(app=self.standin.app())
+        self.processor.client._provider.session = httpx.AsyncClient(transport=transport, base_url=_STANDIN_URL)
+        # The price is fixed for the run, so every credit converts at the same rate
+        self.processor.price_fetcher.cached_price = self.args.sol_eur
+        self.processor.price_fetcher.cache_duration = float("inf")
+        self.standin.faults["rpc"].configure(error_rate=self.args.rpc_error_rate,
+                                             latency_ms=self.args.rpc_latency_ms,
+                                             jitter_ms=self.args.rpc_latency_ms / 2)
+
+        if not self.args.no_background:
+            self._tasks.append(asyncio.create_task(server.redundant_payment_scanner()))
+            self._tasks.append(asyncio.create_task(server.wallet_cleanup_scheduler()))
+
+    async def stop(self):
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await round_scheduler.stop()
+        await room_journal.stop()
+        # Payment monitors and sweeps still sleeping in virtual time
+        leftover = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in leftover:
+            task.cancel()
+        await asyncio.gather(*leftover, return_exceptions=True)
+        self.store.uninstall()
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._spawned.add(task)
+        task.add_done_callback(self._spawned.discard)
+
+    # ── Workload ─────────────────────────────────────────────────────
+
+    async def join_driver(self, room_type: server.RoomType):
+        settings = server.ROOM_SETTINGS[room_type]
+        while self.running:
+            await clock.sleep(self.rng.expovariate(self.args.join_rate))
+            if not self.running:
+                return
+            user_id = self.rng.choice(self.user_ids)
+            bet = self.rng.randint(settings["min_bet"], settings["max_bet"]) if settings["max_bet"] else 0
+            request = server.JoinRoomRequest(room_type=room_type, user_id=user_id, bet_amount=bet)
+            try:
+                await server.join_room(request, session=None)
+                self.joins[room_type.value] += 1
+            except HTTPException as e:
+                self.rejections[e.detail] += 1
+                if e.detail == "Insufficient token balance" and self.rng.random() < self.args.topup_rate:
+                    self.spawn(self.purchase(user_id))
+
+    async def payment_driver(self):
+        rate = self.args.payments_per_hour / 3600
+        while self.running and rate > 0:
+            await clock.sleep(self.rng.expovariate(rate))
+            if self.running:
+                self.spawn(self.purchase(self.rng.choice(self.user_ids)))
+
+    async def purchase(self, user_id: str):
+        info = await self.processor.create_payment_wallet(user_id, self.args.tokens)
+        self.purchases_created += 1
+        if self.rng.random() < self.args.abandon_rate:
+            self.purchases_abandoned += 1
+            return
+        await clock.sleep(self.rng.expovariate(1 / self.args.pay_delay))
+        lamports = int(info["required_sol"] * LAMPORTS_PER_SOL) + 1
+        self.standin.ledger.inject_payment(info["wallet_address"], lamports)
+        self.injected[info["wallet_address"]] = (lamports, clock.monotonic())
+
+    # ── Invariants ───────────────────────────────────────────────────
+
+    def violation(self, kind: str, key: str, detail: str):
+        if (kind, key) in self._violation_keys:
+            return
+        self._violation_keys.add((kind, key))
+        self.violations.append({"kind": kind, "at_s": round(clock.monotonic(), 1), "detail": detail})
+        print(f"  ✗ [{kind}] t={clock.monotonic():.0f}s {detail}", file=sys.stderr)
+
+    def bought_tokens(self) -> int:
+        fetcher = self.processor.price_fetcher
+        total = 0
+        for address, wallet in self.store.wallets.items():
+            if wallet["tokens_credited"]:
+                lamports = self.injected[address][0]
+                sol = Decimal(lamports) / Decimal(LAMPORTS_PER_SOL)
+                total += fetcher.calculate_tokens_from_sol(float(sol), self.args.sol_eur) * self.store.purchases[address]
+        return total
+
+    @staticmethod
+    def mid_credit(room) -> bool:
+        return room.winner is not None and room.prize_link is None
+
+    def check_tokens(self, rooms):
+        store = self.store
+        held, minted = 0, store.minted_completed
+        for room in rooms:
+            if room.winner is None:
+                held += sum(p.bet_amount for p in room.players)
+            elif room.id not in store.completed_ids and room.room_type.value in MINTED_ROOM_TYPES:
+                minted += room.prize_pool
+        balances = sum(u["token_balance"] for u in store.users.values())
+        expected = store.initial_tokens + minted + self.bought_tokens()
+        if balances + held != expected:
+            self.violation("tokens", f"check-{self.checks}",
+                           f"balances {balances} + held {held} = {balances + held}, expected {expected} "
+                           f"(off by {balances + held - expected:+d})")
+
+    def check(self):
+        self.checks += 1
+        store = self.store
+        rooms = list(server.active_rooms.values())
+        active_ids = {room.id for room in rooms}
+        store.completed_ids &= active_ids
+
+        # Between winner pick and prize link the credit is journaled as pending and
+        # may or may not have hit the balance yet; settle the books on a later check
+        if any(self.mid_credit(room) for room in rooms):
+            self.deferred += 1
+        else:
+            self.check_tokens(rooms)
+
+        for address, rows in store.purchases.items():
+            if rows > 1:
+                self.violation("payments", address, f"wallet {address[:8]} credited {rows} times")
+
+        if round_scheduler.failed:
+            self.violation("rounds", f"failed-{round_scheduler.failed}",
+                           f"{round_scheduler.failed} phase transitions raised")
+        suspects = set()
+        for room in rooms:
+            if len(room.players) > room.max_players:
+                self.violation("rounds", f"capacity-{room.id}",
+                               f"{room.room_type.value} room {room.id[:8]} has {len(room.players)}/{room.max_players}")
+            full = len(room.players) >= room.max_players
+            if (room.status != "waiting" or full) and round_scheduler.get_transition(room.id) is None:
+                suspects.add(room.id)
+                if room.id in self._suspect_rooms:
+                    self.violation("rounds", f"stuck-{room.id}",
+                                   f"{room.room_type.value} room {room.id[:8]} stuck in {room.status} "
+                                   f"({len(room.players)}/{room.max_players}) with no pending transition")
+        self._suspect_rooms = suspects
+
+    async def checker(self):
+        while self.running:
+            await clock.sleep(self.args.check_every)
+            self.check()
+
+    async def maintenance(self):
+        """Hourly journal compaction, as a restart would do, so the journal stays bounded"""
+        started = time.perf_counter()
+        while self.running:
+            await clock.sleep(3600)
+            await room_journal.compact(server.active_rooms.values())
+            if not self.args.quiet:
+                print(f"  t={clock.monotonic() / 3600:.0f}h  rounds {self.store.completed_games}  "
+                      f"credited {len(self.store.credited_at)}  wall {time.perf_counter() - started:.1f}s",
+                      file=sys.stderr)
+
+    # ── Run ──────────────────────────────────────────────────────────
+
+    async def run(self) -> Dict:
+        await self.start()
+        loop = asyncio.get_running_loop()
+        virtual_start, wall_start = clock.monotonic(), time.perf_counter()
+        drivers = [asyncio.create_task(self.join_driver(room_type)) for room_type in server.RoomType]
+        drivers += [asyncio.create_task(self.payment_driver()), asyncio.create_task(self.checker()),
+                    asyncio.create_task(self.maintenance())]
+        await clock.sleep(self.args.hours * 3600)
+        self.running = False
+        for task in drivers:
+            task.cancel()
+        await asyncio.gather(*drivers, return_exceptions=True)
+        while any(self.mid_credit(room) for room in server.active_rooms.values()):
+            await clock.sleep(0.05)
+        self.check()
+        virtual = clock.monotonic() - virtual_start
+        wall = time.perf_counter() - wall_start
+        skipped = loop.advanced
+        await self.stop()
+        return self.report(virtual, wall, skipped)
+
+    def report(self, virtual: float, wall: float, skipped: float) -> Dict:
+        store = self.store
+        latencies = sorted(store.credited_at[a] - self.injected[a][1]
+                           for a in store.credited_at if a in self.injected)
+        statuses = Counter(w["status"] for w in store.wallets.values())
+        rpc = self.standin.get_stats()["services"]["rpc"]
+        return {
+            "virtual_s": round(virtual, 1),
+            "wall_s": round(wall, 2),
+            "speedup": round(virtual / wall, 1) if wall else None,
+            "virtual_s_skipped": round(skipped, 1),
+            "rounds": store.completed_games,
+            "rounds_per_wall_s": round(store.completed_games / wall, 1) if wall else None,
+            "rounds_by_type": dict(store.completed_by_type),
+            "joins": dict(self.joins),
+            "join_rejections": dict(self.rejections.most_common()),
+            "phase_transitions": round_scheduler.get_stats(),
+            "payments": {
+                "created": self.purchases_created,
+                "abandoned": self.purchases_abandoned,
+                "paid": len(self.injected),
+                "credited": len(store.credited_at),
+                "wallet_status": dict(statuses.most_common()),
+                "abandoned_deleted": store.abandoned_deleted,
+                "credit_latency_s": {
+                    "p50": round(percentile(latencies, 0.50), 1),
+                    "p90": round(percentile(latencies, 0.90), 1),
+                    "max": round(latencies[-1], 1) if latencies else 0.0,
+                },
+                "rpc_calls": rpc["total_calls"],
+                "rpc_faults_served": sum(rpc["failures"].values()),
+            },
+            "invariant_checks": self.checks,
+            "token_checks_deferred": self.deferred,
+            "violations": self.violations,
+        }
+
+
+def print_report(r: Dict):
+    print(f"\nvirtual {r['virtual_s'] / 3600:.1f}h in {r['wall_s']}s wall  (×{r['speedup']}, "
+          f"{r['virtual_s_skipped'] / 3600:.1f}h skipped while idle)")
+    print(f"rounds {r['rounds']} ({r['rounds_per_wall_s']}/wall-s)  by type {r['rounds_by_type']}")
+    print(f"joins {r['joins']}")
+    print(f"join rejections {r['join_rejections']}")
+    t = r["phase_transitions"]
+    print(f"phase transitions fired {t['fired']}, failed {t['failed']}, lag p99 {t['lag_ms']['p99']}ms (virtual)")
+    p = r["payments"]
+    print(f"payments created {p['created']}, abandoned {p['abandoned']}, paid {p['paid']}, credited {p['credited']}")
+    print(f"  credit latency p50 {p['credit_latency_s']['p50']}s  p90 {p['credit_latency_s']['p90']}s  "
+          f"max {p['credit_latency_s']['max']}s (virtual)")
+    print(f"  wallet status {p['wallet_status']}  (abandoned wallets deleted by cleanup: {p['abandoned_deleted']})")
+    print(f"  RPC calls {p['rpc_calls']}, faults served {p['rpc_faults_served']}")
+    status = "OK" if not r["violations"] else f"{len(r['violations'])} VIOLATIONS"
+    print(f"invariants: {r['invariant_checks']} checks ({r['token_checks_deferred']} token checks deferred "
+          f"by a credit in flight), {status}")
+    for v in r["violations"][:20]:
+        print(f"  ✗ [{v['kind']}] t={v['at_s']}s {v['detail']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=24.0, help="virtual time to simulate")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--balance", type=int, default=5000, help="starting tokens per user")
+    parser.add_argument("--join-rate", type=float, default=1.0, help="joins per virtual second per room type")
+    parser.add_argument("--payments-per-hour", type=float, default=60.0)
+    parser.add_argument("--topup-rate", type=float, default=0.2,
+                        help="chance a player refused for balance opens a purchase")
+    parser.add_argument("--tokens", type=int, default=2000, help="tokens per purchase")
+    parser.add_argument("--pay-delay", type=float, default=60.0, help="mean seconds from purchase to payment")
+    parser.add_argument("--abandon-rate", type=float, default=0.1, help="share of purchases never paid")
+    parser.add_argument("--sol-eur", type=float, default=180.0)
+    parser.add_argument("--rpc-error-rate", type=float, default=0.0, help="share of RPC calls answered 429")
+    parser.add_argument("--rpc-latency-ms", type=float, default=0.0, help="RPC latency (virtual)")
+    parser.add_argument("--check-every", type=float, default=60.0, help="invariant check period (virtual s)")
+    parser.add_argument("--no-background", action="store_true", help="skip the payment scanner and wallet cleanup")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--quiet", action="store_true", help="no hourly progress lines")
+    parser.add_argument("--json", dest="json_out", help="write the report here")
+    args = parser.parse_args()
+
+    # select_winner draws from the module-level random
+    random.seed(args.seed)
+    loop = VirtualTimeLoop()
+    asyncio.set_event_loop(loop)
+    clock.use_loop(loop)
+    try:
+        result = loop.run_until_complete(Simulation(args).run())
+    finally:
+        clock.use_system()
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+        shutil.rmtree(_SIM_DIR, ignore_errors=True)
+
+    print_report(result)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(1 if result["violations"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,14 @@ Handles wallet generation, payment monitoring, SOL forwarding, and live price fe
 import asyncio
 import os
 import logging
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import Optional, Dict, Any
 import json
-import time
 from decimal import Decimal
 import aiohttp
 
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
-from solders.signature import Signature
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
 from solana.rpc.types import TxOpts
@@ -25,6 +23,11 @@ from solders.system_program import TransferParams, transfer
 from solders.hash import Hash
 import db_queries as dbq
 import base58
+from urllib.parse import urlparse
+from tx_deltas import tx_delta_extractor
+from metrics import rpc_latency, rpc_errors, payment_stage
+from clock import clock
+from log_pipeline import AUDIT_LOGGER
 
 # Configuration
 SOLANA_RPC_URL = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
@@ -37,8 +40,32 @@ MAIN_WALLET_ADDRESS = os.environ.get('MAIN_WALLET_ADDRESS', 'EC2cPxi4VbyzGoWMucH
 CASINO_WALLET_PRIVATE_KEY = os.environ.get('CASINO_WALLET_PRIVATE_KEY', '')
 SOL_TO_TOKEN_RATE = int(os.environ.get('SOL_TO_TOKEN_RATE', 100))  # 1 EUR = 100 tokens
 LAMPORTS_PER_SOL = 1_000_000_000  # 1 SOL = 1 billion lamports
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3').rstrip('/')
 
 logger = logging.getLogger(__name__)
+audit_log = logging.getLogger(AUDIT_LOGGER)
+
+
+def _rpc_host(url: str) -> str:
+    """Metric label for an RPC URL — host only, so API keys in path/query never leak"""
+    return urlparse(url).hostname or "unknown"
+
+
+def instrument_rpc_client(client: AsyncClient) -> AsyncClient:
+    """Record latency of every JSON-RPC call made through `client`, by host and method"""
+    provider = client._provider
+    if getattr(provider, "_instrumented", False):
+        return client
+    host = _rpc_host(str(provider.endpoint_uri))
+    make_request = provider.make_request
+
+    async def timed_make_request(body, parser):
+        with rpc_latency.labels(host, type(body).__name__).time():
+            return await make_request(body, parser)
+
+    provider.make_request = timed_make_request
+    provider._instrumented = True
+    return client
 
 
 class RPCManager:
@@ -83,6 +110,7 @@ class RPCManager:
             elif 'connection' in error_msg.lower() or 'timeout' in error_msg.lower():
                 error_type = "connection"
             
+            rpc_errors.labels(_rpc_host(url), error_type).inc()
             rpc_alert_system.report_failure(url, error_code, error_msg, error_type)
         except Exception as e:
             logger.error(f"Failed to report RPC failure to alert system: {e}")
@@ -98,7 +126,7 @@ class RPCManager:
     
     def switch_to_fallback(self):
         """Switch to next fallback RPC endpoint"""
-        current_time = time.time()
+        current_time = clock.time()
         if current_time - self.last_switch_time < self.switch_cooldown:
             return  # Don't switch too frequently
         
@@ -109,7 +137,7 @@ class RPCManager:
     
     def try_reset_to_primary(self):
         """Try to reset to primary RPC after cooldown"""
-        current_time = time.time()
+        current_time = clock.time()
         if self.current_index != -1 and current_time - self.last_switch_time > 300:  # 5 minutes
             logger.info(f"🔄 Attempting to reset to primary RPC")
             self.current_index = -1
@@ -126,12 +154,12 @@ class PriceFetcher:
         """Get current SOL price in EUR from CoinGecko API"""
         try:
             # Check cache first
-            current_time = time.time()
+            current_time = clock.time()
             if self.cached_price and (current_time - self.last_update) < self.cache_duration:
                 return self.cached_price
             
             # Fetch from CoinGecko
-            url = "https://api.coingecko.com/api/v3/simple/price"
+            url = f"{COINGECKO_API_URL}/simple/price"
             params = {
                 "ids": "solana",
                 "vs_currencies": "eur"
@@ -176,7 +204,7 @@ class SolanaPaymentProcessor:
     def __init__(self, db=None):
         # Initialize RPC manager with fallback support
         self.rpc_manager = RPCManager(SOLANA_RPC_URL, SOLANA_RPC_FALLBACKS)
-        self.client = AsyncClient(self.rpc_manager.get_current_url())
+        self.client = instrument_rpc_client(AsyncClient(self.rpc_manager.get_current_url()))
         self.main_wallet = Pubkey.from_string(MAIN_WALLET_ADDRESS)
         self.active_monitors = set()  # Track active payment monitors
         self.price_fetcher = PriceFetcher()  # Initialize price fetcher
@@ -251,8 +279,8 @@ class SolanaPaymentProcessor:
                 "required_lamports": required_lamports,
                 "sol_eur_price_at_creation": sol_eur_price,
                 "status": "pending",
-                "created_at": datetime.now(timezone.utc),
-                "expires_at": datetime.now(timezone.utc).replace(hour=23, minute=59, second=59),  # Expires at end of day
+                "created_at": clock.now(),
+                "expires_at": clock.now().replace(hour=23, minute=59, second=59),  # Expires at end of day
                 "payment_detected": False,
                 "tokens_credited": False,
                 "sol_forwarded": False
@@ -303,7 +331,7 @@ class SolanaPaymentProcessor:
                 try:
                     check_count += 1
                     
-                    logger.info(f"🔍 [{wallet_address[:8]}...] Check #{check_count}/{max_checks}")
+                    logger.debug("🔍 [%s...] Check #%d/%d", wallet_address[:8], check_count, max_checks)
                     
                     # Get recent signatures for this address
                     response = await self.client.get_signatures_for_address(
@@ -312,7 +340,8 @@ class SolanaPaymentProcessor:
                         limit=10
                     )
                     
-                    logger.info(f"📡 [{wallet_address[:8]}...] RPC response: {response.value is not None}, signatures: {len(response.value) if response.value else 0}")
+                    logger.debug("📡 [%s...] RPC response: %s, signatures: %d", wallet_address[:8],
+                                 response.value is not None, len(response.value) if response.value else 0)
                     
                     if response.value:
                         signatures = response.value
@@ -321,7 +350,7 @@ class SolanaPaymentProcessor:
                         for sig_info in signatures:
                             signature = str(sig_info.signature)
                             
-                            logger.info(f"🔔 [{wallet_address[:8]}...] Found signature: {signature[:16]}...")
+                            logger.debug("🔔 [%s...] Found signature: %s...", wallet_address[:8], signature[:16])
                             
                             if signature != last_signature:
                                 logger.info(f"✨ [{wallet_address[:8]}...] NEW transaction detected! Processing...")
@@ -329,9 +358,9 @@ class SolanaPaymentProcessor:
                                 await self.process_detected_payment(wallet_address, signature)
                                 last_signature = signature
                             else:
-                                logger.info(f"⏭️  [{wallet_address[:8]}...] Already processed this signature")
+                                logger.debug("⏭️  [%s...] Already processed this signature", wallet_address[:8])
                     else:
-                        logger.info(f"💤 [{wallet_address[:8]}...] No transactions found yet")
+                        logger.debug("💤 [%s...] No transactions found yet", wallet_address[:8])
                     
                     # Check if wallet has been processed (payment found and handled)
                     wallet_doc = await dbq.get_temporary_wallet(wallet_address)
@@ -341,22 +370,18 @@ class SolanaPaymentProcessor:
                         break
                         
                     # Wait 5 seconds before next check (faster detection)
-                    await asyncio.sleep(5)
+                    await clock.sleep(5)
                     
                 except Exception as e:
-                    import traceback
-                    error_details = traceback.format_exc()
-                    logger.error(f"❌ Error checking wallet {wallet_address}:")
-                    logger.error(f"   Error type: {type(e).__name__}")
-                    logger.error(f"   Error message: {str(e)}")
-                    logger.error(f"   Traceback:\n{error_details}")
-                    await asyncio.sleep(5)
+                    logger.error("❌ Error checking wallet %s: %s: %s", wallet_address, type(e).__name__, e,
+                                 exc_info=True)
+                    await clock.sleep(5)
                     continue
             
             if check_count >= max_checks:
                 logger.warning(f"⏰ Payment monitoring timeout for wallet {wallet_address}")
                 # Mark wallet as expired
-                await dbq.update_temporary_wallet(wallet_address, {"status": "expired", "updated_at": datetime.now(timezone.utc)})
+                await dbq.update_temporary_wallet(wallet_address, {"status": "expired", "updated_at": clock.now()})
                 
         except Exception as e:
             import traceback
@@ -380,44 +405,11 @@ class SolanaPaymentProcessor:
         try:
             logger.info(f"💳 [{wallet_address[:8]}...] Processing payment signature: {signature[:16]}...")
             
-            # Convert string signature to Signature object
-            logger.info(f"🔐 [{wallet_address[:8]}...] Converting signature string to Signature object...")
-            try:
-                sig_obj = Signature.from_string(signature)
-                logger.info(f"✅ [{wallet_address[:8]}...] Signature object created successfully")
-            except Exception as sig_error:
-                logger.error(f"❌ [{wallet_address[:8]}...] Failed to create Signature object: {sig_error}")
-                import traceback
-                logger.error(traceback.format_exc())
-                raise
-            
-            # Get transaction details
-            logger.info(f"🌐 [{wallet_address[:8]}...] Fetching transaction from RPC...")
-            logger.info(f"🌐 [{wallet_address[:8]}...] RPC URL: {self.client._provider.endpoint_uri}")
-            
-            try:
-                transaction = await self.client.get_transaction(
-                    sig_obj, 
-                    commitment=Confirmed,
-                    max_supported_transaction_version=0
-                )
-                logger.info(f"✅ [{wallet_address[:8]}...] RPC call successful")
-            except Exception as rpc_error:
-                logger.error(f"❌ [{wallet_address[:8]}...] RPC call failed: {rpc_error}")
-                import traceback
-                logger.error(traceback.format_exc())
-                raise
-            
-            logger.info(f"📦 [{wallet_address[:8]}...] Raw response type: {type(transaction)}")
-            logger.info(f"📦 [{wallet_address[:8]}...] Response: {str(transaction)[:200]}...")
-            logger.info(f"📦 [{wallet_address[:8]}...] Has value attr: {hasattr(transaction, 'value')}")
-            
-            if hasattr(transaction, 'value'):
-                logger.info(f"📦 [{wallet_address[:8]}...] Value type: {type(transaction.value)}")
-                logger.info(f"📦 [{wallet_address[:8]}...] Value is None: {transaction.value is None}")
-                logger.info(f"📦 [{wallet_address[:8]}...] Value bool: {bool(transaction.value)}")
+            # Fetch (or reuse) the decoded balance deltas for this signature
+            with payment_stage.labels("fetch_tx").time():
+                deltas = await tx_delta_extractor.get_deltas(self.client, signature)
             
-            if not transaction.value:
+            if deltas is None:
                 logger.warning(f"⚠️  [{wallet_address[:8]}...] Transaction not found or not confirmed yet")
                 return
                 
@@ -435,37 +427,7 @@ class SolanaPaymentProcessor:
                 return  # Already processed this wallet
             
             # Calculate received amount
-            tx_data = transaction.value
-            
-            logger.info(f"🔍 [{wallet_address[:8]}...] Parsing transaction data...")
-            
-            # Check if this is an incoming transfer to our wallet
-            wallet_pubkey = Pubkey.from_string(wallet_address)
-            received_lamports = 0
-            
-            # Parse transaction for SOL transfers to our address
-            if tx_data.transaction.meta and tx_data.transaction.meta.post_balances:
-                # Find our wallet in the account keys
-                account_keys = tx_data.transaction.transaction.message.account_keys
-                
-                logger.info(f"🔑 [{wallet_address[:8]}...] Transaction has {len(account_keys)} accounts")
-                
-                for i, account_key in enumerate(account_keys):
-                    if account_key == wallet_pubkey:
-                        # This is our wallet, check balance change
-                        pre_balance = tx_data.transaction.meta.pre_balances[i] if i < len(tx_data.transaction.meta.pre_balances) else 0
-                        post_balance = tx_data.transaction.meta.post_balances[i] if i < len(tx_data.transaction.meta.post_balances) else 0
-                        
-                        logger.info(f"💵 [{wallet_address[:8]}...] Balance change: {pre_balance} → {post_balance} lamports")
-                        
-                        if post_balance > pre_balance:
-                            received_lamports = post_balance - pre_balance
-                            logger.info(f"✅ [{wallet_address[:8]}...] Received {received_lamports} lamports!")
-                            break
-                else:
-                    logger.warning(f"⚠️  [{wallet_address[:8]}...] Wallet not found in transaction accounts")
-            else:
-                logger.warning(f"⚠️  [{wallet_address[:8]}...] No transaction metadata or balance data")
+            received_lamports = deltas.received_lamports(wallet_address)
             
             if received_lamports == 0:
                 logger.warning(f"⚠️  [{wallet_address[:8]}...] No SOL received in this transaction")
@@ -477,14 +439,15 @@ class SolanaPaymentProcessor:
             logger.info(f"💰 [{wallet_address[:8]}...] Payment detected: {received_sol} SOL received (required: {required_sol} SOL)")
             
             # Update wallet record
-            await dbq.update_temporary_wallet(wallet_address, {
-                "payment_detected": True,
-                "received_lamports": received_lamports,
-                "received_sol": float(received_sol),
-                "transaction_signature": signature,
-                "payment_detected_at": datetime.now(timezone.utc),
-                "status": "payment_received"
-            })
+            with payment_stage.labels("record_detection").time():
+                await dbq.update_temporary_wallet(wallet_address, {
+                    "payment_detected": True,
+                    "received_lamports": received_lamports,
+                    "received_sol": float(received_sol),
+                    "transaction_signature": signature,
+                    "payment_detected_at": clock.now(),
+                    "status": "payment_received"
+                })
             
             # Accept any payment above dust threshold — credit proportional tokens
             dust_threshold = Decimal("0.001")  # ignore < 0.001 SOL (network dust)
@@ -493,11 +456,13 @@ class SolanaPaymentProcessor:
                     logger.info(f"✅ [{wallet_address[:8]}...] Full/overpayment: {received_sol} SOL (required {required_sol} SOL) — crediting proportionally")
                 else:
                     logger.warning(f"⚠️  [{wallet_address[:8]}...] Underpayment: {received_sol} SOL < {required_sol} SOL — crediting proportionally, sweeping SOL")
-                await self.credit_tokens_to_user(wallet_doc, received_sol)
+                with payment_stage.labels("credit").time():
+                    await self.credit_tokens_to_user(wallet_doc, received_sol)
 
                 # Wait for account state to settle before sweep
-                await asyncio.sleep(3)
-                await self.forward_sol_to_main_wallet(wallet_address, wallet_doc["private_key"], received_lamports)
+                await clock.sleep(3)
+                with payment_stage.labels("sweep").time():
+                    await self.forward_sol_to_main_wallet(wallet_address, wallet_doc["private_key"], received_lamports)
             else:
                 logger.warning(f"❌ [{wallet_address[:8]}...] Dust payment ignored: {received_sol} SOL (threshold: {dust_threshold} SOL)")
                 await dbq.update_temporary_wallet(wallet_address, {"status": "dust_payment"})
@@ -541,7 +506,8 @@ class SolanaPaymentProcessor:
 
             if result is not None:
                 eur_value = float(received_sol) * sol_eur_price
-                logger.info(f"✅ [Credit] SUCCESS! Credited {actual_tokens} tokens to user {user_id} for {received_sol} SOL (€{eur_value:.2f} at {sol_eur_price} EUR/SOL)")
+                audit_log.info("✅ [Credit] SUCCESS! Credited %s tokens to user %s for %s SOL (€%.2f at %s EUR/SOL), wallet %s",
+                               actual_tokens, user_id, received_sol, eur_value, sol_eur_price, wallet_address)
                 
                 # Mark wallet as tokens credited
                 await dbq.update_temporary_wallet(wallet_doc["wallet_address"], {
@@ -549,7 +515,7 @@ class SolanaPaymentProcessor:
                     "actual_tokens_credited": actual_tokens,
                     "sol_eur_price_at_credit": sol_eur_price,
                     "eur_value": eur_value,
-                    "tokens_credited_at": datetime.now(timezone.utc),
+                    "tokens_credited_at": clock.now(),
                     "status": "tokens_credited"
                 })
 
@@ -562,7 +528,7 @@ class SolanaPaymentProcessor:
                     "sol_eur_price": sol_eur_price,
                     "eur_value": eur_value,
                     "tokens_purchased": actual_tokens,
-                    "purchase_date": datetime.now(timezone.utc),
+                    "purchase_date": clock.now(),
                     "status": "completed"
                 })
                 
@@ -700,7 +666,7 @@ class SolanaPaymentProcessor:
                     # Use last_valid_block_height for proper timeout behavior
                     from solana.rpc.commitment import Confirmed
                     confirmation_response = await self.client.confirm_transaction(
-                        signature, 
+                        response.value,  # Signature — the str form fails solders' argument check
                         commitment=Confirmed,
                         last_valid_block_height=last_valid_block_height
                     )
@@ -717,7 +683,7 @@ class SolanaPaymentProcessor:
                 # Verify post-sweep balance
                 logger.info(f"🔍 [Sweep] Verifying post-sweep balance...")
                 try:
-                    await asyncio.sleep(2)  # Give network time to update
+                    await clock.sleep(2)  # Give network time to update
                     post_balance_response = await self.client.get_balance(temp_keypair.pubkey())
                     post_balance = post_balance_response.value if post_balance_response.value else 0
                     logger.info(f"🔍 [Post-Sweep Balance] {post_balance} lamports remaining")
@@ -745,13 +711,13 @@ class SolanaPaymentProcessor:
                     "sol_forwarded": True,
                     "forward_signature": signature,
                     "forwarded_amount_lamports": transfer_amount,
-                    "forwarded_at": datetime.now(timezone.utc),
+                    "forwarded_at": clock.now(),
                     "status": "completed",
                     "network": "mainnet"
                 })
                 
                 # Clean up wallet data after successful forwarding
-                await asyncio.sleep(60)  # Wait 1 minute before cleanup
+                await clock.sleep(60)  # Wait 1 minute before cleanup
                 await self.cleanup_wallet_data(wallet_address)
                 
                 return signature  # Success!
@@ -764,7 +730,7 @@ class SolanaPaymentProcessor:
                 
                 if attempt < max_retries:
                     logger.info(f"⏳ [Sweep] Retrying in {retry_delay} seconds...")
-                    await asyncio.sleep(retry_delay)
+                    await clock.sleep(retry_delay)
                 else:
                     logger.error(f"❌ [Sweep] All {max_retries} attempts exhausted!")
                     # Mark wallet as failed
@@ -772,7 +738,7 @@ class SolanaPaymentProcessor:
                         await dbq.update_temporary_wallet(wallet_address, {
                             "status": "forward_failed",
                             "forward_error": str(e),
-                            "failed_at": datetime.now(timezone.utc)
+                            "failed_at": clock.now()
                         })
                     except Exception as db_error:
                         logger.error(f"❌ [Sweep] Could not update database: {db_error}")
@@ -804,7 +770,7 @@ class SolanaPaymentProcessor:
                 await dbq.update_temporary_wallet(wallet_address, {
                     "needs_manual_review": True,
                     "review_reason": "cleanup_blocked_unswept_funds",
-                    "flagged_at": datetime.now(timezone.utc)
+                    "flagged_at": clock.now()
                 })
                 return
             
@@ -822,7 +788,7 @@ class SolanaPaymentProcessor:
                     await dbq.update_temporary_wallet(wallet_address, {
                         "needs_manual_review": True,
                         "review_reason": "cleanup_blocked_balance_detected",
-                        "flagged_at": datetime.now(timezone.utc),
+                        "flagged_at": clock.now(),
                         "flagged_balance_lamports": balance_lamports
                     })
                     return
@@ -836,7 +802,7 @@ class SolanaPaymentProcessor:
             # Remove private key and mark as cleaned up
             await dbq.update_temporary_wallet(wallet_address, {
                 "cleaned_up": True,
-                "cleaned_up_at": datetime.now(timezone.utc),
+                "cleaned_up_at": clock.now(),
                 "status": "cleaned_up"
             })
             logger.info(f"🧹 Cleaned up wallet data for {wallet_address}")
@@ -915,7 +881,7 @@ class SolanaPaymentProcessor:
                     
                     # Add delay between checks to avoid rate limits
                     if checked_count > 0:
-                        await asyncio.sleep(0.5)  # 500ms delay between wallet checks
+                        await clock.sleep(0.5)  # 500ms delay between wallet checks
                     
                     checked_count += 1
                     
@@ -936,7 +902,7 @@ class SolanaPaymentProcessor:
                                 if attempt < max_retries - 1:
                                     wait_time = (attempt + 1) * 2  # Exponential backoff: 2s, 4s, 6s
                                     logger.warning(f"⚠️ [Rescan] Rate limit hit, waiting {wait_time}s before retry...")
-                                    await asyncio.sleep(wait_time)
+                                    await clock.sleep(wait_time)
                                     continue
                                 else:
                                     logger.error(f"❌ [Rescan] Rate limit - skipping wallet {wallet_address[:8]}... after {max_retries} attempts")
@@ -949,7 +915,7 @@ class SolanaPaymentProcessor:
                     if balance_sol == 0:
                         continue  # No payment received yet
                     
-                    logger.info(f"💰 [Payment Detected] Wallet: {wallet_address} | Amount: {balance_sol} SOL | User: {user_id} | Time: {datetime.now(timezone.utc).isoformat()}")
+                    logger.info(f"💰 [Payment Detected] Wallet: {wallet_address} | Amount: {balance_sol} SOL | User: {user_id} | Time: {clock.now().isoformat()}")
                     
                     # Accept any payment above dust — credit proportional tokens
                     dust_threshold = Decimal("0.001")
@@ -963,7 +929,7 @@ class SolanaPaymentProcessor:
                         update_result = await dbq.update_temporary_wallet(wallet_address, {
                             "payment_detected": True,
                             "status": "detected_by_rescan",
-                            "detected_at": datetime.now(timezone.utc)
+                            "detected_at": clock.now()
                         })
 
                         if update_result:
@@ -1002,17 +968,13 @@ class SolanaPaymentProcessor:
             
             logger.info(f"🧹 [Scheduled Cleanup] Starting cleanup (grace period: {grace_period_hours}h)...")
             
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=grace_period_hours)
+            cutoff_time = clock.now() - timedelta(hours=grace_period_hours)
             
             # Find completed wallets past grace period that haven't been cleaned up
             all_monitoring_wallets = await dbq.get_all_temporary_wallets_monitoring()
-            # Also fetch completed ones by getting all wallets and filtering in Python
-            # get_all_temporary_wallets_monitoring returns pending/monitoring; for completed
-            # we directly query via a broader call and filter here
-            from database import get_pool as _get_pool
-            async with _get_pool().acquire() as _conn:
-                _rows = await _conn.fetch("SELECT * FROM temporary_wallets WHERE status = 'completed'")
-                _all_completed = [dict(r) for r in _rows]
+            # get_all_temporary_wallets_monitoring returns pending/monitoring; completed
+            # wallets come from their own query and are filtered here
+            _all_completed = await dbq.get_completed_temporary_wallets()
             old_completed_wallets = [
                 w for w in _all_completed
                 if w.get("sol_forwarded")
@@ -1043,7 +1005,7 @@ class SolanaPaymentProcessor:
                         await dbq.update_temporary_wallet(wallet_address, {
                             "needs_manual_review": True,
                             "review_reason": "scheduled_cleanup_blocked_balance",
-                            "flagged_at": datetime.now(timezone.utc),
+                            "flagged_at": clock.now(),
                             "flagged_balance_lamports": balance_lamports
                         })
                         continue
@@ -1051,7 +1013,7 @@ class SolanaPaymentProcessor:
                     # Safe to cleanup
                     await dbq.update_temporary_wallet(wallet_address, {
                         "cleaned_up": True,
-                        "cleaned_up_at": datetime.now(timezone.utc),
+                        "cleaned_up_at": clock.now(),
                         "cleanup_method": "scheduled_grace_period"
                     })
                     
@@ -1063,16 +1025,8 @@ class SolanaPaymentProcessor:
                     continue
             
             # Delete abandoned wallets: pending/expired, older than 24h, never received payment
-            abandoned_cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
-            async with _get_pool().acquire() as _conn:
-                abandoned_result = await _conn.execute(
-                    """DELETE FROM temporary_wallets
-                       WHERE payment_detected = FALSE
-                         AND tokens_credited = FALSE
-                         AND created_at < $1""",
-                    abandoned_cutoff
-                )
-            abandoned_deleted = int(abandoned_result.split()[-1]) if abandoned_result else 0
+            abandoned_cutoff = clock.now() - timedelta(hours=24)
+            abandoned_deleted = await dbq.delete_abandoned_temporary_wallets(abandoned_cutoff)
             logger.info(f"🗑️ [Scheduled Cleanup] Deleted {abandoned_deleted} abandoned wallets (no payment, >24h old)")
 
             flagged_count = await dbq.count_pending_wallets()
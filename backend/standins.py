@@ -0,0 +1,571 @@
+"""
+Local Stand-ins
+Solana JSON-RPC, CoinGecko and the Telegram Bot API on one local port, with
+fault injection, so the payment paths (SolanaPaymentProcessor, PaymentMonitor,
+payment recovery) can be exercised without devnet or mainnet.
+
+    python standins.py --port 8899 --rpc-latency-ms 40
+    SOLANA_RPC_URL=http://127.0.0.1:8899 COINGECKO_API_URL=http://127.0.0.1:8899/api/v3 \\
+        TELEGRAM_API_URL=http://127.0.0.1:8899 uvicorn server:app
+
+RPC over HTTP: getSignaturesForAddress, getTransaction, getBalance,
+getLatestBlockhash, getBlockHeight, getSlot, sendTransaction,
+getSignatureStatuses. Websocket on the same URL: accountSubscribe,
+signatureSubscribe and logsSubscribe (+ unsubscribe). Transactions are real
+signed transfers, so solana-py/solders decode them exactly like chain data;
+sendTransaction applies system transfers to the in-memory ledger.
+
+Control (JSON):
+    POST   /standin/payments          {"address", "lamports"}  -> synthetic incoming payment
+    POST   /standin/faults/{service}  rpc | coingecko | telegram:
+                                      {"latency_ms", "jitter_ms", "rate_limit_rps", "error_rate", "outage_s"}
+    DELETE /standin/faults            clear all faults
+    POST   /standin/price             {"eur"}
+    GET    /standin/stats             calls / failures per service and method
+    POST   /standin/stats/reset
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+import struct
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+import base58
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.system_program import ID as SYSTEM_PROGRAM_ID, TransferParams, transfer
+from solders.transaction import Transaction, VersionedTransaction
+
+from clock import clock
+
+logger = logging.getLogger(__name__)
+
+SERVICES = ("rpc", "coingecko", "telegram")
+FEE_LAMPORTS = 5000
+SLOT_SECONDS = 0.4
+BLOCKHASH_VALID_SLOTS = 150
+SYSTEM_PROGRAM = str(SYSTEM_PROGRAM_ID)
+TRANSFER_TAG = 2  # SystemInstruction::Transfer
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+# ── Faults ───────────────────────────────────────────────────────────
+
+class Faults:
+    """Latency, 429 rate limiting, random errors and outages for one service"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.latency = 0.0
+        self.jitter = 0.0
+        self.rate_limit = 0.0  # requests/second, 0 = unlimited
+        self.error_rate = 0.0  # fraction answered with 429
+        self.outage_until = 0.0
+        self._tokens = 0.0
+        self._refilled = clock.monotonic()
+
+    def configure(self, latency_ms: Optional[float] = None, jitter_ms: Optional[float] = None,
+                  rate_limit_rps: Optional[float] = None, error_rate: Optional[float] = None,
+                  outage_s: Optional[float] = None):
+        if latency_ms is not None:
+            self.latency = max(0.0, latency_ms) / 1000
+        if jitter_ms is not None:
+            self.jitter = max(0.0, jitter_ms) / 1000
+        if rate_limit_rps is not None:
+            self.rate_limit = max(0.0, rate_limit_rps)
+            self._tokens = self.rate_limit
+            self._refilled = clock.monotonic()
+        if error_rate is not None:
+            self.error_rate = min(1.0, max(0.0, error_rate))
+        if outage_s is not None:
+            self.outage_until = clock.monotonic() + outage_s if outage_s > 0 else 0.0
+
+    def _take_token(self) -> bool:
+        now = clock.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def apply(self) -> Optional[int]:
+        """Sleep the configured latency; return the HTTP status to fail with, if any"""
+        if self.outage_until and clock.monotonic() < self.outage_until:
+            return 503
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.rate_limit and not self._take_token():
+            return 429
+        if self.error_rate and random.random() < self.error_rate:
+            return 429
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            "latency_ms": self.latency * 1000,
+            "jitter_ms": self.jitter * 1000,
+            "rate_limit_rps": self.rate_limit,
+            "error_rate": self.error_rate,
+            "outage_remaining_s": round(max(0.0, self.outage_until - clock.monotonic()), 1) if self.outage_until else 0.0,
+        }
+
+
+# ── Ledger ───────────────────────────────────────────────────────────
+
+class Ledger:
+    """Balances and confirmed transactions; the slot advances with wall time"""
+
+    def __init__(self):
+        self.started = clock.monotonic()
+        self.base_slot = 300_000_000
+        self.balances: Dict[str, int] = defaultdict(int)
+        self.transactions: Dict[str, Dict] = {}
+        self.by_address: Dict[str, List[str]] = defaultdict(list)  # oldest first
+        self.listeners = []  # callables(record) run on every committed transaction
+
+    def slot(self) -> int:
+        return self.base_slot + int((clock.monotonic() - self.started) / SLOT_SECONDS)
+
+    def blockhash(self, slot: Optional[int] = None) -> Tuple[Hash, int]:
+        """Blockhash of the current window and the last block height it is valid for"""
+        window = (slot or self.slot()) // BLOCKHASH_VALID_SLOTS
+        digest = hashlib.sha256(f"standin-{window}".encode()).digest()
+        return Hash(digest), (window + 2) * BLOCKHASH_VALID_SLOTS
+
+    def _commit(self, tx, version, keys: List[str], pre: List[int], post: List[int], logs: List[str]) -> str:
+        signature = str(tx.signatures[0])
+        slot = self.slot()
+        for address, before, after in zip(keys, pre, post):
+            if after != before:
+                self.balances[address] = after
+        record = {
+            "signature": signature,
+            "slot": slot,
+            "block_time": int(clock.time()),
+            "version": version,
+            "raw": base64.b64encode(bytes(tx)).decode(),
+            "keys": keys,
+            "pre": pre,
+            "post": post,
+            "logs": logs,
+        }
+        self.transactions[signature] = record
+        for address in dict.fromkeys(keys):
+            self.by_address[address].append(signature)
+        for listener in self.listeners:
+            listener(record)
+        return signature
+
+    def inject_payment(self, address: str, lamports: int) -> str:
+        """A transfer from a fresh funded wallet, as if a user paid from their own wallet"""
+        payer = Keypair()
+        blockhash, _ = self.blockhash()
+        instruction = transfer(TransferParams(from_pubkey=payer.pubkey(), to_pubkey=Pubkey.from_string(address),
+                                              lamports=lamports))
+        tx = Transaction([payer], Message.new_with_blockhash([instruction], payer.pubkey(), blockhash), blockhash)
+        keys = [str(k) for k in tx.message.account_keys]
+        pre = [lamports + FEE_LAMPORTS if k == str(payer.pubkey()) else self.balances[k] for k in keys]
+        post = [0 if k == str(payer.pubkey()) else self.balances[k] + (lamports if k == address else 0) for k in keys]
+        return self._commit(tx, "legacy", keys, pre, post, _transfer_logs(1))
+
+    def apply_raw(self, raw: bytes) -> str:
+        """sendTransaction: apply the system transfers of a signed (legacy or v0) transaction"""
+        try:
+            tx = VersionedTransaction.from_bytes(raw)
+            version = "legacy" if type(tx.message).__name__ == "Message" else 0
+        except Exception:
+            try:
+                tx = Transaction.from_bytes(raw)
+                version = "legacy"
+            except Exception as e:
+                raise RpcError(-32602, f"failed to deserialize transaction: {e}")
+        signature = str(tx.signatures[0])
+        if signature in self.transactions:
+            raise RpcError(-32002, "Transaction simulation failed: This transaction has already been processed")
+        message = tx.message
+        keys = [str(k) for k in message.account_keys]
+        post = [self.balances[k] for k in keys]
+        pre = list(post)
+        post[0] -= FEE_LAMPORTS
+        transfers = 0
+        for ix in message.instructions:
+            if keys[ix.program_id_index] != SYSTEM_PROGRAM:
+                continue
+            data = bytes(ix.data)
+            if len(data) < 12 or struct.unpack_from("<I", data)[0] != TRANSFER_TAG:
+                continue
+            accounts = bytes(ix.accounts)
+            lamports = struct.unpack_from("<Q", data, 4)[0]
+            post[accounts[0]] -= lamports
+            post[accounts[1]] += lamports
+            transfers += 1
+        if any(balance < 0 for balance in post):
+            raise RpcError(-32002, "Transaction simulation failed: Attempt to debit an account but found "
+                                   "no record of a prior credit.")
+        return self._commit(tx, version, keys, pre, post, _transfer_logs(transfers))
+
+    def signatures_for(self, address: str, limit: int = 1000, before: Optional[str] = None,
+                       until: Optional[str] = None) -> List[Dict]:
+        result = []
+        started = before is None
+        for signature in reversed(self.by_address.get(address, [])):
+            if not started:
+                started = signature == before
+                continue
+            if signature == until:
+                break
+            record = self.transactions[signature]
+            result.append({
+                "signature": signature,
+                "slot": record["slot"],
+                "err": None,
+                "memo": None,
+                "blockTime": record["block_time"],
+                "confirmationStatus": "finalized",
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+
+def _transfer_logs(count: int) -> List[str]:
+    return [f"Program {SYSTEM_PROGRAM} invoke [1]", f"Program {SYSTEM_PROGRAM} success"] * count
+
+
+# ── Stand-in server ──────────────────────────────────────────────────
+
+class StandIn:
+    """The three services plus counters; app() builds the ASGI app"""
+
+    def __init__(self, sol_eur: float = 180.0):
+        self.ledger = Ledger()
+        self.ledger.listeners.append(self._notify)
+        self.faults: Dict[str, Faults] = {service: Faults() for service in SERVICES}
+        self.sol_eur = sol_eur
+        self.calls: Dict[str, Dict[str, int]] = {service: defaultdict(int) for service in SERVICES}
+        self.failures: Dict[str, Dict[str, int]] = {service: defaultdict(int) for service in SERVICES}
+        self.telegram_messages: deque = deque(maxlen=200)
+        self.blocked_chats = set()
+        self._subscriptions: Dict[int, Tuple[WebSocket, str, str]] = {}
+        self._next_subscription = 1
+        self._message_id = 0
+
+    # ── Accounting ───────────────────────────────────────────────────
+
+    async def _gate(self, service: str, method: str) -> Optional[int]:
+        self.calls[service][method] += 1
+        status = await self.faults[service].apply()
+        if status is not None:
+            self.failures[service][f"{method}:{status}"] += 1
+        return status
+
+    def reset_stats(self):
+        for service in SERVICES:
+            self.calls[service].clear()
+            self.failures[service].clear()
+
+    def get_stats(self) -> Dict:
+        return {
+            "slot": self.ledger.slot(),
+            "transactions": len(self.ledger.transactions),
+            "subscriptions": len(self._subscriptions),
+            "sol_eur": self.sol_eur,
+            "telegram_messages": len(self.telegram_messages),
+            "services": {
+                service: {
+                    "calls": dict(self.calls[service]),
+                    "total_calls": sum(self.calls[service].values()),
+                    "failures": dict(self.failures[service]),
+                    "faults": self.faults[service].to_dict(),
+                }
+                for service in SERVICES
+            },
+        }
+
+    # ── JSON-RPC ─────────────────────────────────────────────────────
+
+    def _context(self, value) -> Dict:
+        return {"context": {"slot": self.ledger.slot(), "apiVersion": "1.18.0"}, "value": value}
+
+    def _transaction_result(self, record: Dict) -> Dict:
+        return {
+            "slot": record["slot"],
+            "blockTime": record["block_time"],
+            "version": record["version"],
+            "transaction": [record["raw"], "base64"],
+            "meta": {
+                "err": None,
+                "status": {"Ok": None},
+                "fee": FEE_LAMPORTS,
+                "preBalances": record["pre"],
+                "postBalances": record["post"],
+                "innerInstructions": [],
+                "logMessages": record["logs"],
+                "preTokenBalances": [],
+                "postTokenBalances": [],
+                "rewards": [],
+                "loadedAddresses": {"writable": [], "readonly": []},
+                "computeUnitsConsumed": 150,
+            },
+        }
+
+    def rpc(self, method: str, params: List):
+        ledger = self.ledger
+        if method == "getSignaturesForAddress":
+            config = params[1] if len(params) > 1 and params[1] else {}
+            return ledger.signatures_for(params[0], min(config.get("limit") or 1000, 1000),
+                                         config.get("before"), config.get("until"))
+        if method == "getTransaction":
+            record = ledger.transactions.get(params[0])
+            return self._transaction_result(record) if record else None
+        if method == "getBalance":
+            return self._context(ledger.balances.get(params[0], 0))
+        if method == "getLatestBlockhash":
+            blockhash, last_valid = ledger.blockhash()
+            return self._context({"blockhash": str(blockhash), "lastValidBlockHeight": last_valid})
+        if method in ("getBlockHeight", "getSlot"):
+            return ledger.slot()
+        if method == "sendTransaction":
+            config = params[1] if len(params) > 1 and params[1] else {}
+            encoded = params[0]
+            if config.get("encoding", "base58") == "base64":
+                raw = base64.b64decode(encoded)
+            else:
+                raw = base58.b58decode(encoded)
+            return ledger.apply_raw(raw)
+        if method == "getSignatureStatuses":
+            statuses = []
+            for signature in params[0]:
+                record = ledger.transactions.get(signature)
+                statuses.append(None if record is None else {
+                    "slot": record["slot"],
+                    "confirmations": None,
+                    "err": None,
+                    "status": {"Ok": None},
+                    "confirmationStatus": "finalized",
+                })
+            return self._context(statuses)
+        if method == "getHealth":
+            return "ok"
+        raise RpcError(-32601, "Method not found")
+
+    async def _rpc_call(self, call: Dict) -> Optional[Dict]:
+        method = call.get("method", "")
+        try:
+            result = self.rpc(method, call.get("params") or [])
+        except RpcError as e:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": e.code, "message": e.message}}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32602, "message": f"Invalid params: {e}"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    # ── Websocket subscriptions ──────────────────────────────────────
+
+    def _notify(self, record: Dict):
+        if not self._subscriptions:
+            return
+        changed = {k: after for k, before, after in zip(record["keys"], record["pre"], record["post"]) if after != before}
+        for sub_id, (ws, kind, key) in list(self._subscriptions.items()):
+            if kind == "account" and key in changed:
+                value = {"lamports": changed[key], "data": ["", "base64"], "owner": SYSTEM_PROGRAM,
+                         "executable": False, "rentEpoch": 18446744073709551615, "space": 0}
+            elif kind == "signature" and key == record["signature"]:
+                value = {"err": None}
+                self._subscriptions.pop(sub_id, None)  # one-shot, like the real node
+            elif kind == "logs" and (key == "all" or key in record["keys"]):
+                value = {"signature": record["signature"], "err": None, "logs": record["logs"]}
+            else:
+                continue
+            message = {"jsonrpc": "2.0", "method": f"{kind}Notification", "params": {
+                "result": {"context": {"slot": record["slot"]}, "value": value}, "subscription": sub_id}}
+            asyncio.create_task(self._send(ws, message))
+
+    async def _send(self, ws: WebSocket, message: Dict):
+        faults = self.faults["rpc"]
+        if faults.latency or faults.jitter:
+            await asyncio.sleep(max(0.0, faults.latency + random.uniform(-faults.jitter, faults.jitter)))
+        try:
+            await ws.send_text(json.dumps(message))
+        except Exception:
+            pass
+
+    def _subscribe(self, ws: WebSocket, method: str, params: List):
+        if method.endswith("Unsubscribe"):
+            return self._subscriptions.pop(params[0], None) is not None
+        if method == "accountSubscribe":
+            key = params[0]
+        elif method == "signatureSubscribe":
+            key = params[0]
+        elif method == "logsSubscribe":
+            target = params[0]
+            key = target["mentions"][0] if isinstance(target, dict) else "all"
+        else:
+            raise RpcError(-32601, "Method not found")
+        sub_id = self._next_subscription
+        self._next_subscription += 1
+        self._subscriptions[sub_id] = (ws, method[:-len("Subscribe")], key)
+        return sub_id
+
+    async def _websocket(self, ws: WebSocket):
+        await ws.accept()
+        try:
+            while True:
+                call = json.loads(await ws.receive_text())
+                method = call.get("method", "")
+                status = await self._gate("rpc", method)
+                if status is not None:
+                    await ws.send_text(json.dumps({"jsonrpc": "2.0", "id": call.get("id"),
+                                                   "error": {"code": -32005, "message": f"HTTP {status}"}}))
+                    continue
+                try:
+                    result = self._subscribe(ws, method, call.get("params") or [])
+                    response = {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+                except (RpcError, KeyError, IndexError, TypeError) as e:
+                    code = e.code if isinstance(e, RpcError) else -32602
+                    response = {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": code, "message": str(e)}}
+                await ws.send_text(json.dumps(response))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for sub_id, (owner, _, _) in list(self._subscriptions.items()):
+                if owner is ws:
+                    self._subscriptions.pop(sub_id, None)
+
+    # ── App ──────────────────────────────────────────────────────────
+
+    def app(self) -> FastAPI:
+        app = FastAPI(title="payment stand-ins")
+
+        @app.post("/")
+        async def json_rpc(request: Request):
+            body = json.loads(await request.body())
+            calls = body if isinstance(body, list) else [body]
+            responses = []
+            for call in calls:
+                status = await self._gate("rpc", call.get("method", ""))
+                if status is not None:
+                    detail = "Too Many Requests" if status == 429 else "Service Unavailable"
+                    return JSONResponse({"jsonrpc": "2.0", "id": call.get("id"),
+                                         "error": {"code": status, "message": detail}}, status_code=status)
+                responses.append(await self._rpc_call(call))
+            return JSONResponse(responses if isinstance(body, list) else responses[0])
+
+        @app.websocket("/")
+        async def rpc_websocket(ws: WebSocket):
+            await self._websocket(ws)
+
+        @app.get("/api/v3/simple/price")
+        async def simple_price(ids: str = "", vs_currencies: str = ""):
+            status = await self._gate("coingecko", "simple/price")
+            if status is not None:
+                return JSONResponse({"status": {"error_code": status, "error_message": "stand-in fault"}},
+                                    status_code=status)
+            prices = {"eur": self.sol_eur}
+            return {coin: {vs: prices[vs] for vs in vs_currencies.split(",") if vs in prices}
+                    for coin in ids.split(",") if coin == "solana"}
+
+        @app.post("/bot{token}/{method}")
+        async def telegram(token: str, method: str, request: Request):
+            status = await self._gate("telegram", method)
+            if status is not None:
+                return JSONResponse({"ok": False, "error_code": status, "description": "stand-in fault",
+                                     "parameters": {"retry_after": 1}}, status_code=status)
+            payload = await request.json()
+            chat_id = payload.get("chat_id")
+            if chat_id in self.blocked_chats:
+                return JSONResponse({"ok": False, "error_code": 403,
+                                     "description": "Forbidden: bot was blocked by the user"}, status_code=403)
+            self._message_id += 1
+            self.telegram_messages.append({"method": method, "chat_id": chat_id, "text": payload.get("text"),
+                                           "at": clock.time()})
+            return {"ok": True, "result": {"message_id": self._message_id, "chat": {"id": chat_id},
+                                           "date": int(clock.time()), "text": payload.get("text", "")}}
+
+        @app.post("/standin/payments")
+        async def inject_payment(request: Request):
+            body = await request.json()
+            try:
+                Pubkey.from_string(body["address"])
+                lamports = int(body["lamports"])
+            except (KeyError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=f"address and lamports required: {e}")
+            signature = self.ledger.inject_payment(body["address"], lamports)
+            return {"signature": signature, "slot": self.ledger.slot(), "injected_at": clock.time()}
+
+        @app.post("/standin/faults/{service}")
+        async def set_faults(service: str, request: Request):
+            if service not in SERVICES:
+                raise HTTPException(status_code=404, detail=f"service must be one of {SERVICES}")
+            self.faults[service].configure(**await request.json())
+            return self.faults[service].to_dict()
+
+        @app.delete("/standin/faults")
+        async def clear_faults():
+            for faults in self.faults.values():
+                faults.clear()
+            return {"cleared": list(SERVICES)}
+
+        @app.post("/standin/price")
+        async def set_price(request: Request):
+            self.sol_eur = float((await request.json())["eur"])
+            return {"sol_eur": self.sol_eur}
+
+        @app.get("/standin/stats")
+        async def stats():
+            return self.get_stats()
+
+        @app.post("/standin/stats/reset")
+        async def reset():
+            self.reset_stats()
+            return {"reset": True}
+
+        return app
+
+
+def serve(standin: StandIn, host: str = "127.0.0.1", port: int = 8899) -> uvicorn.Server:
+    """uvicorn.Server for embedding in a benchmark's event loop (await server.serve())"""
+    return uvicorn.Server(uvicorn.Config(standin.app(), host=host, port=port, log_level="warning"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--sol-eur", type=float, default=180.0)
+    parser.add_argument("--rpc-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rpc-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rpc-rate-limit", type=float, default=0.0, help="requests/second before 429 (0 = off)")
+    parser.add_argument("--rpc-error-rate", type=float, default=0.0, help="fraction of RPC calls answered 429")
+    args = parser.parse_args()
+
+    standin = StandIn(sol_eur=args.sol_eur)
+    standin.faults["rpc"].configure(latency_ms=args.rpc_latency_ms, jitter_ms=args.rpc_jitter_ms,
+                                    rate_limit_rps=args.rpc_rate_limit, error_rate=args.rpc_error_rate)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logger.info(f"🧪 Stand-ins on http://{args.host}:{args.port} (RPC + ws, /api/v3, /bot<token>, /standin)")
+    asyncio.run(serve(standin, args.host, args.port).serve())
+
+
+if __name__ == "__main__":
+    main()
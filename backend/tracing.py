@@ -0,0 +1,254 @@
+"""
+Tracing
+Lightweight in-process spans for the round lifecycle and join_room.
+
+Spans nest through a context variable, so a span opened in a handler is the
+parent of everything awaited inside it — db_queries calls and Socket.IO
+emits add themselves as children automatically (tracer.child). Finished spans
+go to an in-memory ring (GET /api/admin/traces) and optionally to
+logs/traces.jsonl.
+
+    TRACE_SAMPLE_RATE=0.1      # fraction of traces recorded; 0 disables
+    TRACE_EXPORT=ring | jsonl | both
+    TRACE_RING_SIZE=2000       # finished spans kept in memory
+
+Sampling is decided once per trace. Traces with an explicit id (a round's
+room id) hash to the same decision in every phase, so a sampled round is
+recorded from room_ready to close.
+"""
+
+import functools
+import json
+import logging
+import os
+import random
+import time
+import zlib
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import log_pipeline
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = Path(__file__).parent / "logs" / "traces.jsonl"
+EXPORT_MODES = ("ring", "jsonl", "both")
+
+
+class _NoopSpan:
+    """Returned when the trace is not sampled; every operation is free"""
+    __slots__ = ()
+    sampled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_current_span", default=None)
+
+
+def _new_id(bits: int = 64) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes",
+                 "start", "_start_perf", "status", "error", "_token")
+    sampled = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attributes: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start_perf
+        _current.reset(self._token)
+        if exc_type is not None:
+            status_code = getattr(exc, "status_code", None)
+            if status_code is not None:
+                self.attributes["http.status"] = status_code
+            if status_code is None or status_code >= 500:
+                self.status = "error"
+                self.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self, duration)
+        return False
+
+
+class Tracer:
+    """Creates spans and keeps the finished ones"""
+
+    def __init__(self, sample_rate: Optional[float] = None, export: Optional[str] = None,
+                 ring_size: Optional[int] = None):
+        self.sample_rate = sample_rate if sample_rate is not None else \
+            float(os.environ.get("TRACE_SAMPLE_RATE", "0.1"))
+        export = (export or os.environ.get("TRACE_EXPORT", "ring")).lower()
+        self.export = export if export in EXPORT_MODES else "ring"
+        self.ring: deque = deque(maxlen=ring_size or int(os.environ.get("TRACE_RING_SIZE", "2000")))
+        self._file_logger: Optional[logging.Logger] = None
+        self.traces_started = 0
+        self.traces_sampled = 0
+        self.spans_recorded = 0
+
+    # ── Span creation ────────────────────────────────────────────────
+
+    def _sampled(self, trace_id: Optional[str]) -> bool:
+        if self.sample_rate >= 1:
+            return True
+        if self.sample_rate <= 0:
+            return False
+        if trace_id is not None:
+            return zlib.crc32(trace_id.encode()) / 0xFFFFFFFF < self.sample_rate
+        return random.random() < self.sample_rate
+
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """Child of the current span, or a new (sampled or not) trace when there is none"""
+        parent = _current.get()
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        self.traces_started += 1
+        if not self._sampled(trace_id):
+            return NOOP_SPAN
+        self.traces_sampled += 1
+        return Span(self, name, trace_id or _new_id(128), None, attributes)
+
+    def child(self, name: str, **attributes):
+        """Span only inside a sampled trace — for hot helpers (DB calls, emits)"""
+        parent = _current.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def traced(self, name: str, trace_id: Optional[Callable[..., str]] = None, root: bool = True):
+        """Decorator for coroutines. trace_id(*args) links separate calls into one trace;
+        root=False only records when called inside a sampled trace."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if root:
+                    span = self.span(name, trace_id(*args, **kwargs) if trace_id else None)
+                else:
+                    span = self.child(name)
+                with span:
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **attributes):
+        """Attach attributes to the current span (no-op when not sampled)"""
+        span = _current.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    # ── Export ───────────────────────────────────────────────────────
+
+    def _finish(self, span: Span, duration: float):
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": datetime.fromtimestamp(span.start, timezone.utc).isoformat(timespec="microseconds"),
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": span.attributes,
+            "status": span.status,
+        }
+        if span.error:
+            record["error"] = span.error
+        self.spans_recorded += 1
+        if self.export != "jsonl":
+            self.ring.append(record)
+        if self.export != "ring":
+            if self._file_logger is None:
+                self._file_logger = log_pipeline.file_logger("traces", TRACE_FILE)
+            self._file_logger.info(json.dumps(record, default=str))
+
+    def configure(self, sample_rate: Optional[float] = None, export: Optional[str] = None):
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        if export is not None:
+            if export not in EXPORT_MODES:
+                raise ValueError(f"export must be one of {EXPORT_MODES}")
+            self.export = export
+
+    # ── Query ────────────────────────────────────────────────────────
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per span name: count and duration percentiles over the ring"""
+        durations: Dict[str, List[float]] = {}
+        for record in self.ring:
+            durations.setdefault(record["name"], []).append(record["duration_ms"])
+        summary = {}
+        for name, values in sorted(durations.items()):
+            values.sort()
+            summary[name] = {
+                "count": len(values),
+                "p50_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+                "total_ms": round(sum(values), 3),
+            }
+        return summary
+
+    def traces(self, name: Optional[str] = None, trace_id: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent traces (spans grouped, parents first), optionally only those containing `name`"""
+        grouped: Dict[str, List[Dict]] = {}
+        for record in self.ring:
+            if trace_id is None or record["trace_id"] == trace_id:
+                grouped.setdefault(record["trace_id"], []).append(record)
+        result = []
+        for tid in reversed(list(grouped)):
+            spans = grouped[tid]
+            if name is not None and not any(s["name"] == name for s in spans):
+                continue
+            spans.sort(key=lambda s: s["start"])
+            roots = [s for s in spans if s["parent_id"] is None]
+            result.append({
+                "trace_id": tid,
+                "roots": [r["name"] for r in roots],
+                "duration_ms": round(sum(r["duration_ms"] for r in roots), 3),
+                "spans": spans,
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+    def get_stats(self) -> Dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "export": self.export,
+            "ring_size": self.ring.maxlen,
+            "spans_in_ring": len(self.ring),
+            "traces_started": self.traces_started,
+            "traces_sampled": self.traces_sampled,
+            "spans_recorded": self.spans_recorded,
+        }
+
+
+# Global tracer
+tracer = Tracer()
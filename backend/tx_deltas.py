@@ -0,0 +1,148 @@
+"""
+Transaction Balance-Delta Extraction
+Fetches each transaction once in compact base64 encoding, computes per-address
+lamport deltas and memoizes the result by signature so every payment path
+(processor, derived-address monitor, startup recovery) shares one fetch/decode.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+from solders.signature import Signature
+from solana.rpc.commitment import Confirmed
+
+logger = logging.getLogger(__name__)
+
+
+class TxBalanceDeltas:
+    """Decoded balance changes of a single confirmed transaction"""
+
+    __slots__ = ("signature", "deltas", "failed", "block_time")
+
+    def __init__(self, signature: str, deltas: Dict[str, int], failed: bool, block_time: Optional[int]):
+        self.signature = signature
+        self.deltas = deltas  # address -> (post - pre) lamports
+        self.failed = failed
+        self.block_time = block_time
+
+    def received_lamports(self, address: str) -> int:
+        """Lamports credited to address by this transaction (0 if none or failed)"""
+        if self.failed:
+            return 0
+        return max(0, self.deltas.get(address, 0))
+
+
+class TransactionDeltaExtractor:
+    """Bounded, signature-keyed cache in front of getTransaction"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, TxBalanceDeltas]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_deltas(self, client, signature: Union[str, Signature]) -> Optional[TxBalanceDeltas]:
+        """
+        Return balance deltas for a transaction, fetching it at most once
+
+        Args:
+            client: solana AsyncClient to fetch with on a cache miss
+            signature: Transaction signature (string or Signature)
+
+        Returns:
+            TxBalanceDeltas, or None if the transaction is not confirmed yet
+        """
+        key = str(signature)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        # Concurrent callers for the same signature share one RPC request
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._fetch(client, key, signature)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure with no waiters is not reported as unhandled
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _fetch(self, client, key: str, signature: Union[str, Signature]) -> Optional[TxBalanceDeltas]:
+        sig_obj = signature if isinstance(signature, Signature) else Signature.from_string(key)
+        response = await client.get_transaction(
+            sig_obj,
+            encoding="base64",
+            commitment=Confirmed,
+            max_supported_transaction_version=0
+        )
+        if not response.value:
+            # Not confirmed yet — don't cache, a later poll must refetch
+            return None
+
+        result = self.decode(key, response.value)
+        self._store(key, result)
+        logger.debug("Decoded tx %s: %d balance changes", key[:16], len(result.deltas))
+        return result
+
+    @staticmethod
+    def decode(signature: str, tx_value) -> TxBalanceDeltas:
+        """Compute per-address lamport deltas from a getTransaction result"""
+        meta = tx_value.transaction.meta
+        if not meta:
+            return TxBalanceDeltas(signature, {}, False, tx_value.block_time)
+
+        keys = [str(k) for k in tx_value.transaction.transaction.message.account_keys]
+        # v0 transactions append lookup-table accounts after the static keys
+        loaded = meta.loaded_addresses
+        if loaded:
+            keys.extend(str(k) for k in loaded.writable)
+            keys.extend(str(k) for k in loaded.readonly)
+
+        pre_balances = meta.pre_balances
+        post_balances = meta.post_balances
+        deltas = {}
+        for i, address in enumerate(keys):
+            if i >= len(pre_balances) or i >= len(post_balances):
+                break
+            change = post_balances[i] - pre_balances[i]
+            if change:
+                deltas[address] = deltas.get(address, 0) + change
+
+        return TxBalanceDeltas(signature, deltas, meta.err is not None, tx_value.block_time)
+
+    def _store(self, key: str, result: TxBalanceDeltas):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global extractor shared by all payment paths
+tx_delta_extractor = TransactionDeltaExtractor()
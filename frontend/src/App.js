@@ -16,6 +16,20 @@ import './App.css';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Signed session token issued by /auth/telegram: sent as a Bearer header on every
+// request and with register_user, so the backend can skip user lookups
+let sessionToken = null;
+const setSessionToken = (token) => {
+  sessionToken = token || null;
+  if (sessionToken) {
+    localStorage.setItem('casino_session_token', sessionToken);
+    axios.defaults.headers.common['Authorization'] = `Bearer ${sessionToken}`;
+  } else {
+    localStorage.removeItem('casino_session_token');
+    delete axios.defaults.headers.common['Authorization'];
+  }
+};
+
 // App version for cache busting - WITH SERVICE WORKER v9.1
 const APP_VERSION = '9.1-WORK-FOR-CASINO-20250116120000';
 
@@ -27,7 +41,7 @@ if (storedVersion !== APP_VERSION) {
   localStorage.setItem('app_version', APP_VERSION);
   
   // Clear other cached data (but keep important user data)
-  const keysToKeep = ['casino_last_eur_amount', 'casino_last_sol_eur_price', 'app_version', 'casino_user'];
+  const keysToKeep = ['casino_last_eur_amount', 'casino_last_sol_eur_price', 'app_version', 'casino_user', 'casino_session_token'];
   const allKeys = Object.keys(localStorage);
   
   allKeys.forEach(key => {
@@ -37,6 +51,25 @@ if (storedVersion !== APP_VERSION) {
   });
 }
 
+setSessionToken(localStorage.getItem('casino_session_token'));
+
+// Expired session token: exchange it once at /auth/refresh and replay the request
+axios.interceptors.response.use(null, async (error) => {
+  const original = error.config;
+  if (error.response?.status === 401 && error.response?.data?.detail === 'session_expired' && sessionToken && original && !original._sessionRetried) {
+    original._sessionRetried = true;
+    try {
+      const res = await axios.post(`${API}/auth/refresh`);
+      setSessionToken(res.data.session_token);
+      original.headers['Authorization'] = `Bearer ${res.data.session_token}`;
+      return axios(original);
+    } catch (refreshError) {
+      setSessionToken(null);
+    }
+  }
+  return Promise.reject(error);
+});
+
 // Prize links configuration
 const PRIZE_LINKS = {
   bronze: "https://your-prize-link-1.com",
@@ -89,6 +122,22 @@ const ROOM_CONFIGS = {
   },
 };
 
+// Merge server chat messages (with ids) into the lobby list: de-duplicate by id
+// and replace our own optimistic (pending) copies once the server echoes them
+const mergeChatMessages = (prev, incoming) => {
+  const seen = new Set(prev.filter(m => m.id).map(m => m.id));
+  let merged = prev;
+  incoming.forEach(msg => {
+    if (msg.id && seen.has(msg.id)) return;
+    seen.add(msg.id);
+    const pendingIdx = merged.findIndex(m => m.pending && String(m.user_id) === String(msg.user_id) && m.text === msg.text);
+    merged = pendingIdx >= 0
+      ? [...merged.slice(0, pendingIdx), ...merged.slice(pendingIdx + 1), msg]
+      : [...merged, msg];
+  });
+  return merged.slice(-50);
+};
+
 // Countdown Timer Component
 function CountdownTimer({ onComplete }) {
   const [count, setCount] = React.useState(3);
@@ -844,6 +893,7 @@ function App() {
   const blockWinnerScreenRef = React.useRef(false); // Block winner screen after redirect_home
   const [forceHideLobby, setForceHideLobby] = useState(false); // Force hide lobby after redirect
   const currentGameRoomRef = React.useRef(null); // Track current game room for socket reconnects
+  const lobbySeqRef = React.useRef(null); // Last applied rooms_delta seq ('pending' = snapshot requested)
   const lobbyDataRef = React.useRef(null); // Ref so socket listeners read current lobbyData without stale closure
 
   useEffect(() => {
@@ -1073,15 +1123,19 @@ function App() {
     }
   }, [roomParticipants, inLobby, lobbyData])
 
-  // Poll lobby chat history when in lobby (fallback for missed socket events)
+  // Poll lobby chat incrementally when in lobby (fallback for missed socket events)
   useEffect(() => {
     if (!inLobby || !lobbyData?.room_id) return;
+    let lastChatId = 0;
     const fetchChat = async () => {
       try {
-        const res = await axios.get(`${API}/room-chat/${lobbyData.room_id}`);
-        const msgs = res.data.messages || [];
-        // Always sync with server state (source of truth)
-        setLobbyMessages(msgs.slice(-50));
+        const res = await axios.get(`${API}/room-chat/${lobbyData.room_id}`, {
+          params: lastChatId ? { after: lastChatId } : {},
+          validateStatus: (status) => status === 200 || status === 304,
+        });
+        if (res.status === 304) return;  // nothing new since lastChatId
+        lastChatId = res.data.last_id || lastChatId;
+        setLobbyMessages(prev => mergeChatMessages(prev, res.data.messages || []));
       } catch (_) {}
     };
     fetchChat();
@@ -1136,6 +1190,9 @@ function App() {
       console.log('Transport:', newSocket.io.engine.transport.name);
       
       setIsConnected(true);
+      // Full lobby state; rooms_delta events are applied on top of it
+      lobbySeqRef.current = 'pending';
+      newSocket.emit('lobby_resync');
       // Don't show "Connected" toast - it confuses users before authentication
       // Only authentication success/failure will show toasts
       
@@ -1145,6 +1202,7 @@ function App() {
         console.log('📝 Registering user to socket:', storedUser.id, platform);
         newSocket.emit('register_user', {
           user_id: storedUser.id,
+          token: sessionToken,
           platform: platform
         });
 
@@ -1164,6 +1222,20 @@ function App() {
       }
     });
     
+    newSocket.on('session_invalid', async () => {
+      // Token rejected by register_user — refresh it (or drop it) and register again
+      const storedUser = JSON.parse(localStorage.getItem('casino_user_session') || '{}');
+      try {
+        const res = await axios.post(`${API}/auth/refresh`);
+        setSessionToken(res.data.session_token);
+      } catch (e) {
+        setSessionToken(null);
+      }
+      if (storedUser && storedUser.id) {
+        newSocket.emit('register_user', { user_id: storedUser.id, token: sessionToken, platform: platform });
+      }
+    });
+
     newSocket.on('connect_error', (error) => {
       console.error('❌❌❌ WebSocket connection error:', error);
       setIsConnected(false);
@@ -1203,6 +1275,7 @@ function App() {
         console.log('📝 Re-registering user after reconnection:', storedUser.id);
         newSocket.emit('register_user', {
           user_id: storedUser.id,
+          token: sessionToken,
           platform: platform
         });
 
@@ -1485,18 +1558,34 @@ function App() {
       loadRooms();
     });
 
-    newSocket.on('rooms_updated', (data) => {
-      console.log('📥 EVENT: rooms_updated');
-      // DON'T reload if GET READY is showing - prevents state reset
-      if (!showGetReadyRef.current) {
-        console.log('✅ Updating room list from socket data');
-        if (data && data.rooms) {
-          setRooms(data.rooms);
-          if (data.maintenance_mode !== undefined) setMaintenanceMode(data.maintenance_mode);
-        }
-      } else {
-        console.log('⏭️ Skipping rooms reload - GET READY animation in progress');
+    newSocket.on('rooms_snapshot', (data) => {
+      lobbySeqRef.current = data.seq;
+      setRooms(data.rooms || []);
+      if (data.maintenance_mode !== undefined) setMaintenanceMode(data.maintenance_mode);
+    });
+
+    newSocket.on('rooms_delta', (data) => {
+      // DON'T touch rooms while GET READY is showing - prevents state reset; resync afterwards
+      if (showGetReadyRef.current) {
+        lobbySeqRef.current = -1;
+        return;
+      }
+      if (lobbySeqRef.current === 'pending') return; // snapshot on its way
+      if (lobbySeqRef.current !== null && data.seq <= lobbySeqRef.current) return; // already in snapshot
+      // Missed a delta (or never had a snapshot) - ask for full state instead of applying out of order
+      if (lobbySeqRef.current === null || data.seq !== lobbySeqRef.current + 1) {
+        lobbySeqRef.current = 'pending';
+        newSocket.emit('lobby_resync');
+        return;
       }
+      lobbySeqRef.current = data.seq;
+      setRooms(prev => {
+        const removed = new Set(data.removed || []);
+        const byId = new Map(prev.filter(r => !removed.has(r.id)).map(r => [r.id, r]));
+        (data.changed || []).forEach(r => byId.set(r.id, { ...(byId.get(r.id) || {}), ...r }));
+        return Array.from(byId.values());
+      });
+      if (data.maintenance_mode !== undefined) setMaintenanceMode(data.maintenance_mode);
     });
 
     // NEW EVENT: redirect_home - Backend signals all players to return to home
@@ -1591,14 +1680,22 @@ function App() {
       loadRooms();
     });
 
-    newSocket.on('reaction_received', (data) => {
+    newSocket.on('reactions_batch', (data) => {
       // Only show if we're in the same room
       const activeRoom = sessionStorage.getItem('active_game_room');
       if (data.room_id && activeRoom && data.room_id !== activeRoom) return;
-      const id = Date.now() + Math.random();
-      const x = 15 + Math.random() * 70;
-      setFloatingReactions(prev => [...prev, { id, emoji: data.emoji, name: data.name, x }]);
-      setTimeout(() => setFloatingReactions(prev => prev.filter(r => r.id !== id)), 2500);
+      // One frame per interval: {emoji, count, names} — float at most 3 of each emoji
+      const floats = [];
+      (data.reactions || []).forEach(r => {
+        for (let i = 0; i < Math.min(r.count, 3); i++) {
+          const name = r.names[i % r.names.length] + (i === 0 && r.count > 1 ? ` ×${r.count}` : '');
+          floats.push({ id: Date.now() + Math.random(), emoji: r.emoji, name, x: 15 + Math.random() * 70 });
+        }
+      });
+      if (floats.length === 0) return;
+      const ids = new Set(floats.map(f => f.id));
+      setFloatingReactions(prev => [...prev, ...floats]);
+      setTimeout(() => setFloatingReactions(prev => prev.filter(r => !ids.has(r.id))), 2500);
     });
 
     newSocket.on('lobby_message', (data) => {
@@ -1608,7 +1705,7 @@ function App() {
       // Only show messages for the current room
       const currentRoomId = lobbyDataRef.current?.room_id;
       if (currentRoomId && data.room_id && String(data.room_id) !== String(currentRoomId)) return;
-      setLobbyMessages(prev => [...prev, data].slice(-50));
+      setLobbyMessages(prev => mergeChatMessages(prev, [data]));
     });
 
     newSocket.on('admin_broadcast', (data) => {
@@ -1833,6 +1930,7 @@ function App() {
           console.log('✅ Telegram authentication successful:', response.data);
 
           cancelFallbackTimeout();
+          setSessionToken(response.data.session_token);
           setUser(response.data);
           saveUserSession(response.data);
           setIsLoading(false);
@@ -1983,6 +2081,7 @@ function App() {
           const response = await axios.post(`${API}/auth/telegram`, fallbackUserCreate);
           if (response.data) {
             cancelFallbackTimeout();
+            setSessionToken(response.data.session_token);
             setUser(response.data);
             saveUserSession(response.data);
             cancelAuthTimeout();
@@ -3502,13 +3601,15 @@ function App() {
                           e.preventDefault();
                           const text = lobbyChatInput.trim();
                           if (!text || !lobbyData?.room_id) return;
-                          const msg = { user_id: String(user?.id), name: user?.first_name || 'Player', text, ts: new Date().toISOString() };
+                          // Same client_id on both sends, so the server merges only this message's duplicate
+                          const clientId = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
+                          const msg = { user_id: String(user?.id), name: user?.first_name || 'Player', text, ts: new Date().toISOString(), pending: true };
                           // Optimistic: show immediately
                           setLobbyMessages(prev => [...prev, msg].slice(-50));
                           setLobbyChatInput('');
                           // REST POST is primary (guaranteed delivery); socket is bonus for instant push
-                          axios.post(`${API}/room-chat/${lobbyData.room_id}?user_id=${encodeURIComponent(String(user?.id))}&name=${encodeURIComponent(user?.first_name || 'Player')}&text=${encodeURIComponent(text)}`).catch(() => {});
-                          if (socket?.connected) socket.emit('lobby_message', { room_id: lobbyData.room_id, is_anonymous: false, ...msg });
+                          axios.post(`${API}/room-chat/${lobbyData.room_id}?user_id=${encodeURIComponent(String(user?.id))}&name=${encodeURIComponent(user?.first_name || 'Player')}&text=${encodeURIComponent(text)}&client_id=${clientId}`).catch(() => {});
+                          if (socket?.connected) socket.emit('lobby_message', { room_id: lobbyData.room_id, is_anonymous: false, user_id: msg.user_id, name: msg.name, text: msg.text, ts: msg.ts, client_id: clientId });
                         }} style={{ display: 'flex', gap: 6 }}>
                           <input
                             value={lobbyChatInput}
@@ -3615,7 +3716,7 @@ function App() {
 
                 <div className={`grid gap-3 w-full ${isMobile ? 'grid-cols-1 px-1' : 'lg:grid-cols-3 md:grid-cols-2 grid-cols-1 max-w-7xl mx-auto'}`}>
                   {['freeroll', 'bronze', 'silver', 'gold'].map((roomType) => {
-                    const room = rooms.find(r => r.room_type === roomType) || { players_count: 0 };
+                    const room = rooms.find(r => r.room_type === roomType && r.status === 'waiting') || rooms.find(r => r.room_type === roomType) || { players_count: 0 };
                     const config = ROOM_CONFIGS[roomType];
                     const isFreeroll = roomType === 'freeroll' || roomType === 'free';
                     const maxPlayers = room.max_players || config.maxPlayers || 3;
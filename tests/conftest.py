@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other flat (server.py runs from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+
+class FakeConnection:
+    """Stands in for an asyncpg connection; queries go to the test's handlers"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def fetchrow(self, query, *args):
+        self.pool.calls.append(("fetchrow", query, args))
+        return await self.pool.fetchrow(query, *args)
+
+    async def execute(self, query, *args):
+        self.pool.calls.append(("execute", query, args))
+        return await self.pool.execute(query, *args)
+
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+        self.fetchrow = self._unset
+        self.execute = self._unset
+
+    @staticmethod
+    async def _unset(query, *args):
+        raise AssertionError(f"unexpected query: {query}")
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return FakeConnection(pool)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    """db_queries.get_pool() returning a FakePool (set .fetchrow / .execute)"""
+    import db_queries as dbq
+
+    pool = FakePool()
+    monkeypatch.setattr(dbq, "get_pool", lambda: pool)
+    return pool
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+import event_throttle
+import server
+from event_throttle import DuplicateFilter, ReactionBatcher, ThrottleStats, TokenBucketLimiter, chat_dedupe_key
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(event_throttle, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    sent = []
+
+    async def emit(event, data=None, **kwargs):
+        sent.append((event, data))
+
+    monkeypatch.setattr(server.sio, "emit", emit)
+    return sent
+
+
+def test_chat_repeats_are_kept_but_resubmits_merged(emitted):
+    async def scenario():
+        first = await server.post_room_chat("dedupe-room", user_id="u1", text="gg", client_id="m1")
+        again = await server.post_room_chat("dedupe-room", user_id="u1", text="gg", client_id="m1")
+        repeat = await server.post_room_chat("dedupe-room", user_id="u1", text="gg", client_id="m2")
+        return first, again, repeat
+
+    first, again, repeat = asyncio.run(scenario())
+    assert again == {"ok": True, "duplicate": True, "message": first["message"]}
+    assert "duplicate" not in repeat
+    assert repeat["message"]["id"] != first["message"]["id"]
+    assert [data["text"] for event, data in emitted if event == "lobby_message"] == ["gg", "gg"]
+
+
+def test_chat_dedupe_key_falls_back_to_text():
+    assert chat_dedupe_key("r", "u", "", "hi") == chat_dedupe_key("r", "u", "", "hi")
+    assert chat_dedupe_key("r", "u", "a", "hi") != chat_dedupe_key("r", "u", "b", "hi")
+
+
+def test_token_bucket_burst_then_refill(fake_time):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.allow("b")  # buckets are per key
+
+    fake_time.now += 0.5  # one token back at 2/s
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+
+    fake_time.now += 60  # refill is capped at the burst
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_sweeps_idle_keys(fake_time):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, idle_ttl=10)
+    limiter.allow("idle")
+    fake_time.now += 11
+    limiter.allow("active")
+    assert set(limiter._buckets) == {"active"}
+
+
+def test_duplicate_filter_window(fake_time):
+    seen = DuplicateFilter(window=3.0, max_entries=2)
+    seen.remember(("r", "u", "id", "m1"), "first")
+    fake_time.now += 2.9
+    assert seen.lookup(("r", "u", "id", "m1")) == "first"
+    fake_time.now += 0.2
+    assert seen.lookup(("r", "u", "id", "m1")) is None
+
+    for key in ("k1", "k2", "k3"):
+        seen.remember((key,), key)
+    assert seen.lookup(("k1",)) is None  # bounded: oldest evicted
+    assert seen.lookup(("k3",)) == "k3"
+
+
+def test_reaction_batcher_merges_per_room_and_flushes_once():
+    stats = ThrottleStats()
+    batcher = ReactionBatcher(stats, interval=0.02)
+    frames = []
+
+    async def emit(event, data):
+        frames.append((event, data))
+
+    batcher.configure(emit)
+
+    async def scenario():
+        for name in ("a", "b", "c", "d", "a"):
+            batcher.add("r1", "🔥", name)
+        batcher.add("r1", "😂", "a")
+        batcher.add("r2", "🔥", "z")
+        await asyncio.sleep(0.06)
+
+    asyncio.run(scenario())
+    assert [event for event, _ in frames] == ["reactions_batch", "reactions_batch"]
+    by_room = {data["room_id"]: data["reactions"] for _, data in frames}
+    assert by_room["r1"] == [
+        {"emoji": "🔥", "count": 5, "names": ["a", "b", "c"]},
+        {"emoji": "😂", "count": 1, "names": ["a"]},
+    ]
+    assert by_room["r2"] == [{"emoji": "🔥", "count": 1, "names": ["z"]}]
+    assert stats.snapshot()["reaction"]["merged"] == 4
+    assert stats.snapshot()["reaction"]["emitted"] == 2
@@ -0,0 +1,90 @@
+import asyncio
+
+from lobby_broadcaster import LobbyBroadcaster
+
+
+class Lobby:
+    """Room summaries + emits captured in place of server.lobby_snapshot / sio.emit"""
+
+    def __init__(self):
+        self.rooms = {}
+        self.meta = {"maintenance_mode": False}
+        self.emits = []
+
+    def snapshot(self):
+        return {room_id: dict(summary) for room_id, summary in self.rooms.items()}, dict(self.meta)
+
+    async def emit(self, event, data):
+        self.emits.append((event, data))
+
+
+def _broadcaster(lobby, tick=0.05):
+    broadcaster = LobbyBroadcaster(tick=tick)
+    broadcaster.configure(lobby.emit, lobby.snapshot)
+    return broadcaster
+
+
+def test_flush_sends_only_changed_and_removed_rooms():
+    lobby = Lobby()
+    broadcaster = _broadcaster(lobby)
+
+    async def scenario():
+        lobby.rooms = {"r1": {"id": "r1", "players_count": 0}, "r2": {"id": "r2", "players_count": 1}}
+        await broadcaster.flush()
+        lobby.rooms["r1"] = {"id": "r1", "players_count": 1}
+        del lobby.rooms["r2"]
+        await broadcaster.flush()
+        await broadcaster.flush()  # nothing changed — no emit
+        lobby.meta["maintenance_mode"] = True
+        await broadcaster.flush()
+
+    asyncio.run(scenario())
+    events = [data for event, data in lobby.emits if event == "rooms_delta"]
+    assert [data["seq"] for data in events] == [1, 2, 3]
+    assert [room["id"] for room in events[0]["changed"]] == ["r1", "r2"]
+    assert events[1]["changed"] == [{"id": "r1", "players_count": 1}]
+    assert events[1]["removed"] == ["r2"]
+    assert events[2]["changed"] == [] and events[2]["maintenance_mode"] is True
+
+
+def test_mark_dirty_coalesces_into_one_emit_per_tick():
+    lobby = Lobby()
+    broadcaster = _broadcaster(lobby)
+
+    async def scenario():
+        for i in range(50):
+            lobby.rooms[f"r{i}"] = {"id": f"r{i}"}
+            broadcaster.mark_dirty()
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.15)
+
+    asyncio.run(scenario())
+    seqs = [data["seq"] for event, data in lobby.emits]
+    # Leading edge plus one emit per elapsed tick, never one per request
+    assert 2 <= len(seqs) <= 8
+    assert seqs == list(range(1, len(seqs) + 1))
+    assert sum(len(data["changed"]) for _, data in lobby.emits) == 50
+    stats = broadcaster.get_stats()
+    assert stats["update_requests"] == 50
+    assert stats["coalesced"] == 50 - len(seqs)
+
+
+def test_snapshot_payload_carries_current_seq():
+    lobby = Lobby()
+    broadcaster = _broadcaster(lobby)
+
+    async def scenario():
+        lobby.rooms = {"r1": {"id": "r1"}}
+        await broadcaster.flush()
+        lobby.rooms["r2"] = {"id": "r2"}
+        # A resync between flushes returns the live rooms under the last emitted seq;
+        # the next delta (seq 2) still includes r2
+        snapshot = broadcaster.snapshot_payload()
+        await broadcaster.flush()
+        return snapshot
+
+    snapshot = asyncio.run(scenario())
+    assert snapshot["seq"] == 1
+    assert [room["id"] for room in snapshot["rooms"]] == ["r1", "r2"]
+    assert lobby.emits[-1][1]["seq"] == 2
+    assert lobby.emits[-1][1]["changed"] == [{"id": "r2"}]
@@ -0,0 +1,135 @@
+import asyncio
+
+from response_cache import ResponseCache, ResponseCacheMiddleware
+
+
+class App:
+    """ASGI app counting calls; `status` and `gate` control the next responses"""
+
+    def __init__(self):
+        self.calls = 0
+        self.status = 200
+        self.gate = None
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        call, status = self.calls, self.status
+        if self.gate is not None:
+            await self.gate.wait()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"call": %d}' % call})
+
+
+async def get(middleware, path, etag=None):
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": b"",
+             "headers": [(b"if-none-match", etag)] if etag else []}
+    response = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+        else:
+            response["body"] = message.get("body", b"")
+
+    async def receive():
+        return {"type": "http.request"}
+
+    await middleware(scope, receive, send)
+    return response
+
+
+def _setup():
+    cache = ResponseCache()
+    cache.add_rule("/api/room/{room_id}", ttl=60, tags=("rooms",))
+    app = App()
+    return cache, app, ResponseCacheMiddleware(app, cache)
+
+
+def test_hit_etag_and_304():
+    cache, app, middleware = _setup()
+
+    async def scenario():
+        first = await get(middleware, "/api/room/r1")
+        second = await get(middleware, "/api/room/r1")
+        not_modified = await get(middleware, "/api/room/r1", etag=first["headers"][b"etag"])
+        other = await get(middleware, "/api/room/r2")
+        uncached = await get(middleware, "/api/rooms")
+        return first, second, not_modified, other, uncached
+
+    first, second, not_modified, other, uncached = asyncio.run(scenario())
+    assert second["body"] == first["body"] == b'{"call": 1}'
+    assert second["headers"][b"etag"] == first["headers"][b"etag"]
+    assert not_modified["status"] == 304 and not_modified["body"] == b""
+    assert other["body"] == b'{"call": 2}'
+    assert b"etag" not in uncached["headers"]
+    assert app.calls == 3
+    assert (cache.hits, cache.misses, cache.not_modified) == (2, 2, 1)
+
+
+def test_bump_invalidates_tagged_entries():
+    cache, app, middleware = _setup()
+
+    async def scenario():
+        await get(middleware, "/api/room/r1")
+        cache.bump("history")  # unrelated tag
+        unchanged = await get(middleware, "/api/room/r1")
+        cache.bump("rooms")
+        refreshed = await get(middleware, "/api/room/r1")
+        return unchanged, refreshed
+
+    unchanged, refreshed = asyncio.run(scenario())
+    assert unchanged["body"] == b'{"call": 1}'
+    assert refreshed["body"] == b'{"call": 2}'
+
+
+def test_bump_during_compute_is_not_cached():
+    cache, app, middleware = _setup()
+
+    async def scenario():
+        app.gate = asyncio.Event()
+        request = asyncio.create_task(get(middleware, "/api/room/r1"))
+        await asyncio.sleep(0)
+        cache.bump("rooms")
+        app.gate.set()
+        await request
+        app.gate = None
+        return await get(middleware, "/api/room/r1")
+
+    assert asyncio.run(scenario())["body"] == b'{"call": 2}'
+
+
+def test_single_flight_shares_success():
+    cache, app, middleware = _setup()
+
+    async def scenario():
+        app.gate = asyncio.Event()
+        requests = [asyncio.create_task(get(middleware, "/api/room/r1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        app.gate.set()
+        return await asyncio.gather(*requests)
+
+    responses = asyncio.run(scenario())
+    assert app.calls == 1
+    assert cache.coalesced == 4
+    assert {r["body"] for r in responses} == {b'{"call": 1}'}
+
+
+def test_single_flight_does_not_share_errors():
+    cache, app, middleware = _setup()
+
+    async def scenario():
+        app.gate = asyncio.Event()
+        app.status = 404
+        requests = [asyncio.create_task(get(middleware, "/api/room/r1")) for _ in range(3)]
+        await asyncio.sleep(0)
+        # The leader fails; the waiters recompute and now get a good answer
+        app.status = 200
+        app.gate.set()
+        return await asyncio.gather(*requests)
+
+    leader, *waiters = asyncio.run(scenario())
+    assert leader["status"] == 404 and b"etag" not in leader["headers"]
+    assert [w["status"] for w in waiters] == [200, 200]
+    assert app.calls == 3
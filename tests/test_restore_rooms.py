@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import db_queries as dbq
+import server
+from room_journal import room_journal
+from room_models import LivePlayer, LiveRoom
+
+
+def _room(room_id, status):
+    players = [LivePlayer(user_id=u, username=u, first_name="Test", bet_amount=300) for u in ("a", "b", "c")]
+    room = LiveRoom(id=room_id, room_type="silver", max_players=3, players=players)
+    room.status = status
+    return room
+
+
+@pytest.fixture
+def restore(tmp_path, monkeypatch):
+    monkeypatch.setattr(room_journal, "path", tmp_path / "room_journal.jsonl")
+    monkeypatch.setattr(room_journal, "_fh", None)
+    credits = []
+
+    async def increment_user_tokens(user_id, amount):
+        credits.append((user_id, amount))
+        return {"id": user_id, "token_balance": amount}
+
+    monkeypatch.setattr(dbq, "increment_user_tokens", increment_user_tokens)
+    yield credits
+    for room in list(server.active_rooms.values()):
+        server.active_rooms.remove(room.id)
+    if room_journal._fh:
+        room_journal._fh.close()
+        room_journal._fh = None
+
+
+def test_restore_refunds_only_unsettled_rounds(restore):
+    async def scenario():
+        for room_id in ("credited", "pending", "interrupted", "mid_refund"):
+            room_journal.room_opened(_room(room_id, "finished"))
+        room_journal.credit_pending("credited", "a", 900)
+        room_journal.prize_credited("credited", "a", 900)
+        room_journal.credit_pending("pending", "b", 900)
+        room_journal.player_refunded("interrupted", "a", 300)
+        room_journal.refund_pending("mid_refund", "a", 300)
+        room_journal.player_refunded("mid_refund", "a", 300)
+        room_journal.refund_pending("mid_refund", "b", 300)
+        await room_journal.flush()
+
+        await server.restore_rooms_from_journal()
+
+    asyncio.run(scenario())
+    # Credited and mid-credit rounds are never refunded; interrupted rounds
+    # refund everyone not refunded (or mid-refund) before the restart
+    assert sorted(restore) == [("b", 300), ("c", 300), ("c", 300)]
+    assert room_journal.replay() == []
+
+
+@pytest.mark.parametrize("outcome", ["missing_user", "db_error"])
+def test_failed_winner_credit_stays_pending(restore, monkeypatch, outcome):
+    async def increment_user_tokens(user_id, amount):
+        if outcome == "db_error":
+            raise ConnectionError("pool closed")
+        return None
+
+    async def noop(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(dbq, "increment_user_tokens", increment_user_tokens)
+    monkeypatch.setattr(dbq, "insert_winner_prize", noop)
+    monkeypatch.setattr(server.sio, "emit", noop)
+    monkeypatch.setattr(server.round_scheduler, "schedule", lambda *args, **kwargs: None)
+
+    async def scenario():
+        room = _room("failed", "waiting")
+        room.room_type = server.RoomType.SILVER
+        server.active_rooms.add(room)
+        await server.resolve_game_round(room)
+        await room_journal.flush()
+        return room
+
+    room = asyncio.run(scenario())
+    snap, = room_journal.replay()
+    assert snap["credit_pending"] == {"user_id": room.winner.user_id, "amount": room.prize_pool}
+    assert snap["credited"] is None
@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+from room_journal import RoomJournal
+from room_models import LivePlayer, LiveRoom
+from room_registry import RoomRegistry
+
+
+def _player(user_id, bet=200):
+    return LivePlayer(user_id=user_id, username=user_id, first_name="Test", bet_amount=bet)
+
+
+def _room(room_id, players=(), status="waiting"):
+    room = LiveRoom(id=room_id, room_type="bronze", max_players=3, players=list(players))
+    room.status = status
+    return room
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return RoomJournal(path=str(tmp_path / "room_journal.jsonl"))
+
+
+def test_replay_missing_file(journal):
+    assert journal.replay() == []
+
+
+def test_replay_folds_events(journal):
+    async def scenario():
+        journal.room_opened(_room("r1", [_player("a")]))
+        journal.player_joined("r1", _player("b"))
+        journal.player_joined("r1", _player("c"))
+        journal.player_left("r1", "b")
+        journal.status_changed("r1", "finished")
+        journal.credit_pending("r1", "a", 400)
+        journal.prize_credited("r1", "a", 400)
+        journal.refund_pending("r1", "c", 200)
+        journal.player_refunded("r1", "c", 200)
+        journal.refund_pending("r1", "a", 200)
+
+        journal.room_opened(_room("r2", [_player("d")]))
+        journal.players_cleared("r2")
+
+        journal.room_opened(_room("r3"))
+        journal.room_closed("r3")
+        await journal.flush()
+
+    asyncio.run(scenario())
+    rooms = {snap["id"]: snap for snap in journal.replay()}
+
+    assert set(rooms) == {"r1", "r2"}
+    r1 = rooms["r1"]
+    assert [p["user_id"] for p in r1["players"]] == ["a", "c"]
+    assert r1["status"] == "finished"
+    assert r1["credit_pending"] == {"user_id": "a", "amount": 400}
+    assert r1["credited"] == {"user_id": "a", "amount": 400}
+    assert r1["refund_pending"] == {"c": 200, "a": 200}
+    assert r1["refunded"] == {"c": 200}
+    assert rooms["r2"]["players"] == []
+    assert rooms["r2"]["credited"] is None
+
+
+def test_replay_skips_torn_last_line(journal):
+    async def scenario():
+        journal.room_opened(_room("r1", [_player("a")]))
+        journal.player_joined("r1", _player("b"))
+        await journal.stop()
+
+    asyncio.run(scenario())
+    with open(journal.path, "a") as fh:
+        fh.write('{"ts": 1, "event": "join", "room_id": "r1", "player": {"user_id": "c"')
+
+    (snap,) = journal.replay()
+    assert [p["user_id"] for p in snap["players"]] == ["a", "b"]
+
+
+def test_records_after_unknown_room_are_ignored(journal):
+    async def scenario():
+        journal.player_joined("ghost", _player("a"))
+        journal.prize_credited("ghost", "a", 100)
+        await journal.stop()
+
+    asyncio.run(scenario())
+    assert journal.replay() == []
+
+
+def test_compact_keeps_settlement_state(journal):
+    finished = _room("r1", [_player("a"), _player("b")], status="finished")
+    waiting = _room("r2", [_player("c")])
+
+    async def scenario():
+        journal.start()
+        journal.room_opened(finished)
+        journal.room_opened(waiting)
+        journal.credit_pending("r1", "a", 400)
+        journal.prize_credited("r1", "a", 400)
+        journal.refund_pending("r1", "b", 200)
+        journal.player_refunded("r1", "b", 200)
+        journal.refund_pending("r1", "a", 200)
+        journal.room_opened(_room("r3"))
+        journal.room_closed("r3")
+        # Still buffered when compaction starts — must not be dropped
+        await journal.compact([finished, waiting])
+        journal.player_joined("r2", _player("d"))
+        await journal.stop()
+
+    asyncio.run(scenario())
+    events = [(e["event"], e["room_id"]) for e in _lines(journal.path)]
+    assert ("open", "r3") not in events
+    rooms = {snap["id"]: snap for snap in journal.replay()}
+
+    assert set(rooms) == {"r1", "r2"}
+    assert rooms["r1"]["status"] == "finished"
+    assert rooms["r1"]["credited"] == {"user_id": "a", "amount": 400}
+    assert rooms["r1"]["credit_pending"] == {"user_id": "a", "amount": 400}
+    assert rooms["r1"]["refund_pending"] == {"b": 200, "a": 200}
+    assert rooms["r1"]["refunded"] == {"b": 200}
+    assert [p["user_id"] for p in rooms["r2"]["players"]] == ["c", "d"]
+
+
+def test_compact_does_not_race_the_writer(journal):
+    rooms = [_room(f"r{i}", [_player("a")]) for i in range(20)]
+
+    async def scenario():
+        journal.start()
+        for room in rooms:
+            journal.room_opened(room)
+
+        async def churn():
+            for i in range(200):
+                # As RoomRegistry does: mutate the live room, then journal it
+                room, player = rooms[i % 20], _player(f"u{i}")
+                room.players.append(player)
+                journal.player_joined(room.id, player)
+                await journal.flush()
+
+        churner = asyncio.create_task(churn())
+        for _ in range(5):
+            await journal.compact(rooms)
+            await asyncio.sleep(0)
+        await churner
+        await journal.stop()
+
+    asyncio.run(scenario())
+    snaps = {snap["id"]: snap for snap in journal.replay()}
+    assert set(snaps) == {room.id for room in rooms}
+    for room in rooms:
+        assert [p["user_id"] for p in snaps[room.id]["players"]] == [p.user_id for p in room.players]
+
+
+def test_writer_compacts_past_threshold(tmp_path):
+    journal = RoomJournal(path=str(tmp_path / "room_journal.jsonl"), flush_interval=0.001, compact_after=50)
+    registry = RoomRegistry(journal=journal)
+    journal.configure(registry.values)
+
+    async def scenario():
+        journal.start()
+        for i in range(300):
+            room = _room(f"r{i}")
+            registry.add(room)
+            registry.add_player(room, _player("a"))
+            await journal.flush()
+            if i % 10:
+                registry.remove(room.id)
+        await journal.stop()
+
+    asyncio.run(scenario())
+    assert journal.compactions > 0
+    # Bounded by the live rooms plus what was written since the last compaction
+    assert len(_lines(journal.path)) < len(registry) + 2 * journal.compact_after
+    snaps = {snap["id"]: snap for snap in journal.replay()}
+    assert set(snaps) == set(registry)
+    assert all([p["user_id"] for p in snap["players"]] == ["a"] for snap in snaps.values())
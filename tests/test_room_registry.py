@@ -0,0 +1,91 @@
+import random
+
+from room_models import LivePlayer, LiveRoom
+from room_registry import RoomRegistry
+
+
+def _player(user_id):
+    return LivePlayer(user_id=user_id, username=user_id, first_name="Test", bet_amount=200)
+
+
+def _room(room_id, room_type="bronze", players=()):
+    return LiveRoom(id=room_id, room_type=room_type, max_players=3, players=list(players))
+
+
+def assert_consistent(registry):
+    """Every index must match what a full scan of the room objects says"""
+    by_type_status, user_rooms = {}, {}
+    for room in registry.values():
+        by_type_status.setdefault((room.room_type, room.status), set()).add(room.id)
+        for player in room.players:
+            user_rooms.setdefault(player.user_id, set()).add(room.id)
+        assert registry._room_players[room.id] == {p.user_id for p in room.players}
+    assert {key: set(bucket) for key, bucket in registry._by_type_status.items()} == by_type_status
+    assert registry._user_rooms == user_rooms
+    assert set(registry._room_players) == set(registry)
+
+
+def test_lookups_follow_mutations():
+    registry = RoomRegistry()
+    first = registry.add(_room("r1", players=[_player("a")]))
+    second = registry.add(_room("r2"))
+    registry.add(_room("g1", room_type="gold"))
+
+    assert registry.find("bronze") is first
+    assert registry.rooms_with("gold", "waiting")[0].id == "g1"
+    assert registry.rooms_for_user("a") == [first]
+
+    registry.add_player(second, _player("a"))
+    registry.set_status(first, "playing")
+    assert registry.find("bronze") is second
+    assert registry.rooms_with("bronze", "playing") == [first]
+    assert {room.id for room in registry.rooms_for_user("a")} == {"r1", "r2"}
+
+    assert registry.remove_player(second, "a").user_id == "a"
+    assert registry.remove_player(second, "a") is None
+    registry.remove("r1")
+    assert registry.rooms_for_user("a") == []
+    assert registry.find("bronze", "playing") is None
+    assert_consistent(registry)
+
+
+def test_listeners_fire_on_vacate_and_change():
+    registry = RoomRegistry()
+    vacated, changes = [], []
+    registry.add_vacate_listener(vacated.append)
+    registry.add_change_listener(lambda: changes.append(1))
+
+    room = registry.add(_room("r1", players=[_player("a")]))
+    registry.remove_player(room, "a")
+    registry.add_player(room, _player("b"))
+    registry.clear_players(room)
+    registry.remove("r1")
+
+    assert vacated == ["r1", "r1", "r1"]
+    assert len(changes) == 5
+
+
+def test_indexes_stay_consistent_under_random_churn():
+    rng = random.Random(7)
+    registry = RoomRegistry()
+    users = [f"u{i}" for i in range(12)]
+    for step in range(2000):
+        rooms = list(registry.values())
+        action = rng.random()
+        if action < 0.15 or not rooms:
+            registry.add(_room(f"r{step}", room_type=rng.choice(["bronze", "gold"])))
+        elif action < 0.5:
+            room = rng.choice(rooms)
+            user_id = rng.choice(users)
+            if not registry.has_player(room, user_id):
+                registry.add_player(room, _player(user_id))
+        elif action < 0.7:
+            room = rng.choice(rooms)
+            registry.remove_player(room, rng.choice(users))
+        elif action < 0.85:
+            registry.set_status(rng.choice(rooms), rng.choice(["waiting", "ready", "playing", "finished"]))
+        elif action < 0.9:
+            registry.clear_players(rng.choice(rooms))
+        else:
+            registry.remove(rng.choice(rooms).id)
+        assert_consistent(registry)
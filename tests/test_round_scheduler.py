@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from round_scheduler import RoundScheduler
+
+ADMIN_KEY = "PRODUCTION_CLEANUP_2025"
+
+
+async def _noop(*args):
+    return None
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RoundScheduler()
+    monkeypatch.setattr(server, "round_scheduler", scheduler)
+    return scheduler
+
+
+def test_cancel_endpoint_only_cancels_start(scheduler):
+    scheduler.schedule("waiting", "start", 5, _noop)
+    scheduler.schedule("running", "resolve", 5, _noop)
+
+    result = asyncio.run(server.cancel_room_transition("waiting", admin_key=ADMIN_KEY))
+    assert result["cancelled_phase"] == "start"
+    assert scheduler.get_transition("waiting") is None
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.cancel_room_transition("running", admin_key=ADMIN_KEY))
+    assert exc.value.status_code == 409
+    assert scheduler.get_transition("running").phase == "resolve"
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(server.cancel_room_transition("unknown", admin_key=ADMIN_KEY))
+    assert exc.value.status_code == 404
+
+
+def test_transitions_fire_in_due_order():
+    fired = []
+
+    async def record(name):
+        fired.append(name)
+
+    async def scenario():
+        scheduler = RoundScheduler()
+        scheduler.start()
+        scheduler.schedule("r3", "close", 0.03, record, "r3")
+        scheduler.schedule("r1", "start", 0.01, record, "r1")
+        scheduler.schedule("r2", "resolve", 0.02, record, "r2")
+        assert [p["room_id"] for p in scheduler.pending()] == ["r1", "r2", "r3"]
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert fired == ["r1", "r2", "r3"]
+    assert scheduler.fired == 3
+    assert scheduler.pending() == []
+
+
+def test_cancel_reschedule_and_replace():
+    fired = []
+
+    async def record(name):
+        fired.append(name)
+
+    async def scenario():
+        scheduler = RoundScheduler()
+        scheduler.start()
+        scheduler.schedule("cancelled", "start", 0.01, record, "cancelled")
+        scheduler.schedule("moved", "resolve", 10, record, "moved")
+        scheduler.schedule("replaced", "start", 0.01, record, "replaced-old")
+        scheduler.schedule("replaced", "resolve", 0.02, record, "replaced-new")
+
+        assert scheduler.cancel("cancelled")
+        assert not scheduler.cancel("cancelled")
+        assert scheduler.reschedule("moved", 0.03)
+        assert not scheduler.reschedule("unknown", 0)
+        await asyncio.sleep(0.1)
+        pending = await scheduler.stop()
+        return scheduler, pending
+
+    scheduler, pending = asyncio.run(scenario())
+    assert fired == ["replaced-new", "moved"]
+    assert scheduler.cancelled == 1
+    assert pending == []
+
+
+def test_failed_transition_is_counted_and_stop_reports_pending():
+    async def boom():
+        raise RuntimeError("phase failed")
+
+    async def scenario():
+        scheduler = RoundScheduler()
+        scheduler.start()
+        scheduler.schedule("bad", "resolve", 0, boom)
+        scheduler.schedule("later", "close", 60, _noop)
+        await asyncio.sleep(0.05)
+        return scheduler, await scheduler.stop()
+
+    scheduler, pending = asyncio.run(scenario())
+    assert scheduler.failed == 1
+    assert [(p["room_id"], p["phase"]) for p in pending] == [("later", "close")]
@@ -0,0 +1,67 @@
+import time
+
+import jwt
+import pytest
+
+import session_tokens as session_tokens_module
+from session_tokens import SessionError, SessionTokens
+
+USER = {"id": "u1", "telegram_id": 42, "role": "admin", "is_banned": False}
+
+
+class FrozenTime:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _issued_ago(tokens, monkeypatch, seconds):
+    """Issue a token as if it was created `seconds` ago"""
+    monkeypatch.setattr(session_tokens_module, "time", FrozenTime(time.time() - seconds))
+    token, _ = tokens.issue(USER)
+    monkeypatch.setattr(session_tokens_module, "time", time)
+    return token
+
+
+def test_issue_and_verify_roundtrip():
+    tokens = SessionTokens(secret="s", ttl=60, refresh_window=300)
+    token, expires_at = tokens.issue(USER)
+    claims = tokens.verify(token)
+    assert (claims.user_id, claims.telegram_id, claims.role, claims.is_banned) == ("u1", 42, "admin", False)
+    assert claims.expires_at == expires_at
+    assert tokens.get_stats()["verified"] == 1
+
+
+def test_expired_token_only_refreshable_within_window(monkeypatch):
+    tokens = SessionTokens(secret="s", ttl=60, refresh_window=300)
+    recent = _issued_ago(tokens, monkeypatch, 60 + 100)
+    stale = _issued_ago(tokens, monkeypatch, 60 + 400)
+
+    with pytest.raises(SessionError, match="session_expired"):
+        tokens.verify(recent)
+    assert tokens.verify(recent, allow_expired=True).user_id == "u1"
+    with pytest.raises(SessionError, match="session_expired"):
+        tokens.verify(stale, allow_expired=True)
+    assert tokens.rejected == 2
+
+
+@pytest.mark.parametrize("token", [
+    SessionTokens(secret="other", ttl=60).issue(USER)[0],
+    jwt.encode({"sub": "u1", "exp": int(time.time()) + 60}, "s", algorithm="HS512"),
+    "not-a-token",
+])
+def test_wrong_signature_or_garbage_is_invalid(token):
+    tokens = SessionTokens(secret="s", ttl=60)
+    with pytest.raises(SessionError, match="session_invalid"):
+        tokens.verify(token, allow_expired=True)
+
+
+def test_ban_in_process_applies_to_existing_tokens():
+    tokens = SessionTokens(secret="s", ttl=60)
+    token, _ = tokens.issue(USER)
+    tokens.mark_banned(42)
+    assert tokens.verify(token).is_banned
+    tokens.mark_unbanned(42)
+    assert not tokens.verify(token).is_banned
@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import db_queries as dbq
+from db_queries import LastLoginWriter, UserCache
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserCache(max_entries=100, ttl=30)
+    monkeypatch.setattr(dbq, "user_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def balances(monkeypatch):
+    seen = []
+    monkeypatch.setattr(dbq, "_balance_listeners", [seen.append])
+    return seen
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = LastLoginWriter(interval=60)
+    monkeypatch.setattr(dbq, "last_login_writer", writer)
+    return writer
+
+
+def _login_doc(telegram_id=42):
+    return {"id": "new-id", "telegram_id": telegram_id, "first_name": "Test", "token_balance": 1000}
+
+
+def _row(created, balance=1000):
+    return {"id": "u1", "telegram_id": 42, "first_name": "Test", "token_balance": balance, "created": created}
+
+
+@pytest.mark.parametrize("created", [True, False])
+def test_upsert_is_one_round_trip_and_caches_the_row(cache, balances, fake_pool, created):
+    async def fetchrow(query, *args):
+        return _row(created)
+
+    fake_pool.fetchrow = fetchrow
+    user, was_created = asyncio.run(dbq.upsert_telegram_user(_login_doc()))
+
+    assert was_created is created
+    assert "created" not in user
+    assert len(fake_pool.calls) == 1
+    query = fake_pool.calls[0][1]
+    assert "ON CONFLICT (telegram_id) DO UPDATE SET last_login = EXCLUDED.last_login" in query
+    assert "token_balance = EXCLUDED" not in query
+    assert cache.get_by_telegram_id(42)["id"] == "u1"
+    # Only a new user's starting balance reaches the leaderboard listener
+    assert [u["id"] for u in balances] == (["u1"] if created else [])
+
+
+def test_upsert_force_balance_overwrites_existing(cache, balances, fake_pool):
+    async def fetchrow(query, *args):
+        assert args[10] == 5000
+        return _row(False, balance=5000)
+
+    fake_pool.fetchrow = fetchrow
+    user, created = asyncio.run(dbq.upsert_telegram_user(_login_doc(), force_balance=5000))
+
+    assert not created and user["token_balance"] == 5000
+    assert "token_balance = EXCLUDED.token_balance" in fake_pool.calls[0][1]
+    assert [u["token_balance"] for u in balances] == [5000]
+
+
+def test_cached_login_skips_the_db_and_queues_last_login(cache, writer, fake_pool):
+    cache.put({"id": "u1", "telegram_id": 42, "token_balance": 7})
+    user, created = asyncio.run(dbq.telegram_login(_login_doc()))
+
+    assert (user["id"], created) == ("u1", False)
+    assert fake_pool.calls == []
+    assert list(writer._pending) == [42]
+    assert cache.get_by_id("u1")["last_login"] == user["last_login"]
+
+
+def test_last_login_writer_coalesces_touches(writer, fake_pool):
+    async def execute(query, *args):
+        return "UPDATE 2"
+
+    fake_pool.execute = execute
+    writer.touch(1, T0)
+    writer.touch(2, T0)
+    writer.touch(1, T0 + timedelta(seconds=5))
+    asyncio.run(writer.flush())
+    asyncio.run(writer.flush())  # nothing pending — no query
+
+    assert len(fake_pool.calls) == 1
+    _, query, (telegram_ids, stamps) = fake_pool.calls[0]
+    assert dict(zip(telegram_ids, stamps)) == {1: T0 + timedelta(seconds=5), 2: T0}
+    assert writer.flushed == 2
+
+
+def test_last_login_writer_requeues_on_failure_without_clobbering_newer(writer, fake_pool):
+    async def failing(query, *args):
+        # A login lands while the UPDATE is in flight
+        writer.touch(1, T0 + timedelta(seconds=9))
+        raise ConnectionError("pool closed")
+
+    fake_pool.execute = failing
+    writer.touch(1, T0)
+    writer.touch(2, T0)
+    asyncio.run(writer.flush())
+
+    assert writer._pending == {1: T0 + timedelta(seconds=9), 2: T0}
+    assert writer.flushed == 0
+
+    async def ok(query, *args):
+        return "UPDATE 2"
+
+    fake_pool.execute = ok
+    asyncio.run(writer.stop())
+    assert writer._pending == {}
+    assert writer.flushed == 2
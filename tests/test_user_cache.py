@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+import db_queries as dbq
+from db_queries import UserCache
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(dbq, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = UserCache(max_entries=3, ttl=30)
+    monkeypatch.setattr(dbq, "user_cache", cache)
+    return cache
+
+
+def _user(user_id, telegram_id=None, balance=0):
+    return {"id": user_id, "telegram_id": telegram_id, "token_balance": balance}
+
+
+def test_ttl_expiry(fake_time, cache):
+    cache.put(_user("u1", 11))
+    fake_time.now += 29
+    assert cache.get_by_telegram_id(11)["id"] == "u1"
+    fake_time.now += 2
+    assert cache.get_by_id("u1") is None
+    assert cache.get_by_telegram_id(11) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_keeps_recently_used(fake_time, cache):
+    for i in range(3):
+        cache.put(_user(f"u{i}", i))
+    cache.get_by_id("u0")  # now most recent
+    cache.put(_user("u3", 3))
+
+    assert cache.get_by_id("u1") is None
+    assert cache.get_by_telegram_id(1) is None  # telegram index dropped with it
+    assert {u for u in ("u0", "u2", "u3") if cache.get_by_id(u)} == {"u0", "u2", "u3"}
+
+
+def test_returned_rows_are_copies(cache):
+    cache.put(_user("u1", balance=10))
+    cache.get_by_id("u1")["token_balance"] = 999
+    assert cache.get_by_id("u1")["token_balance"] == 10
+
+
+def test_invalidate_by_telegram_id(cache):
+    cache.put(_user("u1", 11))
+    cache.invalidate(telegram_id=11)
+    assert cache.get_by_id("u1") is None
+    assert cache.invalidations == 1
+
+
+def test_read_through_fills_cache(cache, fake_pool):
+    async def fetchrow(query, *args):
+        return _user("u1", 11, balance=5)
+
+    fake_pool.fetchrow = fetchrow
+
+    async def scenario():
+        first = await dbq.get_user_by_id("u1")
+        second = await dbq.get_user_by_telegram_id(11)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == _user("u1", 11, balance=5)
+    assert len(fake_pool.calls) == 1
+
+
+@pytest.mark.parametrize("racing_write", ["invalidate", "put"])
+def test_write_racing_with_fill_is_not_overwritten(cache, fake_pool, racing_write):
+    read_started, release_read = asyncio.Event(), asyncio.Event()
+
+    async def fetchrow(query, *args):
+        # The SELECT saw the old row; a write lands before the read returns
+        read_started.set()
+        await release_read.wait()
+        return _user("u1", 11, balance=5)
+
+    fake_pool.fetchrow = fetchrow
+
+    async def scenario():
+        reader = asyncio.create_task(dbq.get_user_by_id("u1"))
+        await read_started.wait()
+        if racing_write == "invalidate":
+            cache.invalidate(user_id="u1")
+        else:
+            cache.put(_user("u1", 11, balance=50))
+        release_read.set()
+        stale = await reader
+        return stale
+
+    stale = asyncio.run(scenario())
+    assert stale["token_balance"] == 5  # the caller still gets what it read
+    cached = cache.get_by_id("u1")
+    if racing_write == "invalidate":
+        assert cached is None
+    else:
+        assert cached["token_balance"] == 50
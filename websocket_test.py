@@ -41,17 +41,30 @@ class WebSocketRoomSyncTester:
                 'event': 'connect',
                 'timestamp': datetime.now().isoformat()
             })
+            # Lobby protocol: full state on request, then seq-numbered deltas
+            await sio_client.emit('lobby_resync')
 
         @sio_client.event
         async def disconnect():
             print(f"🔌 {client_name} disconnected from WebSocket")
 
         @sio_client.event
-        async def rooms_updated(data):
-            print(f"📡 {client_name} received rooms_updated: {len(data.get('rooms', []))} rooms")
+        async def rooms_snapshot(data):
+            print(f"📡 {client_name} received rooms_snapshot: {len(data.get('rooms', []))} rooms at seq {data.get('seq')}")
             self.events_received.append({
                 'client': client_name,
-                'event': 'rooms_updated',
+                'event': 'rooms_snapshot',
+                'data': data,
+                'timestamp': datetime.now().isoformat()
+            })
+
+        @sio_client.event
+        async def rooms_delta(data):
+            print(f"📡 {client_name} received rooms_delta #{data.get('seq')}: "
+                  f"{len(data.get('changed', []))} changed, {len(data.get('removed', []))} removed")
+            self.events_received.append({
+                'client': client_name,
+                'event': 'rooms_delta',
                 'data': data,
                 'timestamp': datetime.now().isoformat()
             })
@@ -208,14 +221,17 @@ class WebSocketRoomSyncTester:
             # Wait a moment to ensure we capture any initial broadcasts
             await asyncio.sleep(2)
             
-            # Check if we received rooms_updated events
-            rooms_updated_events = [e for e in self.events_received if e['event'] == 'rooms_updated']
+            # Each client asked for a rooms_snapshot (lobby_resync) on connect
+            snapshot_events = [e for e in self.events_received if e['event'] == 'rooms_snapshot']
             
-            success = len(rooms_updated_events) > 0
+            success = len(snapshot_events) > 0
             if success:
-                latest_event = rooms_updated_events[-1]
+                latest_event = snapshot_events[-1]
                 rooms_data = latest_event['data'].get('rooms', [])
-                details = f"Received {len(rooms_updated_events)} rooms_updated events, latest contains {len(rooms_data)} rooms with timestamp"
+                details = f"Received {len(snapshot_events)} rooms_snapshot events, latest contains {len(rooms_data)} rooms at seq {latest_event['data'].get('seq')}"
+                if 'seq' not in latest_event['data'] or 'timestamp' not in latest_event['data']:
+                    details += ", Missing seq/timestamp"
+                    success = False
                 
                 # Verify the data structure
                 if rooms_data:
@@ -228,7 +244,7 @@ class WebSocketRoomSyncTester:
                     else:
                         details += ", All required fields present"
             else:
-                details = "No rooms_updated events received"
+                details = "No rooms_snapshot events received"
             
             self.log_test("Broadcast Room Updates", success, details)
             return success
@@ -281,7 +297,7 @@ class WebSocketRoomSyncTester:
             # Analyze events received
             new_events = [e for e in self.events_received[events_before:]]
             player_joined_events = [e for e in new_events if e['event'] == 'player_joined']
-            rooms_updated_events = [e for e in new_events if e['event'] == 'rooms_updated']
+            rooms_delta_events = [e for e in new_events if e['event'] == 'rooms_delta']
             game_starting_events = [e for e in new_events if e['event'] == 'game_starting']
             game_finished_events = [e for e in new_events if e['event'] == 'game_finished']
             new_room_events = [e for e in new_events if e['event'] == 'new_room_available']
@@ -304,19 +320,23 @@ class WebSocketRoomSyncTester:
                 success = False
                 details.append(f"❌ Expected 2+ player_joined events, got {len(player_joined_events)}")
             
-            # Should have multiple rooms_updated events
-            if len(rooms_updated_events) >= 2:
-                details.append(f"✅ {len(rooms_updated_events)} rooms_updated events")
-                # Verify rooms_updated events contain complete room data
-                latest_rooms_event = rooms_updated_events[-1]
-                if 'rooms' in latest_rooms_event['data'] and 'timestamp' in latest_rooms_event['data']:
-                    details.append("   ✅ rooms_updated contains rooms array and timestamp")
+            # Should have multiple rooms_delta events, in sequence per client
+            if len(rooms_delta_events) >= 2:
+                details.append(f"✅ {len(rooms_delta_events)} rooms_delta events")
+                latest_rooms_event = rooms_delta_events[-1]
+                if all(k in latest_rooms_event['data'] for k in ('seq', 'changed', 'removed', 'timestamp')):
+                    details.append("   ✅ rooms_delta contains seq, changed, removed and timestamp")
                 else:
                     success = False
-                    details.append("   ❌ rooms_updated missing required data structure")
+                    details.append("   ❌ rooms_delta missing required data structure")
+                for client in ('Client1', 'Client2'):
+                    seqs = [e['data'].get('seq') for e in rooms_delta_events if e['client'] == client]
+                    if seqs and any(b != a + 1 for a, b in zip(seqs, seqs[1:])):
+                        success = False
+                        details.append(f"   ❌ {client} saw a rooms_delta sequence gap: {seqs}")
             else:
                 success = False
-                details.append(f"❌ Expected 2+ rooms_updated events, got {len(rooms_updated_events)}")
+                details.append(f"❌ Expected 2+ rooms_delta events, got {len(rooms_delta_events)}")
             
             # Should have game_starting event
             if len(game_starting_events) >= 1:
@@ -359,18 +379,19 @@ class WebSocketRoomSyncTester:
             success = True
             details = []
             
-            # Test rooms_updated event structure
-            rooms_updated_events = [e for e in self.events_received if e['event'] == 'rooms_updated']
-            if rooms_updated_events:
-                latest_event = rooms_updated_events[-1]
+            # Test rooms_snapshot / rooms_delta event structure
+            lobby_events = [e for e in self.events_received if e['event'] in ('rooms_snapshot', 'rooms_delta')]
+            if lobby_events:
+                latest_event = lobby_events[-1]
                 data = latest_event['data']
+                rooms_key = 'rooms' if latest_event['event'] == 'rooms_snapshot' else 'changed'
                 
                 # Check required fields
-                if 'rooms' in data and 'timestamp' in data:
-                    details.append("✅ rooms_updated has required fields (rooms, timestamp)")
+                if rooms_key in data and 'seq' in data and 'timestamp' in data:
+                    details.append(f"✅ {latest_event['event']} has required fields ({rooms_key}, seq, timestamp)")
                     
                     # Check room data structure
-                    rooms = data['rooms']
+                    rooms = data[rooms_key]
                     if rooms:
                         sample_room = rooms[0]
                         required_room_fields = ['id', 'room_type', 'players_count', 'status', 'max_players', 'round_number']
@@ -384,10 +405,10 @@ class WebSocketRoomSyncTester:
                         details.append("⚠️ No room data to validate structure")
                 else:
                     success = False
-                    details.append("❌ rooms_updated missing required fields")
+                    details.append(f"❌ {latest_event['event']} missing required fields")
             else:
                 success = False
-                details.append("❌ No rooms_updated events to validate")
+                details.append("❌ No rooms_snapshot / rooms_delta events to validate")
             
             # Test player_joined event structure
             player_joined_events = [e for e in self.events_received if e['event'] == 'player_joined']